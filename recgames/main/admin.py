@@ -1,18 +1,50 @@
 from django.contrib import admin
-from .models import Tag, Game, Collection, GameCollection, Recommendation, Favorite, UserProfile, Feedback, CollectionLike
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from .models import Tag, Game, Collection, GameCollection, Recommendation, Favorite, UserProfile, Feedback, CollectionLike, Job, RankingSnapshot
+from .pagination import EstimatedCountPaginator
+from . import change_log, deletion, invalidation, jobs
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Список для больших таблиц: вместо точного COUNT(*) — оценка
+    (EstimatedCountPaginator), без второго COUNT(*) для «показать все».
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class DecadeListFilter(admin.SimpleListFilter):
+    """Фильтр по десятилетиям с фиксированным списком вместо DISTINCT по всей таблице"""
+    title = 'Десятилетие выпуска'
+    parameter_name = 'decade'
+
+    def lookups(self, request, model_admin):
+        return [(str(decade), f'{decade}-е') for decade in range(1970, 2031, 10)]
+
+    def queryset(self, request, queryset):
+        if not self.value() or not self.value().isdigit():
+            return queryset
+        decade = int(self.value())
+        return queryset.filter(release_year__gte=decade, release_year__lt=decade + 10)
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ('name', 'slug')
+    list_display = ('name', 'slug', 'games_count')
+    readonly_fields = ('games_count',)
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ('name',)
 
 
 @admin.register(Game)
-class GameAdmin(admin.ModelAdmin):
+class GameAdmin(LargeTableAdmin):
     list_display = ('title', 'genre', 'developer', 'release_year', 'platforms', 'rating', 'price', 'created_at')
-    list_filter = ('genre', 'platforms', 'release_year', 'created_at')
-    search_fields = ('title', 'developer', 'description')
+    list_filter = ('genre', 'platforms', DecadeListFilter, 'created_at')
+    # без description: поиск подстроки по длинному тексту — полный проход по таблице
+    search_fields = ('title', 'developer')
     filter_horizontal = ('tags',)
     list_editable = ('price', 'rating')
     list_per_page = 25
@@ -48,10 +80,12 @@ class GameAdmin(admin.ModelAdmin):
     
 
 @admin.register(Collection)
-class CollectionAdmin(admin.ModelAdmin):
-    list_display = ('title', 'user', 'is_public', 'games_count', 'likes_count', 'created_at')
-    list_filter = ('is_public', 'created_at', 'updated_at')
-    search_fields = ('title', 'description', 'user__username')
+class CollectionAdmin(LargeTableAdmin):
+    list_display = ('title', 'user', 'is_public', 'games_count', 'likes_count', 'is_deleted', 'created_at')
+    list_filter = ('is_public', 'is_deleted', 'created_at', 'updated_at')
+    search_fields = ('title', '=user__username')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
     list_editable = ('is_public',)
     list_per_page = 25
     ordering = ('-created_at',)
@@ -61,7 +95,7 @@ class CollectionAdmin(admin.ModelAdmin):
             'fields': ('user', 'title', 'description', 'is_public')
         }),
         ('Статистика', {
-            'fields': ('likes_count',),
+            'fields': ('likes_count', 'games_count'),
             'classes': ('collapse',)
         }),
         ('Даты', {
@@ -72,32 +106,79 @@ class CollectionAdmin(admin.ModelAdmin):
     
     readonly_fields = ('created_at', 'updated_at', 'games_count')
     
-    actions = ['make_public', 'make_private', 'reset_likes']
+    actions = [
+        'make_public', 'make_private', 'reset_likes', 'recount_likes', 'recount_games',
+        'delete_in_background', 'purge_deleted',
+    ]
+    
+    def _set_public(self, queryset, is_public):
+        """
+        Один UPDATE вместо save() на каждую подборку, поэтому то, что сделал бы
+        сигнал collection_changed, делается здесь: лента изменений (надгробия
+        для ставших приватными) и сброс кэшей подборок и их владельцев.
+        """
+        with transaction.atomic():
+            rows = list(queryset.exclude(is_public=is_public).values_list('id', 'user_id'))
+            if not rows:
+                # publish без ключей сбросил бы кэши по всей теме
+                return 0
+            collection_ids = [collection_id for collection_id, _ in rows]
+            Collection.objects.filter(id__in=collection_ids).update(is_public=is_public, updated_at=timezone.now())
+            change_log.record('collections', collection_ids)
+            invalidation.publish('collection', *collection_ids)
+            invalidation.publish('user_state', *{user_id for _, user_id in rows})
+        return len(collection_ids)
     
     def make_public(self, request, queryset):
-        updated = queryset.update(is_public=True)
+        updated = self._set_public(queryset, True)
         self.message_user(request, f'{updated} подборок стали публичными')
     make_public.short_description = "Сделать выбранные подборки публичными"
     
     def make_private(self, request, queryset):
-        updated = queryset.update(is_public=False)
+        updated = self._set_public(queryset, False)
         self.message_user(request, f'{updated} подборок стали приватными')
     make_private.short_description = "Сделать выбранные подборки приватными"
     
     def reset_likes(self, request, queryset):
-        updated = queryset.update(likes_count=0)
-        self.message_user(request, f'Лайки сброшены для {updated} подборок')
+        # likes_count ведут сигналы лайков, поэтому удаляются сами лайки, а счётчик пересчитывается
+        collection_ids = list(queryset.values_list('id', flat=True))
+        job = jobs.enqueue('reset_likes', collection_ids=collection_ids)
+        self.message_user(request, f'Сброс лайков у {len(collection_ids)} подборок поставлен в очередь (задача #{job.id})')
     reset_likes.short_description = "Сбросить лайки у выбранных подборок"
     
-    def games_count(self, obj):
-        return obj.games.count()
-    games_count.short_description = 'Количество игр'
+    def recount_likes(self, request, queryset):
+        job = jobs.enqueue('recount_likes', collection_ids=list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f'Пересчёт лайков поставлен в очередь (задача #{job.id})')
+    recount_likes.short_description = "Пересчитать лайки у выбранных подборок"
+    
+    def recount_games(self, request, queryset):
+        job = jobs.enqueue('recount_games', collection_ids=list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f'Пересчёт количества игр поставлен в очередь (задача #{job.id})')
+    recount_games.short_description = "Пересчитать количество игр в выбранных подборках"
+    
+    def delete_in_background(self, request, queryset):
+        job = deletion.schedule_collections_deletion(list(queryset.alive().only('id', 'user_id')))
+        self.message_user(request, f'Подборки скрыты, удаление поставлено в очередь (задача #{job.id})')
+    delete_in_background.short_description = "Удалить выбранные подборки в фоне"
+    
+    def purge_deleted(self, request, queryset):
+        """Повторно ставит удаление подборок, которые помечены, но остались после упавшей задачи"""
+        collection_ids = list(queryset.filter(is_deleted=True).values_list('id', flat=True))
+        if not collection_ids:
+            self.message_user(request, 'Среди выбранных нет помеченных на удаление подборок')
+            return
+        job = jobs.enqueue('purge_collections', collection_ids=collection_ids)
+        self.message_user(request, f'Удаление {len(collection_ids)} подборок поставлено в очередь (задача #{job.id})')
+    purge_deleted.short_description = "Повторить удаление помеченных подборок"
 
 @admin.register(GameCollection)
-class GameCollectionAdmin(admin.ModelAdmin):
+class GameCollectionAdmin(LargeTableAdmin):
     list_display = ('game', 'collection', 'order', 'added_at')
-    list_filter = ('added_at', 'collection')
-    search_fields = ('game__title', 'collection__title')
+    list_filter = ('added_at',)
+    search_fields = ('^game__title', '^collection__title')
+    # Collection.__str__ выводит имя автора
+    list_select_related = ('game', 'collection__user')
+    autocomplete_fields = ('game', 'collection')
     list_editable = ('order',)
     list_per_page = 25
     ordering = ('collection', 'order')
@@ -117,21 +198,23 @@ class GameCollectionAdmin(admin.ModelAdmin):
     actions = ['reorder_games']
     
     def reorder_games(self, request, queryset):
-        for collection in Collection.objects.all():
-            games_in_collection = GameCollection.objects.filter(collection=collection)
-            for index, game_collection in enumerate(games_in_collection):
-                game_collection.order = index + 1
-                game_collection.save()
-        self.message_user(request, 'Порядок игр во всех подборках пересчитан')
-    reorder_games.short_description = "Пересчитать порядок игр в подборках"
+        collection_ids = list(queryset.order_by().values_list('collection_id', flat=True).distinct())
+        job = jobs.enqueue('reorder_games', collection_ids=collection_ids)
+        self.message_user(
+            request, f'Пересчёт порядка игр в {len(collection_ids)} подборках поставлен в очередь (задача #{job.id})'
+        )
+    reorder_games.short_description = "Пересчитать порядок игр в подборках выбранных записей"
 
 @admin.register(Recommendation)
-class RecommendationAdmin(admin.ModelAdmin):
+class RecommendationAdmin(LargeTableAdmin):
     list_display = ('user', 'game', 'parameters_preview', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('user__username', 'game__title')
+    search_fields = ('=user__username', '^game__title')
+    list_select_related = ('user', 'game')
+    autocomplete_fields = ('user', 'game')
     list_per_page = 25
-    ordering = ('-created_at',)
+    # по первичному ключу: тот же порядок добавления, но без сортировки всей таблицы
+    ordering = ('-id',)
     
     fieldsets = (
         ('Основная информация', {
@@ -155,12 +238,14 @@ class RecommendationAdmin(admin.ModelAdmin):
     parameters_preview.short_description = 'Параметры'
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('user', 'game', 'added_at')
     list_filter = ('added_at',)
-    search_fields = ('user__username', 'game__title')
+    search_fields = ('=user__username', '^game__title')
+    list_select_related = ('user', 'game')
+    autocomplete_fields = ('user', 'game')
     list_per_page = 25
-    ordering = ('-added_at',)
+    ordering = ('-id',)
     
     fieldsets = (
         ('Основная информация', {
@@ -175,10 +260,12 @@ class FavoriteAdmin(admin.ModelAdmin):
     readonly_fields = ('added_at',)
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(LargeTableAdmin):
     list_display = ('user', 'preferences_count', 'collections_count', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('user__username', 'user__email')
+    search_fields = ('=user__username', '=user__email')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
     list_per_page = 25
     ordering = ('-created_at',)
     
@@ -204,11 +291,8 @@ class UserProfileAdmin(admin.ModelAdmin):
     actions = ['reset_collections_count']
     
     def reset_collections_count(self, request, queryset):
-        for profile in queryset:
-            actual_count = Collection.objects.filter(user=profile.user).count()
-            profile.collections_count = actual_count
-            profile.save()
-        self.message_user(request, 'Количество подборок пересчитано для выбранных профилей')
+        job = jobs.enqueue('recount_collections_count', profile_ids=list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f'Пересчёт количества подборок поставлен в очередь (задача #{job.id})')
     reset_collections_count.short_description = "Пересчитать количество подборок"
     
     def preferences_count(self, obj):
@@ -216,20 +300,29 @@ class UserProfileAdmin(admin.ModelAdmin):
     preferences_count.short_description = 'Количество предпочтений'
 
 @admin.register(Feedback)
-class FeedbackAdmin(admin.ModelAdmin):
+class FeedbackAdmin(LargeTableAdmin):
     list_display = ('name', 'email', 'created_at', 'is_processed') 
     list_filter = ('is_processed', 'created_at') 
     search_fields = ('name', 'email', 'message') 
     list_editable = ('is_processed',) 
     readonly_fields = ('created_at',) 
+    ordering = ('is_processed', '-created_at', '-id')
+    actions = ('mark_processed',)
+
+    @admin.action(description='Отметить обработанными')
+    def mark_processed(self, request, queryset):
+        updated = queryset.filter(is_processed=False).update(is_processed=True)
+        self.message_user(request, f'Отмечено обработанными: {updated}')
 
 @admin.register(CollectionLike)
-class CollectionLikeAdmin(admin.ModelAdmin):
+class CollectionLikeAdmin(LargeTableAdmin):
     list_display = ('user', 'collection', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('user__username', 'collection__title')
+    search_fields = ('=user__username', '^collection__title')
+    list_select_related = ('user', 'collection__user')
+    autocomplete_fields = ('user', 'collection')
     list_per_page = 25
-    ordering = ('-created_at',)
+    ordering = ('-id',)
     
     fieldsets = (
         ('Основная информация', {
@@ -241,4 +334,46 @@ class CollectionLikeAdmin(admin.ModelAdmin):
         })
     )
     
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('created_at',)
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ('name', 'status', 'progress_display', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    list_per_page = 25
+    ordering = ('-created_at',)
+    readonly_fields = ('name', 'payload', 'attempts', 'progress', 'total', 'error', 'created_at', 'finished_at')
+    
+    actions = ['retry_jobs']
+    
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status=Job.STATUS_FAILED).update(
+            status=Job.STATUS_PENDING, attempts=0, run_after=timezone.now()
+        )
+        self.message_user(request, f'{updated} задач снова поставлены в очередь')
+    retry_jobs.short_description = "Перезапустить выбранные задачи с ошибкой"
+    
+    def progress_display(self, obj):
+        if not obj.total:
+            return '—'
+        return f'{obj.progress}/{obj.total}'
+    progress_display.short_description = 'Прогресс'
+
+
+@admin.register(RankingSnapshot)
+class RankingSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'built_at')
+    readonly_fields = ('kind', 'items', 'built_at')
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class AccountAdmin(UserAdmin):
+    actions = ['delete_in_background']
+    
+    def delete_in_background(self, request, queryset):
+        job_ids = [deletion.schedule_user_deletion(user).id for user in queryset]
+        self.message_user(request, f'Пользователи заблокированы, удаление поставлено в очередь (задачи {job_ids})')
+    delete_in_background.short_description = "Удалить выбранных пользователей в фоне"
@@ -0,0 +1,149 @@
+"""
+JSON API только для чтения: игры, теги и публичные подборки.
+
+/api/<ресурс>/ отдаёт страницу по возрастанию id; курсор следующей страницы
+приходит в next и передаётся обратно в after. ids=1,2,3 — выборка по списку
+id одним запросом, в порядке запроса; не найденные id перечислены в missing.
+fields=id,title — только нужные поля: в SELECT попадают только их столбцы,
+а теги игр и игры подборок читаются одним дополнительным запросом на
+страницу и только если поле запрошено.
+"""
+from collections import defaultdict
+
+from .models import Collection, Game, GameCollection, Tag
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MAX_BATCH_SIZE = 500
+
+
+class ApiError(ValueError):
+    pass
+
+
+def _game_tags(ids):
+    tags = defaultdict(list)
+    rows = Game.tags.through.objects.filter(game_id__in=ids).order_by('tag__name').values_list('game_id', 'tag__name')
+    for game_id, name in rows:
+        tags[game_id].append(name)
+    return tags
+
+
+def _collection_games(ids):
+    games = defaultdict(list)
+    rows = GameCollection.objects.filter(collection_id__in=ids).order_by('order', 'id').values_list(
+        'collection_id', 'game_id'
+    )
+    for collection_id, game_id in rows:
+        games[collection_id].append(game_id)
+    return games
+
+
+class Resource:
+    """
+    columns — поле ответа → выражение для values(); related — поле → функция,
+    которая по списку id возвращает {id: значение} одним запросом.
+    """
+
+    def __init__(self, queryset, columns, related=None):
+        self.queryset = queryset
+        self.columns = columns
+        self.related = related or {}
+        self.fields = (*columns, *self.related)
+
+    def parse_fields(self, raw):
+        if not raw:
+            return self.fields
+        fields = [field.strip() for field in raw.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in self.fields]
+        if unknown:
+            raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+        # id нужен для курсора и для связанных полей
+        return ('id', *(field for field in fields if field != 'id'))
+
+    def _rows(self, queryset, fields):
+        columns = {field: self.columns[field] for field in fields if field in self.columns}
+        rows = [
+            {field: row[column] for field, column in columns.items()}
+            for row in queryset.values(*columns.values())
+        ]
+        ids = [row['id'] for row in rows]
+        for field in fields:
+            if field in self.related and ids:
+                values = self.related[field](ids)
+                for row in rows:
+                    row[field] = values.get(row['id'], [])
+        return rows
+
+    def page(self, fields, cursor=None, size=PAGE_SIZE):
+        queryset = self.queryset
+        if cursor:
+            _, last_id = decode_cursor(queryset.model, 'id', cursor)
+            queryset = queryset.filter(id__gt=last_id)
+        rows = self._rows(queryset.order_by('id')[:size + 1], fields)
+
+        next_cursor = None
+        if len(rows) > size:
+            last_id = rows[size - 1]['id']
+            next_cursor = encode_cursor(last_id, last_id)
+        return rows[:size], next_cursor
+
+    def batch(self, fields, ids):
+        found = {row['id']: row for row in self._rows(self.queryset.filter(id__in=ids), fields)}
+        return [found[pk] for pk in ids if pk in found], [pk for pk in ids if pk not in found]
+
+
+RESOURCES = {
+    'games': Resource(
+        Game.objects.all(),
+        {field: field for field in (
+            'id', 'title', 'genre', 'developer', 'release_year', 'price', 'platforms', 'rating',
+            'description', 'game_image', 'steam_url', 'created_at',
+        )},
+        {'tags': _game_tags},
+    ),
+    'tags': Resource(
+        Tag.objects.all(),
+        {field: field for field in ('id', 'name', 'slug', 'games_count')},
+    ),
+    'collections': Resource(
+        Collection.objects.alive().filter(is_public=True),
+        {
+            'id': 'id', 'title': 'title', 'description': 'description', 'user': 'user__username',
+            'games_count': 'games_count', 'likes_count': 'likes_count',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        {'games': _collection_games},
+    ),
+}
+
+
+def _parse_int(value, name):
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(f'{name} должно быть целым числом')
+    if number < 1:
+        raise ApiError(f'{name} должно быть положительным')
+    return number
+
+
+def fetch(name, params):
+    """Ответ API для ресурса name и параметров запроса; ошибки параметров — ApiError"""
+    resource = RESOURCES[name]
+    fields = resource.parse_fields(params.get('fields'))
+
+    if params.get('ids'):
+        ids = list(dict.fromkeys(_parse_int(value, 'id') for value in params['ids'].split(',') if value))
+        if len(ids) > MAX_BATCH_SIZE:
+            raise ApiError(f'Не больше {MAX_BATCH_SIZE} id за запрос')
+        results, missing = resource.batch(fields, ids)
+        return {'success': True, 'results': results, 'missing': missing}
+
+    size = min(_parse_int(params.get('limit', PAGE_SIZE), 'limit'), MAX_PAGE_SIZE)
+    try:
+        results, next_cursor = resource.page(fields, params.get('after'), size)
+    except InvalidCursor:
+        raise ApiError('Неверный курсор')
+    return {'success': True, 'results': results, 'next': next_cursor}
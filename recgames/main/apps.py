@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import catalog_snapshot
+
+        # только отображение файла в память; версия сверяется с БД при первом обращении к индексу
+        catalog_snapshot.open_snapshot()
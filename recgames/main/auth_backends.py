@@ -0,0 +1,33 @@
+"""
+Бэкенд аутентификации, который не ходит в auth_user на каждый запрос.
+
+AuthenticationMiddleware загружает пользователя из сессии при каждом запросе.
+CachedModelBackend держит его в кэше AUTH_USER_CACHE_TTL секунд; запись
+удаляется сигналами (main/signals.py) при любом сохранении или удалении
+пользователя, в том числе при смене пароля, блокировке и обновлении last_login.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def _user_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(_user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.AUTH_USER_CACHE_TTL)
+        # ModelBackend.get_user проверяет is_active, для записи из кэша проверяем сами
+        return user if self.user_can_authenticate(user) else None
+
@@ -0,0 +1,327 @@
+"""
+Нагрузочные сценарии и генератор синтетического каталога.
+
+Используется командой `manage.py bench`: она создаёт тестовую БД, заполняет
+её generate_catalog(scale) и прогоняет SCENARIOS через тестовый клиент.
+"""
+import json
+import random
+import time
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from . import compression, tag_stats
+from .jobs import games_count_subquery, likes_count_subquery
+from .models import Game, Tag, Collection, GameCollection, Favorite, CollectionLike
+
+BATCH_SIZE = 5000
+BENCH_USERNAME = 'bench'
+BENCH_PASSWORD = 'bench-password'
+
+
+@dataclass
+class Catalog:
+    game_ids: list
+    tag_names: list
+    collection_ids: list
+    user: User
+
+
+def _batched_create(model, objects):
+    for start in range(0, len(objects), BATCH_SIZE):
+        model.objects.bulk_create(objects[start:start + BATCH_SIZE], ignore_conflicts=True)
+
+
+def generate_catalog(scale, seed=42):
+    """
+    Заполняет БД каталогом из `scale` игр; остальные таблицы растут
+    пропорционально. Одинаковый seed даёт одинаковые данные.
+    """
+    rng = random.Random(seed)
+    genres = [value for value, _ in Game.GENRE_CHOICES]
+    platforms = [value for value, _ in Game.PLATFORM_CHOICES]
+
+    tag_count = max(20, min(200, scale // 50))
+    _batched_create(Tag, [Tag(name=f'tag-{i}', slug=f'tag-{i}') for i in range(tag_count)])
+    tag_ids = list(Tag.objects.order_by('id').values_list('id', flat=True))
+    tag_weights = [1 / (rank + 1) for rank in range(len(tag_ids))]
+
+    for start in range(0, scale, BATCH_SIZE):
+        Game.objects.bulk_create([
+            Game(
+                title=f'Game {i} {rng.choice(["Quest", "Saga", "Tactics", "Legends", "Online"])}',
+                genre=rng.choice(genres),
+                developer=f'Studio {i % 500}',
+                release_year=rng.randint(1990, 2025),
+                price=rng.randint(0, 5000),
+                platforms=rng.choice(platforms),
+                rating=rng.randint(0, 10),
+                description=f'Синтетическое описание игры {i}.',
+                game_image=f'https://example.com/covers/{i}.jpg',
+                steam_url=f'https://store.steampowered.com/app/{i}/',
+            )
+            for i in range(start, min(scale, start + BATCH_SIZE))
+        ])
+    game_ids = list(Game.objects.order_by('id').values_list('id', flat=True))
+
+    through = Game.tags.through
+    game_tags = []
+    for game_id in game_ids:
+        for tag_id in set(rng.choices(tag_ids, weights=tag_weights, k=rng.randint(3, 8))):
+            game_tags.append(through(game_id=game_id, tag_id=tag_id))
+    _batched_create(through, game_tags)
+
+    user_count = max(10, min(10_000, scale // 100))
+    password = make_password(BENCH_PASSWORD)
+    _batched_create(User, [User(username=f'user{i}', email=f'user{i}@example.com', password=password)
+                           for i in range(user_count)])
+    bench_user, _ = User.objects.get_or_create(username=BENCH_USERNAME, defaults={'password': password})
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+
+    _batched_create(Collection, [
+        Collection(user_id=user_id, title=f'Подборка {n} пользователя {user_id}',
+                   description='Синтетическая подборка', is_public=rng.random() < 0.8)
+        for user_id in user_ids for n in range(2)
+    ])
+    collection_ids = list(Collection.objects.order_by('id').values_list('id', flat=True))
+
+    _batched_create(GameCollection, [
+        GameCollection(collection_id=collection_id, game_id=game_id, order=position)
+        for collection_id in collection_ids
+        for position, game_id in enumerate(rng.sample(game_ids, min(len(game_ids), rng.randint(5, 30))), 1)
+    ])
+    _batched_create(Favorite, [
+        Favorite(user_id=user_id, game_id=game_id)
+        for user_id in user_ids
+        for game_id in rng.sample(game_ids, min(len(game_ids), 20))
+    ])
+    _batched_create(CollectionLike, [
+        CollectionLike(user_id=user_id, collection_id=collection_id)
+        for user_id in user_ids
+        for collection_id in rng.sample(collection_ids, min(len(collection_ids), 5))
+    ])
+
+    # bulk_create не вызывает сигналы, поэтому счётчики пересчитываются отдельно
+    Collection.objects.update(games_count=games_count_subquery(), likes_count=likes_count_subquery())
+    tag_stats.rebuild()
+
+    return Catalog(
+        game_ids=game_ids,
+        tag_names=list(Tag.objects.order_by('id').values_list('name', flat=True)),
+        collection_ids=list(Collection.objects.filter(is_public=True).values_list('id', flat=True)),
+        user=bench_user,
+    )
+
+
+def load_catalog():
+    """Каталог, уже сгенерированный в БД ранее (для --keepdb)"""
+    return Catalog(
+        game_ids=list(Game.objects.order_by('id').values_list('id', flat=True)),
+        tag_names=list(Tag.objects.order_by('id').values_list('name', flat=True)),
+        collection_ids=list(Collection.objects.alive().filter(is_public=True).values_list('id', flat=True)),
+        user=User.objects.get(username=BENCH_USERNAME),
+    )
+
+
+def _post_json(client, url, payload):
+    return client.post(url, json.dumps(payload), content_type='application/json')
+
+
+def _recommendations(tag_count):
+    def scenario(client, catalog, rng):
+        tags = catalog.tag_names[:tag_count]
+        return _post_json(client, '/recommendations/get/', {'include_tags': tags, 'exclude_tags': []})
+    return scenario
+
+
+def _recommendations_facets(client, catalog, rng):
+    return _post_json(client, '/recommendations/get/', {
+        'include_tags': catalog.tag_names[:1],
+        'exclude_tags': [],
+        'facets': {'genres': ['RPG', 'Strategy'], 'platforms': ['PC'], 'year_min': 2010, 'price_max': 1999},
+    })
+
+
+def _login(client, catalog, rng):
+    # отдельный анонимный клиент: основной может быть уже залогинен
+    return Client().post('/login/', {'username': BENCH_USERNAME, 'password': BENCH_PASSWORD})
+
+
+def _toggle_favorite_game(client, catalog, rng):
+    # два переключения подряд возвращают состояние к исходному
+    url = f'/game/{rng.choice(catalog.game_ids)}/toggle-favorite/'
+    client.post(url)
+    return client.post(url)
+
+
+def _toggle_favorite_collection(client, catalog, rng):
+    url = f'/collection/{rng.choice(catalog.collection_ids)}/toggle-favorite/'
+    client.post(url)
+    return client.post(url)
+
+
+SCENARIOS = {
+    'home': lambda client, catalog, rng: client.get('/'),
+    'recommendations_page': lambda client, catalog, rng: client.get('/recommendations/'),
+    **{f'get_recommendations_{n}_tags': _recommendations(n) for n in (0, 1, 2, 5, 10)},
+    'get_recommendations_facets': _recommendations_facets,
+    'related_tags': lambda client, catalog, rng: client.get(
+        '/recommendations/related-tags/', {'tag': rng.sample(catalog.tag_names, 2)}
+    ),
+    'search': lambda client, catalog, rng: client.get('/search/', {'q': f'Game {rng.randint(0, 99)}'}),
+    'collections': lambda client, catalog, rng: client.get('/collections/'),
+    'collection_detail': lambda client, catalog, rng: client.get(
+        f'/collection/{rng.choice(catalog.collection_ids)}/'
+    ),
+    'game_detail': lambda client, catalog, rng: client.get(f'/game/{rng.choice(catalog.game_ids)}/'),
+    'favorites': lambda client, catalog, rng: client.get('/favorites/'),
+    'login': _login,
+    'toggle_favorite_game': _toggle_favorite_game,
+    'toggle_favorite_collection': _toggle_favorite_collection,
+}
+
+
+# страницы, шаблоны которых замеряет render_templates
+RENDER_PAGES = ('home', 'recommendations_page', 'search', 'collections', 'collection_detail',
+                'game_detail', 'favorites')
+
+
+# ответы, размер и стоимость сжатия которых замеряет measure_wire;
+# рекомендации идут по возрастанию размера ответа
+WIRE_PAGES = RENDER_PAGES + tuple(f'get_recommendations_{n}_tags' for n in (10, 5, 2, 1, 0))
+
+
+@dataclass
+class Result:
+    name: str
+    latencies: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+
+    def percentile(self, values, p):
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self):
+        summary = {
+            'iterations': len(self.latencies),
+            'p50_ms': round(self.percentile(self.latencies, 50) * 1000, 3),
+            'p95_ms': round(self.percentile(self.latencies, 95) * 1000, 3),
+            'p99_ms': round(self.percentile(self.latencies, 99) * 1000, 3),
+        }
+        if self.queries:
+            summary['queries'] = self.percentile(self.queries, 50)
+        return summary
+
+
+def run_scenarios(catalog, names, iterations, warmup=2, seed=42, authenticated=True):
+    rng = random.Random(seed)
+    client = Client()
+    if authenticated:
+        client.force_login(catalog.user)
+
+    results = {}
+    for name in names:
+        scenario = SCENARIOS[name]
+        for _ in range(warmup):
+            scenario(client, catalog, rng)
+
+        result = Result(name)
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = scenario(client, catalog, rng)
+                result.latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{name}: HTTP {response.status_code}')
+            result.queries.append(len(captured))
+        results[name] = result.summary()
+    return results
+
+
+def render_templates(catalog, names, iterations, seed=42, authenticated=True):
+    """
+    Время рендеринга шаблона страницы без выполнения view и размер HTML.
+    Контекст берётся из настоящего ответа, поэтому запросы к БД в замер не входят.
+    """
+    rng = random.Random(seed)
+    client = Client()
+    if authenticated:
+        client.force_login(catalog.user)
+
+    results = {}
+    for name in names:
+        response = SCENARIOS[name](client, catalog, rng)
+        template_name = response.templates[0].name
+        # при include ответ содержит ContextList, первый контекст — самой страницы
+        context = response.context[0] if isinstance(response.context, list) else response.context
+        context = context.flatten()
+        request = response.wsgi_request
+
+        result = Result(template_name)
+        for _ in range(iterations):
+            start = time.perf_counter()
+            html = render_to_string(template_name, context, request=request)
+            result.latencies.append(time.perf_counter() - start)
+        summary = result.summary()
+        summary['bytes'] = len(html.encode())
+        results[f'render:{template_name}'] = summary
+    return results
+
+
+def _timed(function, argument, iterations, name):
+    result = Result(name)
+    for _ in range(iterations):
+        start = time.perf_counter()
+        output = function(argument)
+        result.latencies.append(time.perf_counter() - start)
+    return output, result.summary()
+
+
+def measure_wire(catalog, names, iterations, seed=42, authenticated=True):
+    """
+    Размер ответа без сжатия, после минификации HTML и после каждого
+    доступного кодировщика, а также процессорное время минификации и сжатия.
+    """
+    rng = random.Random(seed)
+    client = Client()
+    if authenticated:
+        client.force_login(catalog.user)
+
+    results = {}
+    for name in names:
+        # без Accept-Encoding CompressionMiddleware возвращает тело как есть
+        content = SCENARIOS[name](client, catalog, rng).content
+        results[f'wire:{name}:identity'] = {'bytes': len(content)}
+
+        if content.lstrip().startswith(b'<'):
+            html, summary = _timed(compression.minify_html, content.decode(), iterations, name)
+            content = html.encode()
+            results[f'wire:{name}:minified'] = {**summary, 'bytes': len(content)}
+
+        for encoding, encoder in compression.ENCODERS.items():
+            compressed, summary = _timed(encoder, content, iterations, name)
+            results[f'wire:{name}:{encoding}'] = {**summary, 'bytes': len(compressed)}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Сценарии, которые стали медленнее базовой линии больше чем на threshold или делают больше запросов"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if 'p95_ms' in current and current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} → {current['p95_ms']} мс")
+        if current.get('queries', 0) > previous.get('queries', 0):
+            regressions.append(f"{name}: запросов {previous['queries']} → {current['queries']}")
+        if current.get('bytes', 0) > previous.get('bytes', 0) * (1 + threshold):
+            regressions.append(f"{name}: размер {previous['bytes']} → {current['bytes']} байт")
+    return regressions
@@ -0,0 +1,334 @@
+"""
+Индекс каталога в памяти процесса для фасетного подбора рекомендаций.
+
+Игры пронумерованы по порядку выдачи (рейтинг, затем новые выше), и каждое
+множество игр — значение жанра, платформы, десятилетия, ценового диапазона,
+тега — хранится битовой маской в виде int: бит i означает i-ю игру. Отбор —
+это побитовое И, счётчик — int.bit_count(), поэтому ответ со всеми фасетами
+считается за единицы миллисекунд без обращения к БД. Год и цена хранятся
+ещё и отсортированными столбцами для фильтра по произвольному диапазону.
+
+Счётчик значения фасета — сколько игр осталось бы, если выбрать это значение
+при остальных фильтрах как есть (фильтр самого фасета не учитывается), как
+в привычных фасетных каталогах.
+
+Индекс перестраивается при первом обращении после изменения каталога:
+сигналы (main/signals.py) через шину инвалидации (main/invalidation.py)
+вызывают invalidate() в каждом процессе, она увеличивает версию в кэше,
+и процесс сверяет её со своей. Если снимок каталога на диске
+(main/catalog_snapshot.py) соответствует БД, индекс берётся из него без
+запросов к таблицам игр и тегов.
+"""
+import hashlib
+import json
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from itertools import accumulate, compress
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import catalog_snapshot
+from .models import Game, Tag
+
+VERSION_KEY = 'catalog_index:version'
+
+# (ключ, нижняя граница, верхняя граница включительно)
+PRICE_BUCKETS = [
+    ('free', 0, 0),
+    ('0-499', 1, 499),
+    ('500-999', 500, 999),
+    ('1000-1999', 1000, 1999),
+    ('2000+', 2000, None),
+]
+
+# на сколько блоков делится отсортированный столбец для фильтра по диапазону
+RANGE_BLOCKS = 64
+
+# '0'/'1' → байты 0/1 для itertools.compress
+BIT_CHARS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def price_bucket(price):
+    for key, low, high in PRICE_BUCKETS:
+        if price >= low and (high is None or price <= high):
+            return key
+    return None
+
+
+def decade(year):
+    return f'{year // 10 * 10}'
+
+
+def _optional_int(value):
+    return None if value in (None, '') else int(value)
+
+
+def bitmap(positions, size):
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class TitleIndex:
+    """
+    Названия в порядке выдачи одной строкой через перевод строки, в casefold:
+    поиск подстроки — str.find на C, номер игры — bisect по началам строк.
+    """
+
+    def __init__(self, text, starts):
+        self.text = text
+        self.starts = starts
+
+    @classmethod
+    def from_titles(cls, titles):
+        folded = [title.replace('\n', ' ').casefold() for title in titles]
+        starts = list(accumulate((len(title) + 1 for title in folded[:-1]), initial=0))
+        return cls('\n'.join(folded), starts)
+
+    def find(self, query, limit):
+        query = query.casefold()
+        positions = []
+        offset = self.text.find(query)
+        while offset != -1 and len(positions) < limit:
+            position = bisect_right(self.starts, offset) - 1
+            positions.append(position)
+            # следующее вхождение ищем со следующего названия
+            next_start = self.starts[position + 1] if position + 1 < len(self.starts) else len(self.text)
+            offset = self.text.find(query, next_start)
+        return positions
+
+
+def select(mask, items):
+    """Элементы items, чьи номера отмечены в маске, в исходном порядке"""
+    bits = format(mask, f'0{len(items)}b')[::-1].encode().translate(BIT_CHARS)
+    return list(compress(items, bits))
+
+
+@dataclass
+class Selection:
+    include_tags: list = field(default_factory=list)
+    exclude_tags: list = field(default_factory=list)
+    genres: list = field(default_factory=list)
+    platforms: list = field(default_factory=list)
+    year_min: int = None
+    year_max: int = None
+    price_min: int = None
+    price_max: int = None
+
+    @classmethod
+    def from_request_data(cls, data):
+        facets = data.get('facets') or {}
+        return cls(
+            include_tags=list(data.get('include_tags', [])),
+            exclude_tags=list(data.get('exclude_tags', [])),
+            genres=list(facets.get('genres', [])),
+            platforms=list(facets.get('platforms', [])),
+            year_min=_optional_int(facets.get('year_min')),
+            year_max=_optional_int(facets.get('year_max')),
+            price_min=_optional_int(facets.get('price_min')),
+            price_max=_optional_int(facets.get('price_max')),
+        )
+
+    def cache_key(self):
+        """Одинаковый для выборов, отличающихся только порядком значений"""
+        canonical = {
+            name: sorted(value) if isinstance(value, list) else value
+            for name, value in asdict(self).items()
+        }
+        return hashlib.sha1(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+class RangeColumn:
+    """
+    Столбец, отсортированный по значению, разбитый на RANGE_BLOCKS блоков с
+    готовыми масками. Диапазон собирается из масок целых блоков и поштучно
+    из двух граничных. values и positions могут быть memoryview из снимка.
+    """
+
+    def __init__(self, values, positions, size, blocks):
+        self.values = values
+        self.positions = positions
+        self.size = size
+        self.blocks = blocks
+
+    @classmethod
+    def from_values(cls, values, size):
+        order = sorted(range(len(values)), key=values.__getitem__)
+        step = max(1, -(-len(order) // RANGE_BLOCKS))
+        blocks = [
+            (start, min(start + step, len(order)), bitmap(order[start:start + step], size))
+            for start in range(0, len(order), step)
+        ]
+        return cls([values[position] for position in order], order, size, blocks)
+
+    def between(self, low, high):
+        start = 0 if low is None else bisect_left(self.values, low)
+        end = len(self.values) if high is None else bisect_right(self.values, high)
+        mask = 0
+        partial = []
+        for block_start, block_end, block_mask in self.blocks:
+            if block_end <= start or block_start >= end:
+                continue
+            if start <= block_start and block_end <= end:
+                mask |= block_mask
+            else:
+                partial.extend(self.positions[max(start, block_start):min(end, block_end)])
+        return mask | bitmap(partial, self.size)
+
+
+class CatalogIndex:
+    def __init__(self, ranked_ids, facets, years, prices, by_tag, tag_ids, titles):
+        self.size = len(ranked_ids)
+        self.ranked_ids = ranked_ids
+        self.facets = facets
+        self.all_mask = (1 << self.size) - 1
+        self.years = years
+        self.prices = prices
+        self.by_tag = by_tag
+        self.tag_ids = tag_ids
+        self.titles = titles
+
+    @classmethod
+    def from_rows(cls, games, game_tags, tags):
+        """
+        games — (id, title, genre, platforms, release_year, price, rating),
+        game_tags — (game_id, tag_id), tags — (id, name)
+        """
+        # порядок выдачи: по рейтингу, новые игры (больший id) выше
+        games = sorted(games, key=lambda game: (-game[6], -game[0]))
+        size = len(games)
+        ranked_ids = [game[0] for game in games]
+        position_of = {game_id: position for position, game_id in enumerate(ranked_ids)}
+
+        groups = {'genres': defaultdict(list), 'platforms': defaultdict(list),
+                  'decades': defaultdict(list), 'prices': defaultdict(list)}
+        for position, (game_id, title, genre, platform, year, price, rating) in enumerate(games):
+            groups['genres'][genre].append(position)
+            groups['platforms'][platform].append(position)
+            groups['decades'][decade(year)].append(position)
+            groups['prices'][price_bucket(price)].append(position)
+        facets = {
+            facet: {value: bitmap(members, size) for value, members in values.items()}
+            for facet, values in groups.items()
+        }
+
+        tag_members = defaultdict(list)
+        for game_id, tag_id in game_tags:
+            tag_members[tag_id].append(position_of[game_id])
+
+        return cls(
+            ranked_ids=ranked_ids,
+            facets=facets,
+            years=RangeColumn.from_values([game[4] for game in games], size),
+            prices=RangeColumn.from_values([game[5] for game in games], size),
+            by_tag={tag_id: bitmap(members, size) for tag_id, members in tag_members.items()},
+            tag_ids={name: tag_id for tag_id, name in tags},
+            titles=TitleIndex.from_titles([game[1] for game in games]),
+        )
+
+    def _tag_mask(self, selection):
+        # неизвестные теги (удалённые или устаревшие в закладке) пропускаются,
+        # а не обнуляют выдачу
+        mask = self.all_mask
+        for name in selection.include_tags:
+            if name in self.tag_ids:
+                mask &= self.by_tag.get(self.tag_ids[name], 0)
+        for name in selection.exclude_tags:
+            if name in self.tag_ids:
+                mask &= ~self.by_tag.get(self.tag_ids[name], 0)
+        return mask
+
+    def _facet_filters(self, selection):
+        """Фасет → маска подходящих под его фильтр игр; фасеты без фильтра пропускаются"""
+        filters = {}
+        for facet, chosen in (('genres', selection.genres), ('platforms', selection.platforms)):
+            if chosen:
+                mask = 0
+                for value in chosen:
+                    mask |= self.facets[facet].get(value, 0)
+                filters[facet] = mask
+        if selection.year_min is not None or selection.year_max is not None:
+            filters['decades'] = self.years.between(selection.year_min, selection.year_max)
+        if selection.price_min is not None or selection.price_max is not None:
+            filters['prices'] = self.prices.between(selection.price_min, selection.price_max)
+        return filters
+
+    def search(self, selection):
+        """(id игр по порядку выдачи, счётчики фасетов)"""
+        base = self._tag_mask(selection)
+        filters = self._facet_filters(selection)
+
+        matches = base
+        for mask in filters.values():
+            matches &= mask
+
+        facets = {}
+        for facet, values in self.facets.items():
+            candidates = base
+            for name, mask in filters.items():
+                if name != facet:
+                    candidates &= mask
+            counts = {value: (candidates & mask).bit_count() for value, mask in values.items()}
+            facets[facet] = {value: count for value, count in counts.items() if count}
+
+        return select(matches, self.ranked_ids), facets
+
+    def search_titles(self, query, limit):
+        """id игр, в названии которых есть query без учёта регистра, по порядку выдачи"""
+        return [self.ranked_ids[position] for position in self.titles.find(query, limit)]
+
+
+def index_from_db():
+    return CatalogIndex.from_rows(
+        Game.objects.values_list(
+            'id', 'title', 'genre', 'platforms', 'release_year', 'price', 'rating'
+        ).iterator(),
+        Game.tags.through.objects.values_list('game_id', 'tag_id').iterator(),
+        Tag.objects.values_list('id', 'name'),
+    )
+
+
+def build_index():
+    """Индекс из снимка (main/catalog_snapshot.py), если он соответствует БД, иначе из БД"""
+    version = catalog_snapshot.db_version()
+    index = catalog_snapshot.load(version)
+    if index is None:
+        index = index_from_db()
+        if settings.CATALOG_SNAPSHOT_AUTO_WRITE:
+            # следующие процессы стартуют уже с этого снимка
+            catalog_snapshot.write(index, version)
+    return index
+
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def version():
+    return cache.get_or_set(VERSION_KEY, time.time_ns, None)
+
+
+def get_index():
+    global _index, _index_version
+    current = version()
+    if _index is not None and _index_version == current:
+        return _index
+
+    with _lock:
+        if _index is None or _index_version != current:
+            _index = build_index()
+            _index_version = current
+    return _index
+
+
+def invalidate():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
@@ -0,0 +1,208 @@
+"""
+Снимок индекса каталога на диске для быстрого старта воркеров.
+
+Снимок — файл CATALOG_SNAPSHOT_PATH с готовым индексом (main/catalog_index.py):
+id игр в порядке выдачи, отсортированные столбцы года и цены — массивами
+int64, маски фасетов и тегов — байтами, названия — одной строкой UTF-8.
+MainConfig.ready отображает файл в память (mmap) без запросов к БД.
+
+Общими между процессами остаются только массивы int64 (ranked_ids, столбцы
+года и цены, начала названий): они читаются прямо из отображения, и их
+страницы делятся в page cache. Маски превращаются в int через
+int.from_bytes, а названия — в str, это копии в памяти каждого процесса.
+Поэтому снимок экономит в первую очередь время старта (нет запросов к БД),
+а не память.
+
+В заголовке записана версия каталога db_version(): ревизия CatalogRevision,
+которую сигналы увеличивают при изменении игр, тегов и их связей, плюс
+максимальные id строк (bulk_create сигналов не отправляет).
+Индекс берётся из снимка, только если версия совпадает с БД; иначе он
+строится из БД и при CATALOG_SNAPSHOT_AUTO_WRITE записывается новый снимок.
+Записать снимок вручную — `manage.py build_catalog_snapshot`.
+
+Формат: MAGIC, длина заголовка (uint64 LE), заголовок JSON, затем секции,
+выровненные по 8 байт; смещения секций в заголовке отсчитываются от начала
+первой секции.
+"""
+import json
+import mmap
+import struct
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F, Max
+
+from . import catalog_index
+from .models import CatalogRevision, Game, Tag
+
+MAGIC = b'RGCATSNP'
+FORMAT = 1
+ALIGN = 8
+LENGTH = struct.Struct('<Q')
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def bump_revision():
+    if not CatalogRevision.objects.filter(pk=1).update(revision=F('revision') + 1):
+        CatalogRevision.objects.get_or_create(pk=1, defaults={'revision': 1})
+
+
+def db_version():
+    # Max(id) — поиск по индексу первичного ключа, без подсчёта строк
+    revision = CatalogRevision.objects.filter(pk=1).values_list('revision', flat=True).first() or 0
+    last_ids = [
+        model.objects.aggregate(last=Max('id'))['last']
+        for model in (Game, Game.tags.through, Tag)
+    ]
+    return ':'.join(str(value) for value in [revision, *last_ids])
+
+
+def _padding(length):
+    return -length % ALIGN
+
+
+class _Writer:
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def add(self, data):
+        """Добавляет секцию и возвращает её [смещение, длина]"""
+        section = [self.offset, len(data)]
+        self.chunks.append(data)
+        self.chunks.append(b'\0' * _padding(len(data)))
+        self.offset += len(data) + _padding(len(data))
+        return section
+
+    def add_int64(self, values):
+        return self.add(array('q', values).tobytes())
+
+    def add_mask(self, mask, size):
+        return self.add(mask.to_bytes((size + 7) // 8, 'little'))
+
+
+def _column_header(writer, column, size):
+    return {
+        'values': writer.add_int64(column.values),
+        'positions': writer.add_int64(column.positions),
+        'blocks': [[start, end, writer.add_mask(mask, size)] for start, end, mask in column.blocks],
+    }
+
+
+def write(index, version, path=None):
+    """Записывает индекс во временный файл и подменяет им снимок: читатели не увидят недописанный файл"""
+    path = Path(path or settings.CATALOG_SNAPSHOT_PATH)
+    size = index.size
+    writer = _Writer()
+    header = {
+        'format': FORMAT,
+        'version': version,
+        'size': size,
+        'ranked_ids': writer.add_int64(index.ranked_ids),
+        'facets': {
+            facet: {value: writer.add_mask(mask, size) for value, mask in values.items()}
+            for facet, values in index.facets.items()
+        },
+        'years': _column_header(writer, index.years, size),
+        'prices': _column_header(writer, index.prices, size),
+        'by_tag': {str(tag_id): writer.add_mask(mask, size) for tag_id, mask in index.by_tag.items()},
+        'tag_ids': index.tag_ids,
+        'titles': {
+            'text': writer.add(index.titles.text.encode()),
+            'starts': writer.add_int64(index.titles.starts),
+        },
+    }
+    encoded = json.dumps(header, ensure_ascii=False).encode()
+    encoded += b' ' * _padding(len(MAGIC) + LENGTH.size + len(encoded))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as temporary:
+        temporary.write(MAGIC)
+        temporary.write(LENGTH.pack(len(encoded)))
+        temporary.write(encoded)
+        for chunk in writer.chunks:
+            temporary.write(chunk)
+    Path(temporary.name).replace(path)
+    return path.stat().st_size
+
+
+class Snapshot:
+    def __init__(self, mapped):
+        view = memoryview(mapped)
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError('Файл не является снимком каталога')
+        (header_length,) = LENGTH.unpack_from(view, len(MAGIC))
+        start = len(MAGIC) + LENGTH.size
+        self.header = json.loads(bytes(view[start:start + header_length]))
+        if self.header['format'] != FORMAT:
+            raise ValueError(f'Неподдерживаемый формат снимка: {self.header["format"]}')
+        self.data = view[start + header_length:]
+        self.version = self.header['version']
+
+    def _bytes(self, section):
+        offset, length = section
+        return self.data[offset:offset + length]
+
+    def _int64(self, section):
+        return self._bytes(section).cast('q')
+
+    def _mask(self, section):
+        return int.from_bytes(self._bytes(section), 'little')
+
+    def _column(self, column):
+        return catalog_index.RangeColumn(
+            values=self._int64(column['values']),
+            positions=self._int64(column['positions']),
+            size=self.header['size'],
+            blocks=[(start, end, self._mask(section)) for start, end, section in column['blocks']],
+        )
+
+    def index(self):
+        header = self.header
+        return catalog_index.CatalogIndex(
+            ranked_ids=self._int64(header['ranked_ids']),
+            facets={
+                facet: {value: self._mask(section) for value, section in values.items()}
+                for facet, values in header['facets'].items()
+            },
+            years=self._column(header['years']),
+            prices=self._column(header['prices']),
+            by_tag={int(tag_id): self._mask(section) for tag_id, section in header['by_tag'].items()},
+            tag_ids=header['tag_ids'],
+            titles=catalog_index.TitleIndex(
+                text=str(self._bytes(header['titles']['text']), 'utf-8'),
+                starts=self._int64(header['titles']['starts']),
+            ),
+        )
+
+
+def open_snapshot(path=None):
+    """Отображает файл снимка в память; без файла или при ошибке формата — None"""
+    global _snapshot
+    path = Path(path or settings.CATALOG_SNAPSHOT_PATH)
+    try:
+        with open(path, 'rb') as file:
+            # отображение остаётся действительным и после закрытия файла
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        snapshot = Snapshot(mapped)
+    except (OSError, ValueError):
+        snapshot = None
+    with _lock:
+        _snapshot = snapshot
+    return snapshot
+
+
+def load(version):
+    """Индекс из снимка, если версия снимка совпадает с версией БД, иначе None"""
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        # снимок мог обновить другой процесс
+        snapshot = open_snapshot()
+    if snapshot is None or snapshot.version != version:
+        return None
+    return snapshot.index()
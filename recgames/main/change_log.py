@@ -0,0 +1,70 @@
+"""
+Лента изменений каталога: что поменялось в ресурсах API (main/api.py) после
+версии X.
+
+Сигналы (main/signals.py) в той же транзакции, что и изменение, вызывают
+record('ресурс', ids). id записи ChangeLog растёт монотонно и служит версией.
+У объекта остаётся только последняя запись: предыдущие удаляются, поэтому
+лента не длиннее числа объектов. Объект, которого больше нет в ресурсе
+(удалённая игра, удалённая или ставшая приватной подборка), записывается
+с deleted=True — это надгробие, его клиент применяет как удаление.
+
+Синхронизация клиента: запомнить version из /api/changes/ без since,
+скачать ресурсы целиком, затем запрашивать /api/changes/?since=version и
+дочитывать изменённые объекты через ids=. Изменения в обход сигналов
+(bulk_create, queryset.update, tag_stats.rebuild) в ленту не попадают.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ChangeLog
+
+FEED_LIMIT = 500
+MAX_FEED_LIMIT = 5000
+
+
+def record(resource, ids):
+    from .api import RESOURCES
+
+    ids = set(ids)
+    if not ids:
+        return
+    alive = set(RESOURCES[resource].queryset.filter(id__in=ids).order_by().values_list('id', flat=True))
+    # обычно вызывается из сигнала внутри транзакции изменения: точка сохранения не нужна
+    with transaction.atomic(savepoint=False):
+        ChangeLog.objects.filter(resource=resource, object_id__in=ids).delete()
+        ChangeLog.objects.bulk_create([
+            ChangeLog(resource=resource, object_id=object_id, deleted=object_id not in alive)
+            for object_id in sorted(ids)
+        ])
+
+
+def current_version():
+    return ChangeLog.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def changes(since, limit=FEED_LIMIT):
+    """
+    Изменения с версией больше since, не больше limit, и версия, с которой
+    продолжать. Лента обрывается на первой записи моложе CHANGE_FEED_LAG
+    секунд: меньшие версии ещё могут быть в незакоммиченных параллельных
+    транзакциях, и клиент не должен проскочить их.
+    """
+    rows = ChangeLog.objects.filter(id__gt=since).order_by('id').values_list(
+        'id', 'resource', 'object_id', 'deleted', 'created_at'
+    )[:limit + 1]
+    settled_before = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_LAG)
+
+    result = []
+    has_more = False
+    for row_id, resource, object_id, deleted, created_at in rows:
+        if len(result) == limit or created_at > settled_before:
+            has_more = True
+            break
+        result.append({'version': row_id, 'resource': resource, 'id': object_id, 'deleted': deleted})
+    version = result[-1]['version'] if result else since
+    return result, version, has_more
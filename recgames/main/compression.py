@@ -0,0 +1,114 @@
+"""
+Сжатие и минификация ответов (см. CompressionMiddleware и HtmlMinifyMiddleware
+в main/middleware.py) и компактный JSON.
+
+Brotli и orjson необязательны: если пакеты установлены, они используются
+автоматически, иначе остаются gzip и стандартный json.
+
+Против BREACH gzip, как и в GZipMiddleware Django, дописывает в заголовок до
+GZIP_MAX_RANDOM_BYTES случайных байт, чтобы длина ответа не выдавала
+совпадения секрета с отражённым вводом. У brotli такой возможности нет;
+CSRF-токен Django маскирует заново в каждом ответе.
+"""
+import json
+import re
+from functools import partial
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BROTLI_QUALITY = 5
+# то же значение, что у django.middleware.gzip.GZipMiddleware
+GZIP_MAX_RANDOM_BYTES = 100
+
+
+def compress_brotli(content):
+    # качество 11 (по умолчанию) слишком медленное для динамических страниц
+    return brotli.compress(content, quality=BROTLI_QUALITY)
+
+
+# в порядке предпочтения
+ENCODERS = {'gzip': partial(compress_string, max_random_bytes=GZIP_MAX_RANDOM_BYTES)}
+if brotli is not None:
+    ENCODERS = {'br': compress_brotli, **ENCODERS}
+
+
+def _quality(value):
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def accepted_encodings(accept_encoding):
+    """Разбирает Accept-Encoding в {кодировка: q}; q по умолчанию 1"""
+    accepted = {}
+    for item in accept_encoding.lower().split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                quality = _quality(value.strip())
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(accept_encoding):
+    """
+    Кодировка с наибольшим q, при равных — по порядку ENCODERS. q=0 запрещает
+    кодировку, * относится ко всем не перечисленным явно.
+    """
+    accepted = accepted_encodings(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ENCODERS:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+# содержимое этих тегов выводится как есть, пробелы в нём значимы
+PRESERVED = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2>)', re.IGNORECASE | re.DOTALL)
+LINE_BREAKS = re.compile(r'\s*\n\s*')
+
+
+def minify_html(html):
+    """Схлопывает отступы и пустые строки; пробелы внутри строки не трогает"""
+    parts = PRESERVED.split(html)
+    result = []
+    # split с двумя группами возвращает [текст, тег целиком, имя тега, текст, ...]
+    for index in range(0, len(parts), 3):
+        result.append(LINE_BREAKS.sub('\n', parts[index]))
+        if index + 1 < len(parts):
+            result.append(parts[index + 1])
+    return ''.join(result).strip()
+
+
+def dumps(data):
+    """JSON без пробелов между элементами и без \\u-экранирования кириллицы"""
+    if orjson is not None:
+        return orjson.dumps(data, default=DjangoJSONEncoder().default)
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+class CompactJsonResponse(HttpResponse):
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,148 @@
+"""
+Удаление подборок и пользователей пачками в фоне.
+
+collection.delete() и удаление пользователя через ORM загружают все
+зависимые строки в память и отправляют сигналы по каждой, а SQLite всё это
+время заблокирован на запись. Здесь удаление идёт в два шага:
+
+- schedule_*: в запросе пользователя подборки помечаются is_deleted
+  (Collection.objects.alive() их больше не видит), пользователь
+  блокируется, кэши сбрасываются, в ленту изменений пишутся надгробия,
+  ставится фоновая задача;
+- задача удаляет зависимые строки пачками по DELETE_BATCH_SIZE: одним
+  DELETE ... WHERE id IN (...) в короткой транзакции, без загрузки
+  объектов и сигналов. То, что делали бы сигналы (счётчики лайков,
+  состояние пользователей, лента изменений), делается одним запросом на
+  пачку.
+
+Так же пачками сбрасываются лайки подборок (reset_likes).
+"""
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import change_log, invalidation, jobs, preferences
+from .models import Collection, CollectionLike, Favorite, GameCollection, Recommendation, UserProfile
+
+DELETE_BATCH_SIZE = 500
+
+
+def _raw_delete(model, ids):
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(ids))})', ids)
+
+
+def _delete_in_batches(job, queryset, done, fields=(), on_batch=None):
+    """
+    Удаляет строки queryset пачками, каждую в своей транзакции; on_batch
+    получает значения fields удалённых строк. Возвращает обновлённый счётчик done.
+    """
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by().values_list('id', *fields)[:DELETE_BATCH_SIZE])
+            if not rows:
+                return done
+            _raw_delete(queryset.model, [row[0] for row in rows])
+            if on_batch:
+                on_batch([row[1:] for row in rows])
+        done += len(rows)
+        job.report(done)
+
+
+def _mark_collections(collection_ids, owner_ids):
+    Collection.objects.filter(id__in=collection_ids).update(is_deleted=True)
+    UserProfile.objects.filter(user_id__in=owner_ids).update(collections_count=jobs.collections_count_subquery())
+    change_log.record('collections', collection_ids)
+    invalidation.publish('collection', *collection_ids)
+    invalidation.publish('user_state', *owner_ids)
+
+
+def schedule_collections_deletion(collections):
+    """Сразу скрывает подборки и ставит задачу удалить их строки"""
+    collection_ids = [collection.id for collection in collections]
+    owner_ids = {collection.user_id for collection in collections}
+    with transaction.atomic():
+        _mark_collections(collection_ids, owner_ids)
+        # игры подборок больше не влияют на предпочтения владельцев
+        for profile in UserProfile.objects.filter(user_id__in=owner_ids):
+            preferences.rebuild_affinity(profile)
+        return jobs.enqueue('purge_collections', collection_ids=collection_ids)
+
+
+def schedule_user_deletion(user):
+    """Блокирует пользователя, скрывает его подборки и ставит задачу удалить его данные"""
+    with transaction.atomic():
+        User.objects.filter(id=user.id).update(is_active=False)
+        invalidation.publish('user', user.id)
+        collection_ids = list(Collection.objects.alive().filter(user_id=user.id).values_list('id', flat=True))
+        if collection_ids:
+            _mark_collections(collection_ids, [user.id])
+        return jobs.enqueue('purge_user', user_id=user.id)
+
+
+def _purge_collection(job, collection_id, done):
+    done = _delete_in_batches(job, GameCollection.objects.filter(collection_id=collection_id), done)
+    # у лайкнувших пропадает подборка из избранного
+    done = _delete_in_batches(
+        job,
+        CollectionLike.objects.filter(collection_id=collection_id),
+        done,
+        fields=('user_id',),
+        on_batch=lambda rows: invalidation.publish('user_state', *(user_id for user_id, in rows)),
+    )
+    _raw_delete(Collection, [collection_id])
+    return done + 1
+
+
+def purge_collections(job, collection_ids):
+    # только помеченные: подборку могли восстановить, пока задача ждала очереди
+    marked = Collection.objects.filter(id__in=collection_ids, is_deleted=True).values_list('id', flat=True)
+    done = 0
+    for collection_id in marked:
+        done = _purge_collection(job, collection_id, done)
+        job.report(done)
+
+
+def reset_likes(job, collection_ids):
+    """
+    Удаляет лайки подборок пачками и пересчитывает likes_count по оставшимся
+    строкам: лайк, поставленный во время сброса, счётчик не потеряет.
+    """
+    done = 0
+    for collection_id in collection_ids:
+        done = _delete_in_batches(
+            job,
+            CollectionLike.objects.filter(collection_id=collection_id),
+            done,
+            fields=('user_id',),
+            on_batch=lambda rows: invalidation.publish('user_state', *(user_id for user_id, in rows)),
+        )
+    with transaction.atomic():
+        Collection.objects.filter(id__in=collection_ids).update(likes_count=jobs.likes_count_subquery())
+        change_log.record('collections', collection_ids)
+        invalidation.publish('collection', *collection_ids)
+    job.report(done)
+
+
+def _unlike(rows):
+    # у пользователя один лайк на подборку, поэтому в пачке подборки не повторяются
+    collection_ids = [collection_id for collection_id, in rows]
+    Collection.objects.filter(id__in=collection_ids).update(likes_count=F('likes_count') - 1)
+    change_log.record('collections', collection_ids)
+    invalidation.publish('collection', *collection_ids)
+
+
+def purge_user(job, user_id):
+    done = 0
+    for collection_id in Collection.objects.filter(user_id=user_id).values_list('id', flat=True):
+        done = _purge_collection(job, collection_id, done)
+    done = _delete_in_batches(
+        job, CollectionLike.objects.filter(user_id=user_id), done, fields=('collection_id',), on_batch=_unlike,
+    )
+    done = _delete_in_batches(job, Favorite.objects.filter(user_id=user_id), done)
+    done = _delete_in_batches(job, Recommendation.objects.filter(user_id=user_id), done)
+    done = _delete_in_batches(job, UserProfile.objects.filter(user_id=user_id), done)
+    # тяжёлых связей не осталось, остальное (группы, журнал админки) удалит ORM
+    User.objects.filter(id=user_id).delete()
+    job.report(done + 1)
@@ -0,0 +1,71 @@
+"""
+Приём сообщений обратной связи.
+
+Каждый клиент получает ведро из FEEDBACK_BURST жетонов в кэше, которое
+пополняется на один жетон за FEEDBACK_REFILL_SECONDS секунд; сообщение без
+жетона отклоняется, не доходя до БД. Принятое сообщение сразу записывается
+одним INSERT: поток спама отсекает ведро, а не буферизация, поэтому
+сообщения не теряются при падении процесса.
+
+Клиент определяется по REMOTE_ADDR. За обратным прокси там адрес прокси, и
+все посетители попали бы в одно ведро, поэтому FEEDBACK_CLIENT_IP_HEADER
+задаёт заголовок с адресом клиента (например HTTP_X_FORWARDED_FOR).
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from .models import Feedback
+
+logger = logging.getLogger(__name__)
+
+
+def client_ip(request):
+    """
+    Адрес клиента из FEEDBACK_CLIENT_IP_HEADER, если он задан и есть в запросе,
+    иначе REMOTE_ADDR. Из списка через запятую берётся последний адрес — его
+    дописал наш прокси, остальные клиент мог подставить сам.
+    """
+    header = settings.FEEDBACK_CLIENT_IP_HEADER
+    if header:
+        addresses = [address.strip() for address in request.META.get(header, '').split(',')]
+        if addresses[-1]:
+            return addresses[-1]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def take_token(ip):
+    """
+    Забирает жетон из ведра IP. Чтение и запись не атомарны: при гонке
+    пройдёт лишнее сообщение, чего для защиты от спама достаточно.
+    """
+    key = f'feedback:bucket:{ip}'
+    now = time.time()
+    burst = settings.FEEDBACK_BURST
+    refill = settings.FEEDBACK_REFILL_SECONDS
+
+    tokens, updated_at = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated_at) / refill)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    # полное ведро набирается за burst * refill секунд, дольше хранить незачем
+    cache.set(key, (tokens, now), int(burst * refill) + 1)
+    return allowed
+
+
+def submit(name, email, message):
+    """Записывает сообщение; при ошибке БД пишет её в лог и возвращает None"""
+    try:
+        return Feedback.objects.create(name=name, email=email, message=message)
+    except DatabaseError:
+        logger.exception('Не удалось сохранить сообщение обратной связи')
+        return None
+
+
+def mark_processed(ids):
+    """Одним UPDATE отмечает сообщения обработанными; возвращает число изменённых"""
+    return Feedback.objects.filter(id__in=ids, is_processed=False).update(is_processed=True)
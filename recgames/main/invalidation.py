@@ -0,0 +1,221 @@
+"""
+Шина инвалидации кэшей между процессами.
+
+Индекс каталога и другие кэши живут в памяти каждого воркера, поэтому
+изменение, сделанное в одном процессе, остальные должны узнать. Сигналы
+(main/signals.py) публикуют события publish('тема', *ключи); обработчики
+подписываются через subscribe('тема', handler), handler получает множество
+ключей или None — «сбросить всё по теме».
+
+События копятся до коммита транзакции и обрабатываются после него одной
+пачкой: повторы схлопываются, тема без ключей поглощает ключи. Свой процесс
+вызывает обработчики сразу, остальным пачка уходит через транспорт
+INVALIDATION_TRANSPORT; внутри deferred() (его открывает
+InvalidationMiddleware на время запроса) отправка откладывается до конца блока.
+Остальные процессы опрашивают транспорт не чаще раза в
+INVALIDATION_POLL_INTERVAL секунд (poll) и тоже схлопывают всё, что пришло
+с прошлого опроса.
+
+Транспорты: OutboxTransport — таблица InvalidationEvent, общая для всех
+процессов с одной БД; LocalTransport — для одного процесса, никуда не отправляет.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import InvalidationEvent
+
+logger = logging.getLogger(__name__)
+
+_handlers = defaultdict(list)
+_pending = threading.local()
+
+_transport = None
+_transport_lock = threading.Lock()
+
+_poll_lock = threading.Lock()
+_polled_at = None
+
+_origin = (None, None)
+
+
+def origin():
+    """Имя процесса; считается заново после fork, чтобы воркеры не совпадали"""
+    global _origin
+    pid = os.getpid()
+    if _origin[0] != pid:
+        _origin = (pid, f'{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}')
+    return _origin[1]
+
+
+def merge(events, topic, keys):
+    """Добавляет ключи темы к events; None (всё по теме) поглощает отдельные ключи"""
+    if keys is None:
+        events[topic] = None
+    elif events.get(topic, ()) is not None:
+        events.setdefault(topic, set()).update(keys)
+
+
+def subscribe(topic, handler):
+    _handlers[topic].append(handler)
+
+
+def _flush_scheduled():
+    # при откате транзакции Django сам выбрасывает её on_commit, тогда flush ставится заново
+    return any(func is flush for _, func, _ in connection.run_on_commit)
+
+
+def publish(topic, *keys):
+    if not hasattr(_pending, 'events'):
+        _pending.events = {}
+    merge(_pending.events, topic, keys or None)
+    # вне транзакции flush выполнится сразу
+    if not _flush_scheduled():
+        transaction.on_commit(flush)
+
+
+def dispatch(events):
+    for topic, keys in events.items():
+        for handler in _handlers[topic]:
+            try:
+                handler(keys)
+            except Exception:
+                logger.exception('Ошибка обработчика инвалидации для темы %s', topic)
+
+
+def _send(events):
+    try:
+        get_transport().send(origin(), events)
+    except Exception:
+        logger.exception('Не удалось разослать события инвалидации')
+
+
+def flush():
+    events = getattr(_pending, 'events', None)
+    if not events:
+        return
+    _pending.events = {}
+
+    # свой процесс сбрасывает кэши сразу, чтобы запрос читал свои записи
+    dispatch(events)
+    outgoing = getattr(_pending, 'outgoing', None)
+    if outgoing is None:
+        _send(events)
+    else:
+        for topic, keys in events.items():
+            merge(outgoing, topic, keys)
+
+
+@contextmanager
+def deferred():
+    """Копит события для транспорта до конца блока и отправляет их одной пачкой"""
+    if getattr(_pending, 'outgoing', None) is not None:
+        # уже внутри deferred: отправит внешний блок
+        yield
+        return
+    _pending.outgoing = {}
+    try:
+        yield
+    finally:
+        outgoing = _pending.outgoing
+        _pending.outgoing = None
+        if outgoing:
+            _send(outgoing)
+
+
+class LocalTransport:
+    """Для одного процесса: события обрабатываются только там, где возникли"""
+
+    def send(self, origin, events):
+        pass
+
+    def receive(self, origin):
+        return {}
+
+
+class OutboxTransport:
+    """
+    События пишутся в таблицу InvalidationEvent, процессы читают новые строки.
+    Каждый опрос захватывает ещё overlap секунд до предыдущего: строки из
+    параллельных транзакций могут стать видны не в порядке id, поэтому
+    прочитанные id запоминаются на это время. Строки старше retention
+    удаляются не чаще раза в prune_interval секунд.
+    """
+
+    def __init__(self, overlap=5, retention=60 * 60, prune_interval=60):
+        self.overlap = timedelta(seconds=overlap)
+        self.retention = timedelta(seconds=retention)
+        self.prune_interval = prune_interval
+        self.polled_at = None
+        self.seen = {}
+        self.pruned_at = 0
+
+    def send(self, origin, events):
+        InvalidationEvent.objects.bulk_create([
+            InvalidationEvent(topic=topic, keys=None if keys is None else sorted(keys), origin=origin)
+            for topic, keys in events.items()
+        ])
+        if time.monotonic() - self.pruned_at >= self.prune_interval:
+            self.pruned_at = time.monotonic()
+            InvalidationEvent.objects.filter(created_at__lt=timezone.now() - self.retention).delete()
+
+    def receive(self, origin):
+        now = timezone.now()
+        if self.polled_at is None:
+            # при запуске кэши пусты, события до этого момента не нужны
+            self.polled_at = now
+            return {}
+
+        since = self.polled_at - self.overlap
+        rows = InvalidationEvent.objects.filter(created_at__gte=since).exclude(
+            id__in=list(self.seen)
+        ).values_list('id', 'topic', 'keys', 'origin', 'created_at')
+
+        events = {}
+        for event_id, topic, keys, sender, created_at in rows:
+            self.seen[event_id] = created_at
+            if sender != origin:
+                merge(events, topic, keys)
+
+        self.polled_at = now
+        self.seen = {event_id: created_at for event_id, created_at in self.seen.items()
+                     if created_at >= now - self.overlap}
+        return events
+
+
+def get_transport():
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            options = dict(settings.INVALIDATION_TRANSPORT)
+            _transport = import_string(options.pop('BACKEND'))(**options)
+    return _transport
+
+
+def poll(force=False):
+    """Обрабатывает события других процессов, если с прошлого опроса прошло достаточно времени"""
+    global _polled_at
+    now = time.monotonic()
+    if not force and _polled_at is not None and now - _polled_at < settings.INVALIDATION_POLL_INTERVAL:
+        return
+    # опрос уже идёт в соседнем потоке
+    if not _poll_lock.acquire(blocking=False):
+        return
+    try:
+        _polled_at = now
+        dispatch(get_transport().receive(origin()))
+    except Exception:
+        logger.exception('Не удалось получить события инвалидации')
+    finally:
+        _poll_lock.release()
@@ -0,0 +1,280 @@
+"""
+Локальная очередь фоновых задач поверх таблицы Job.
+
+Задача регистрируется декоратором @task('имя') и ставится в очередь через
+enqueue('имя', **payload). Выполняет задачи команда `manage.py run_jobs`.
+Задачу с @task('имя', every=секунды) воркер сам ставит в очередь с этим
+периодом (enqueue_periodic).
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Job, Collection, CollectionLike, GameCollection, UserProfile
+from . import deletion, preferences, rankings, thumbnails, trending
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+# имя задачи → период, секунд
+PERIODIC = {}
+
+RETRY_DELAY = timedelta(seconds=30)
+BATCH_SIZE = 500
+
+
+def task(name, every=None):
+    """Регистрирует функцию как фоновую задачу. Функция получает (job, **payload)"""
+    def decorator(func):
+        TASKS[name] = func
+        if every is not None:
+            PERIODIC[name] = every
+        return func
+    return decorator
+
+
+def enqueue(name, max_attempts=3, **payload):
+    if name not in TASKS:
+        raise KeyError(f'Неизвестная задача: {name}')
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_after=timezone.now(),
+    )
+
+
+def enqueue_once(name, max_attempts=3, **payload):
+    """
+    Как enqueue, но если такая же задача (имя и параметры) ещё ждёт в очереди,
+    возвращает её. Проверка и вставка не атомарны: при гонке встанут две
+    одинаковые задачи, и вторая просто ничего не изменит.
+    """
+    pending = Job.objects.filter(name=name, payload=payload, status=Job.STATUS_PENDING).first()
+    return pending or enqueue(name, max_attempts, **payload)
+
+
+def enqueue_periodic():
+    """
+    Ставит периодические задачи, которые не запускались дольше своего периода
+    и не ждут в очереди. У периодической задачи одна строка Job: завершённая
+    строка ставится в очередь заново, а не копится по строке на каждый запуск.
+    """
+    now = timezone.now()
+    enqueued = []
+    for name, every in PERIODIC.items():
+        last = Job.objects.filter(name=name).order_by('-created_at').first()
+        if last is None:
+            enqueued.append(enqueue(name, max_attempts=1))
+            continue
+        # строки от прежних запусков, когда каждый запуск добавлял новую
+        Job.objects.filter(
+            name=name, status__in=(Job.STATUS_DONE, Job.STATUS_FAILED)
+        ).exclude(id=last.id).delete()
+        if last.status in (Job.STATUS_PENDING, Job.STATUS_RUNNING) or last.run_after > now - timedelta(seconds=every):
+            continue
+        requeued = Job.objects.filter(id=last.id, status=last.status).update(
+            status=Job.STATUS_PENDING, attempts=0, progress=0, total=0, error='', run_after=now, finished_at=None,
+        )
+        if requeued:
+            last.refresh_from_db()
+            enqueued.append(last)
+    return enqueued
+
+
+def claim_next():
+    """Забирает первую готовую задачу; атомарный UPDATE не даёт двум воркерам взять одну и ту же"""
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.STATUS_PENDING, run_after__lte=now
+    ).order_by('run_after', 'id').values_list('id', flat=True)[:10]
+
+    for job_id in candidates:
+        claimed = Job.objects.filter(id=job_id, status=Job.STATUS_PENDING).update(
+            status=Job.STATUS_RUNNING
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    func = TASKS.get(job.name)
+    job.attempts += 1
+
+    try:
+        if func is None:
+            raise KeyError(f'Неизвестная задача: {job.name}')
+        func(job, **job.payload)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.STATUS_PENDING
+            job.run_after = timezone.now() + RETRY_DELAY * job.attempts
+        else:
+            job.status = Job.STATUS_FAILED
+            job.finished_at = timezone.now()
+        logger.exception('Задача %s (#%s) завершилась ошибкой', job.name, job.id)
+    else:
+        job.status = Job.STATUS_DONE
+        job.error = ''
+        job.finished_at = timezone.now()
+
+    job.save(update_fields=['status', 'attempts', 'error', 'run_after', 'finished_at'])
+    return job
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи по очереди, возвращает количество выполненных"""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def _chunks(ids, size=BATCH_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def collections_count_subquery():
+    counts = Collection.objects.alive().filter(
+        user=OuterRef('user')
+    ).order_by().values('user').annotate(c=Count('id')).values('c')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def likes_count_subquery():
+    counts = CollectionLike.objects.filter(
+        collection=OuterRef('pk')
+    ).order_by().values('collection').annotate(c=Count('id')).values('c')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def games_count_subquery():
+    counts = GameCollection.objects.filter(
+        collection=OuterRef('pk')
+    ).order_by().values('collection').annotate(c=Count('id')).values('c')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+@task('recount_collections_count')
+def recount_collections_count(job, profile_ids):
+    """UPDATE main_userprofile SET collections_count = (SELECT COUNT(*) ...) пачками"""
+    job.report(0, len(profile_ids))
+    done = 0
+    for chunk in _chunks(profile_ids):
+        UserProfile.objects.filter(id__in=chunk).update(
+            collections_count=collections_count_subquery()
+        )
+        done += len(chunk)
+        job.report(done)
+
+
+@task('recount_likes')
+def recount_likes(job, collection_ids):
+    job.report(0, len(collection_ids))
+    done = 0
+    for chunk in _chunks(collection_ids):
+        Collection.objects.filter(id__in=chunk).update(likes_count=likes_count_subquery())
+        done += len(chunk)
+        job.report(done)
+
+
+@task('recount_games')
+def recount_games(job, collection_ids):
+    job.report(0, len(collection_ids))
+    done = 0
+    for chunk in _chunks(collection_ids):
+        Collection.objects.filter(id__in=chunk).update(games_count=games_count_subquery())
+        done += len(chunk)
+        job.report(done)
+
+
+@task('reorder_games')
+def reorder_games(job, collection_ids=None):
+    """Перенумеровывает игры в подборках 1..N, сохраняя текущий порядок"""
+    collections = Collection.objects.alive().order_by('id')
+    if collection_ids is not None:
+        collections = collections.filter(id__in=collection_ids)
+    collection_ids = list(collections.values_list('id', flat=True))
+
+    job.report(0, len(collection_ids))
+    done = 0
+    for chunk in _chunks(collection_ids, 100):
+        rows = GameCollection.objects.filter(collection_id__in=chunk).order_by(
+            'collection_id', 'order', 'id'
+        ).values_list('id', 'collection_id', 'order')
+
+        changed = []
+        current_collection, position = None, 0
+        for row_id, collection_id, order in rows:
+            if collection_id != current_collection:
+                current_collection, position = collection_id, 0
+            position += 1
+            if order != position:
+                changed.append(GameCollection(id=row_id, order=position))
+
+        with transaction.atomic():
+            GameCollection.objects.bulk_update(changed, ['order'], batch_size=BATCH_SIZE)
+        done += len(chunk)
+        job.report(done)
+
+
+@task('rebuild_preferences')
+def rebuild_preferences(job, game_ids):
+    """Пересчитывает векторы предпочтений тех, у кого игры в избранном или подборках"""
+    profile_ids = list(preferences.profiles_with_games(game_ids).values_list('id', flat=True))
+    job.report(0, len(profile_ids))
+    done = 0
+    for chunk in _chunks(profile_ids):
+        for profile in UserProfile.objects.filter(id__in=chunk):
+            preferences.rebuild_affinity(profile)
+        done += len(chunk)
+        job.report(done)
+
+
+@task('refresh_rankings')
+def refresh_rankings(job):
+    rankings.refresh_snapshots()
+
+
+@task('build_thumbnails')
+def build_thumbnails(job, game_ids):
+    job.report(0, len(game_ids))
+    done = 0
+    for chunk in _chunks(game_ids, 50):
+        thumbnails.build_for_games(chunk)
+        done += len(chunk)
+        job.report(done)
+
+
+@task('sync_trending', every=settings.TRENDING_SYNC_INTERVAL)
+def sync_trending(job):
+    job.report(trending.engine.sync())
+
+
+@task('purge_collections')
+def purge_collections(job, collection_ids):
+    deletion.purge_collections(job, collection_ids)
+
+
+@task('reset_likes')
+def reset_likes(job, collection_ids):
+    deletion.reset_likes(job, collection_ids)
+
+
+@task('purge_user')
+def purge_user(job, user_id):
+    deletion.purge_user(job, user_id)
@@ -0,0 +1,109 @@
+import json
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from main import benchmark
+from main.models import Game
+
+
+class Command(BaseCommand):
+    help = 'Прогоняет нагрузочные сценарии на синтетическом каталоге в тестовой БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1000,
+                            help='Количество игр в синтетическом каталоге (1000 – 1000000)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            choices=sorted(benchmark.SCENARIOS),
+                            help='Запустить только указанные сценарии (можно несколько раз)')
+        parser.add_argument('--anonymous', action='store_true',
+                            help='Выполнять запросы без входа в систему')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument('--baseline', help='JSON с базовой линией для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимое ухудшение p95 относительно базовой линии (доля)')
+        parser.add_argument('--render', action='store_true',
+                            help='Замерить рендеринг шаблонов страниц (время и размер HTML) вместо сценариев')
+        parser.add_argument('--wire', action='store_true',
+                            help='Замерить размер ответов без сжатия, с минификацией, gzip и brotli '
+                                 'и процессорное время на них вместо сценариев')
+        parser.add_argument('--fast-hasher', action='store_true',
+                            help='Хэшировать пароли MD5 (как FAST_PASSWORD_HASHER=1), '
+                                 'чтобы вход и генерация пользователей не упирались в PBKDF2')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Не удалять тестовую БД и переиспользовать уже сгенерированный каталог')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            # снимок каталога из тестовой БД не должен подменить рабочий
+            overrides = {'CATALOG_SNAPSHOT_AUTO_WRITE': False}
+            if options['fast_hasher']:
+                overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+            with override_settings(**overrides):
+                results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        for name, summary in results.items():
+            line = f"{name:44}"
+            if 'p50_ms' in summary:
+                line += (f" p50 {summary['p50_ms']:9.2f} мс  p95 {summary['p95_ms']:9.2f} мс  "
+                         f"p99 {summary['p99_ms']:9.2f} мс")
+            if 'queries' in summary:
+                line += f"  запросов {summary['queries']}"
+            if 'bytes' in summary:
+                line += f"  {summary['bytes']} байт"
+            self.stdout.write(line)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2, ensure_ascii=False))
+
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+            regressions = benchmark.compare(results, baseline, options['threshold'])
+            if regressions:
+                raise CommandError('Регрессии производительности:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий относительно базовой линии нет'))
+
+    def run(self, options):
+        if options['keepdb'] and Game.objects.count() == options['scale']:
+            catalog = benchmark.load_catalog()
+        else:
+            call_command('flush', interactive=False, verbosity=0)
+            self.stdout.write(f"Генерация каталога на {options['scale']} игр...")
+            catalog = benchmark.generate_catalog(options['scale'], options['seed'])
+
+        if options['wire']:
+            return benchmark.measure_wire(
+                catalog,
+                options['scenarios'] or list(benchmark.WIRE_PAGES),
+                options['iterations'],
+                seed=options['seed'],
+                authenticated=not options['anonymous'],
+            )
+
+        if options['render']:
+            return benchmark.render_templates(
+                catalog,
+                options['scenarios'] or list(benchmark.RENDER_PAGES),
+                options['iterations'],
+                seed=options['seed'],
+                authenticated=not options['anonymous'],
+            )
+
+        return benchmark.run_scenarios(
+            catalog,
+            options['scenarios'] or list(benchmark.SCENARIOS),
+            options['iterations'],
+            seed=options['seed'],
+            authenticated=not options['anonymous'],
+        )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main import thumbnails
+from main.models import Game
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры обложек для игр, у которых их нет или обложка сменилась'
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_ids', nargs='*', type=int, help='Только эти игры (по умолчанию все)')
+        parser.add_argument('--workers', type=int, help='Размер пула (по умолчанию THUMBNAIL_WORKERS)')
+        parser.add_argument('--force', action='store_true', help='Перестроить и актуальные миниатюры')
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if not thumbnails.available():
+            raise CommandError('Для миниатюр нужен Pillow: pip install pillow')
+
+        game_ids = options['game_ids'] or list(Game.objects.order_by('id').values_list('id', flat=True))
+        built = failed = 0
+        for start in range(0, len(game_ids), options['batch_size']):
+            chunk = game_ids[start:start + options['batch_size']]
+            chunk_built, chunk_failed = thumbnails.build_for_games(
+                chunk, workers=options['workers'], force=options['force'],
+            )
+            built += chunk_built
+            failed += chunk_failed
+            self.stdout.write(f'{min(start + len(chunk), len(game_ids))}/{len(game_ids)}')
+
+        self.stdout.write(f'Построено: {built}, ошибок: {failed}')
@@ -0,0 +1,19 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from main.models import UserProfile
+from main.preferences import rebuild_affinity
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает векторы предпочтений пользователей по тегам'
+
+    def handle(self, *args, **options):
+        missing = User.objects.filter(userprofile__isnull=True)
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in missing])
+
+        count = 0
+        for profile in UserProfile.objects.iterator(chunk_size=500):
+            rebuild_affinity(profile)
+            count += 1
+        self.stdout.write(f'Пересчитано профилей: {count}')
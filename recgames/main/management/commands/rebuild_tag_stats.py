@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from main import tag_stats
+from main.models import Tag
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает количество игр по тегам и матрицу совместной встречаемости тегов'
+
+    def handle(self, *args, **options):
+        pairs = tag_stats.rebuild()
+        self.stdout.write(f'Тегов: {Tag.objects.count()}, пар тегов: {pairs}')
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import Favorite, CollectionLike, TrendingState
+from main.trending import DecayedScores, engine
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает счётчики трендов по всей истории избранного и лайков'
+
+    def handle(self, *args, **options):
+        now = time.time()
+        games = DecayedScores(settings.TRENDING_HALF_LIFE, now)
+        collections = DecayedScores(settings.TRENDING_HALF_LIFE, now)
+
+        last_event_ids = {TrendingState.KIND_GAMES: 0, TrendingState.KIND_COLLECTIONS: 0}
+        with transaction.atomic():
+            favorites = Favorite.objects.order_by().values_list('id', 'game_id', 'added_at')
+            for event_id, game_id, added_at in favorites.iterator(chunk_size=2000):
+                games.add(game_id, 1.0, added_at.timestamp())
+                last_event_ids[TrendingState.KIND_GAMES] = max(last_event_ids[TrendingState.KIND_GAMES], event_id)
+
+            likes = CollectionLike.objects.order_by().values_list('id', 'collection_id', 'created_at')
+            for event_id, collection_id, created_at in likes.iterator(chunk_size=2000):
+                collections.add(collection_id, 1.0, created_at.timestamp())
+                last_event_ids[TrendingState.KIND_COLLECTIONS] = max(
+                    last_event_ids[TrendingState.KIND_COLLECTIONS], event_id
+                )
+
+            engine.reset({TrendingState.KIND_GAMES: games, TrendingState.KIND_COLLECTIONS: collections}, last_event_ids)
+        self.stdout.write(f'Игр в массиве: {len(games.values)}, подборок: {len(collections.values)}')
@@ -0,0 +1,29 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.rankings import refresh_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает снимки рейтингов для главной страницы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Пересчитывать периодически, а не один раз')
+        parser.add_argument('--interval', type=float, default=300.0,
+                            help='Период пересчёта, секунд')
+        parser.add_argument('--jitter', type=float, default=0.2,
+                            help='Случайное отклонение периода (доля), чтобы воркеры не совпадали')
+
+    def handle(self, *args, **options):
+        while True:
+            snapshots = refresh_snapshots()
+            for kind, snapshot in snapshots.items():
+                self.stdout.write(f'{kind}: {len(snapshot.items)} элементов')
+
+            if not options['loop']:
+                break
+            spread = options['interval'] * options['jitter']
+            time.sleep(max(1.0, options['interval'] + random.uniform(-spread, spread)))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main import jobs
+from main.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркер локальной очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Пауза между опросами очереди, секунд')
+        parser.add_argument('--reset-running', action='store_true',
+                            help='Вернуть в очередь задачи, зависшие после падения воркера')
+
+    def handle(self, *args, **options):
+        if options['reset_running']:
+            reset = Job.objects.filter(status=Job.STATUS_RUNNING).update(status=Job.STATUS_PENDING)
+            self.stdout.write(f'Возвращено в очередь: {reset}')
+
+        periodic_at = 0
+        while True:
+            if time.monotonic() >= periodic_at:
+                jobs.enqueue_periodic()
+                periodic_at = time.monotonic() + options['sleep']
+
+            job = jobs.claim_next()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f'Запуск {job.name} (#{job.id}, попытка {job.attempts + 1})')
+            job = jobs.run_job(job)
+            self.stdout.write(f'{job.name} (#{job.id}): {job.get_status_display()}')
@@ -0,0 +1,98 @@
+"""
+Метрики запросов в памяти процесса: гистограммы по имени URL.
+
+Собирает их MetricsMiddleware (main/middleware.py), а страница /metrics
+отдаёт их в текстовом формате Prometheus.
+"""
+import contextvars
+import threading
+from bisect import bisect_left
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+# счётчики текущего запроса; None, если запрос не попал в выборку
+current_sample = contextvars.ContextVar('metrics_sample', default=None)
+
+
+class Sample:
+    __slots__ = ('queries', 'db_time', 'template_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self.lock:
+            series = self.series.get(label)
+            if series is None:
+                series = self.series[label] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = {label: (list(counts), total) for label, (counts, total) in self.series.items()}
+
+        for label in sorted(series):
+            counts, total = series[label]
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{view="{label}",le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{view="{label}"}} {total}')
+            lines.append(f'{self.name}_count{{view="{label}"}} {cumulative}')
+        return lines
+
+
+request_duration = Histogram(
+    'recgames_request_duration_seconds', 'Время обработки запроса', DURATION_BUCKETS
+)
+db_queries = Histogram(
+    'recgames_db_queries', 'Количество SQL-запросов на HTTP-запрос', QUERY_BUCKETS
+)
+db_duration = Histogram(
+    'recgames_db_duration_seconds', 'Суммарное время SQL-запросов', DURATION_BUCKETS
+)
+template_duration = Histogram(
+    'recgames_template_render_seconds', 'Время рендеринга шаблонов', DURATION_BUCKETS
+)
+response_size = Histogram(
+    'recgames_response_size_bytes', 'Размер ответа', SIZE_BUCKETS
+)
+
+HISTOGRAMS = (request_duration, db_queries, db_duration, template_duration, response_size)
+
+
+def observe(view, duration, sample, size):
+    request_duration.observe(view, duration)
+    db_queries.observe(view, sample.queries)
+    db_duration.observe(view, sample.db_time)
+    template_duration.observe(view, sample.template_time)
+    if size is not None:
+        response_size.observe(view, size)
+
+
+def render_prometheus(sample_rate):
+    lines = [
+        '# HELP recgames_metrics_sample_rate Доля запросов, попадающих в метрики',
+        '# TYPE recgames_metrics_sample_rate gauge',
+        f'recgames_metrics_sample_rate {sample_rate}',
+    ]
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
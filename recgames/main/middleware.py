@@ -0,0 +1,182 @@
+import cProfile
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, connections
+from django.utils.cache import patch_vary_headers
+
+from . import compression, invalidation, metrics, profiling, querylog
+
+
+class MetricsMiddleware:
+    """
+    Для доли запросов METRICS_SAMPLE_RATE замеряет время ответа, число и время
+    SQL-запросов, время рендеринга шаблонов и размер ответа. Стоит сразу за
+    SecurityMiddleware, поэтому время включает сессии, авторизацию, сжатие и
+    минификацию, а размер — уже сжатого ответа.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        sample = metrics.Sample()
+        token = metrics.current_sample.set(sample)
+
+        def count_queries(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                sample.queries += 1
+                sample.db_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for db in connections.all():
+                    stack.enter_context(db.execute_wrapper(count_queries))
+                response = self.get_response(request)
+        finally:
+            metrics.current_sample.reset(token)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        size = None if response.streaming else len(response.content)
+        metrics.observe(view, duration, sample, size)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запрос сотрудника, если он попросил об этом заголовком
+    X-Profile: 1 или параметром ?_profile=1 (см. main/profiling.py).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (profiling.wants_profile(request) and request.user.is_staff):
+            return self.get_response(request)
+        if not profiling.allow_profile(request.user):
+            response = self.get_response(request)
+            response['X-Profile-Skipped'] = 'rate-limited'
+            return response
+
+        recorder = profiling.QueryRecorder()
+        sampler = profiling.StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL)
+        profiler = cProfile.Profile()
+
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            with connection.execute_wrapper(recorder):
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+        finally:
+            sampler.stop()
+        duration = time.perf_counter() - start
+
+        profile_id = profiling.write_artifacts(request, profiler, sampler, recorder, duration)
+        response['X-Profile-Id'] = profile_id
+        return response
+
+
+class QueryLogMiddleware:
+    """Пишет в лог медленные SQL-запросы и повторяющиеся запросы (N+1), см. main/querylog.py"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold_ms = settings.SLOW_QUERY_THRESHOLD_MS
+        self.repeat_threshold = settings.N_PLUS_ONE_THRESHOLD
+
+    def __call__(self, request):
+        log = querylog.RequestQueryLog(request, self.threshold_ms, self.repeat_threshold)
+        with connection.execute_wrapper(log):
+            response = self.get_response(request)
+        log.finish()
+        return response
+
+
+class InvalidationMiddleware:
+    """
+    Перед запросом забирает события инвалидации из других процессов, а события
+    самого запроса отправляет им одной пачкой после ответа (main/invalidation.py)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        invalidation.poll()
+        with invalidation.deferred():
+            return self.get_response(request)
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы больше COMPRESSION_MIN_SIZE байт: brotli, если он установлен
+    и поддерживается клиентом, иначе gzip. Стоит в начале MIDDLEWARE, чтобы
+    остальные middleware видели несжатое тело.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or response.has_header('Content-Encoding')
+                or len(response.content) < self.min_size):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressed = compression.ENCODERS[encoding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # сжатое тело отличается побайтно, поэтому сильный ETag становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class HtmlMinifyMiddleware:
+    """Убирает отступы и пустые строки из HTML-страниц, если HTML_MINIFY включён"""
+
+    def __init__(self, get_response):
+        if not settings.HTML_MINIFY:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or response.has_header('Content-Encoding')
+                or not response.get('Content-Type', '').startswith('text/html')):
+            return response
+
+        response.content = compression.minify_html(response.content.decode(response.charset))
+        if response.has_header('Content-Length'):
+            response.headers['Content-Length'] = str(len(response.content))
+        return response
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('latest_games', 'Последние игры'), ('popular_collections', 'Популярные подборки'), ('trending_games', 'Игры в тренде')], max_length=50, unique=True, verbose_name='Рейтинг')),
+                ('items', models.JSONField(default=list, verbose_name='Элементы')),
+                ('built_at', models.DateTimeField(verbose_name='Дата построения')),
+            ],
+            options={
+                'verbose_name': 'Снимок рейтинга',
+                'verbose_name_plural': 'Снимки рейтингов',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:30
+
+from django.db import migrations, models
+
+
+def delete_trending_snapshots(apps, schema_editor):
+    RankingSnapshot = apps.get_model('main', 'RankingSnapshot')
+    RankingSnapshot.objects.filter(kind='trending_games').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_rankingsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('games', 'Игры'), ('collections', 'Подборки')], max_length=20, unique=True, verbose_name='Объекты')),
+                ('epoch', models.FloatField(verbose_name='Эпоха счётчиков (unix time)')),
+                ('data', models.BinaryField(verbose_name='Счётчики')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Состояние трендов',
+                'verbose_name_plural': 'Состояния трендов',
+            },
+        ),
+        migrations.AlterField(
+            model_name='rankingsnapshot',
+            name='kind',
+            field=models.CharField(choices=[('latest_games', 'Последние игры'), ('popular_collections', 'Популярные подборки')], max_length=50, unique=True, verbose_name='Рейтинг'),
+        ),
+        migrations.RunPython(delete_trending_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_trendingstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='affinity',
+            field=models.BinaryField(default=b'', verbose_name='Вектор предпочтений по тегам'),
+        ),
+    ]
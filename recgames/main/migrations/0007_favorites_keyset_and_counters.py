@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Collection = apps.get_model('main', 'Collection')
+    GameCollection = apps.get_model('main', 'GameCollection')
+    CollectionLike = apps.get_model('main', 'CollectionLike')
+
+    def count_of(model):
+        counts = model.objects.filter(
+            collection=OuterRef('pk')
+        ).order_by().values('collection').annotate(c=Count('id')).values('c')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    Collection.objects.update(
+        games_count=count_of(GameCollection),
+        likes_count=count_of(CollectionLike),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_userprofile_affinity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='games_count',
+            field=models.IntegerField(default=0, verbose_name='Количество игр'),
+        ),
+        migrations.AddIndex(
+            model_name='collectionlike',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='main_like_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-added_at', '-id'], name='main_favorite_user_added'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-19 19:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('main', '0007_favorites_keyset_and_counters'),
+    ]
+
+    operations = [
+        # Регистрация проверяет занятость email без учёта регистра
+        # (CustomUserCreationForm.clean_email); без индекса это полный скан auth_user
+        migrations.RunSQL(
+            sql='CREATE INDEX main_auth_user_email_lower ON auth_user (LOWER(email));',
+            reverse_sql='DROP INDEX main_auth_user_email_lower;',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_auth_user_email_lower'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='cover_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Миниатюры обложки'),
+        ),
+    ]
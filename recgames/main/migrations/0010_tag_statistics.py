@@ -0,0 +1,62 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:53
+
+from collections import Counter
+from itertools import groupby, permutations
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_tag_stats(apps, schema_editor):
+    Game = apps.get_model('main', 'Game')
+    Tag = apps.get_model('main', 'Tag')
+    TagCooccurrence = apps.get_model('main', 'TagCooccurrence')
+    GameTag = Game.tags.through
+
+    counts = GameTag.objects.filter(
+        tag=OuterRef('pk')
+    ).order_by().values('tag').annotate(c=Count('id')).values('c')
+    Tag.objects.update(games_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)))
+
+    pairs = Counter()
+    game_tags = GameTag.objects.order_by('game_id').values_list('game_id', 'tag_id').iterator()
+    for _, rows in groupby(game_tags, key=lambda row: row[0]):
+        pairs.update(permutations([tag_id for _, tag_id in rows], 2))
+    TagCooccurrence.objects.bulk_create(
+        [TagCooccurrence(tag_id=tag_id, other_id=other_id, games_count=count)
+         for (tag_id, other_id), count in pairs.items()],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_game_cover_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='games_count',
+            field=models.IntegerField(default=0, verbose_name='Количество игр'),
+        ),
+        migrations.CreateModel(
+            name='TagCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('games_count', models.IntegerField(default=0, verbose_name='Количество игр')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.tag', verbose_name='Связанный тег')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cooccurrences', to='main.tag', verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'Совместная встречаемость тегов',
+                'verbose_name_plural': 'Совместная встречаемость тегов',
+                'indexes': [models.Index(fields=['tag', '-games_count'], name='main_cooccurrence_top')],
+                'unique_together': {('tag', 'other')},
+            },
+        ),
+        migrations.RunPython(backfill_tag_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_invalidation_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.BigIntegerField(default=0, verbose_name='Ревизия')),
+            ],
+            options={
+                'verbose_name': 'Ревизия каталога',
+                'verbose_name_plural': 'Ревизии каталога',
+            },
+        ),
+    ]
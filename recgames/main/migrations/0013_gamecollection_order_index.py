@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_catalog_revision'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gamecollection',
+            index=models.Index(fields=['collection', 'order'], name='main_gamecollection_order'),
+        ),
+    ]
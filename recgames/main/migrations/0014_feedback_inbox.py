@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_gamecollection_order_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['is_processed', '-created_at', '-id'], name='main_feedback_inbox'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_feedback_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(choices=[('games', 'Игры'), ('tags', 'Теги'), ('collections', 'Подборки')], max_length=20, verbose_name='Ресурс')),
+                ('object_id', models.IntegerField(verbose_name='ID объекта')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удалён')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение каталога',
+                'verbose_name_plural': 'Изменения каталога',
+                'indexes': [models.Index(fields=['resource', 'object_id'], name='main_changelog_object')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Удаляется'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:27
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def mark_recorded(apps, schema_editor):
+    # до этой миграции события учитывались сразу, состояние уже содержит всю историю
+    TrendingState = apps.get_model('main', 'TrendingState')
+    sources = {
+        'games': apps.get_model('main', 'Favorite'),
+        'collections': apps.get_model('main', 'CollectionLike'),
+    }
+    for kind, model in sources.items():
+        last = model.objects.aggregate(last=Max('id'))['last'] or 0
+        TrendingState.objects.filter(kind=kind).update(last_event_id=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_collection_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trendingstate',
+            name='last_event_id',
+            field=models.BigIntegerField(default=0, verbose_name='Последнее учтённое событие'),
+        ),
+        migrations.RunPython(mark_recorded, migrations.RunPython.noop),
+    ]
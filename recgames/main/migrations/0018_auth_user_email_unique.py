@@ -0,0 +1,44 @@
+# Generated by Django 5.2.9 on 2026-10-19 20:40
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def clear_duplicate_emails(apps, schema_editor):
+    # email без учёта регистра остаётся у самого раннего аккаунта,
+    # у более поздних он стирается — иначе уникальный индекс не создать
+    User = apps.get_model('auth', 'User')
+    duplicates = User.objects.filter(email__gt='').annotate(email_lower=Lower('email')).values(
+        'email_lower'
+    ).annotate(count=Count('id')).filter(count__gt=1).values_list('email_lower', flat=True)
+    for email_lower in list(duplicates):
+        ids = list(User.objects.annotate(email_lower=Lower('email')).filter(
+            email_lower=email_lower
+        ).order_by('id').values_list('id', flat=True))
+        User.objects.filter(id__in=ids[1:]).update(email='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('main', '0017_trending_last_event'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_emails, migrations.RunPython.noop),
+        # пустой email уникальным не считается: он бывает у нескольких аккаунтов
+        # (createsuperuser без email). Условие индекса повторяет фильтр
+        # email__gt='' в CustomUserCreationForm.clean_email, иначе SQLite его не выберет
+        migrations.RunSQL(
+            sql=[
+                'DROP INDEX main_auth_user_email_lower;',
+                "CREATE UNIQUE INDEX main_auth_user_email_lower ON auth_user (LOWER(email)) WHERE email > '';",
+            ],
+            reverse_sql=[
+                'DROP INDEX main_auth_user_email_lower;',
+                'CREATE INDEX main_auth_user_email_lower ON auth_user (LOWER(email));',
+            ],
+        ),
+    ]
@@ -5,6 +5,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True, verbose_name='Тег')
     slug = models.SlugField(max_length=50, unique=True, verbose_name='URL-имя')
+    games_count = models.IntegerField(default=0, verbose_name='Количество игр')
     
     def __str__(self):
         return self.name
@@ -14,6 +15,23 @@ class Tag(models.Model):
         verbose_name_plural = 'Теги'
         ordering = ['name']
 
+class TagCooccurrence(models.Model):
+    """Сколько игр отмечено одновременно тегами tag и other. Хранится в обе стороны"""
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='cooccurrences', verbose_name='Тег')
+    other = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+', verbose_name='Связанный тег')
+    games_count = models.IntegerField(default=0, verbose_name='Количество игр')
+    
+    def __str__(self):
+        return f"{self.tag} + {self.other}: {self.games_count}"
+    
+    class Meta:
+        verbose_name = 'Совместная встречаемость тегов'
+        verbose_name_plural = 'Совместная встречаемость тегов'
+        unique_together = ['tag', 'other']
+        indexes = [
+            models.Index(fields=['tag', '-games_count'], name='main_cooccurrence_top'),
+        ]
+
 class Game(models.Model):
     GENRE_CHOICES = [
         ('RPG', 'RPG'),
@@ -70,9 +88,17 @@ class Game(models.Model):
     description = models.TextField(verbose_name='Описание игры')
     tags = models.ManyToManyField(Tag, blank=True, verbose_name='Теги для рекомендаций')    
     game_image = models.URLField(verbose_name='Обложка игры')
+    cover_thumbnails = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Миниатюры обложки')
     steam_url = models.URLField(verbose_name='Ссылка на Steam')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # обложка на момент загрузки: миниатюры перестраиваются, только если она сменилась
+        instance._loaded_game_image = instance.__dict__.get('game_image')
+        return instance
+    
     def __str__(self):
         return self.title
     
@@ -81,6 +107,12 @@ class Game(models.Model):
         verbose_name_plural = 'Игры'
         ordering = ['-created_at']
 
+class CollectionQuerySet(models.QuerySet):
+    def alive(self):
+        """Без помеченных на удаление: их строки удаляет фоновая задача (см. main/deletion.py)"""
+        return self.filter(is_deleted=False)
+
+
 class Collection(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Создатель подборки')
     title = models.CharField(max_length=200, verbose_name='Название подборки')
@@ -90,6 +122,12 @@ class Collection(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     likes_count = models.IntegerField(default=0, verbose_name='Количество лайков')
+    games_count = models.IntegerField(default=0, verbose_name='Количество игр')
+    is_deleted = models.BooleanField(default=False, editable=False, verbose_name='Удаляется')
+    
+    # менеджер видит и помеченные на удаление; всё, что показывается
+    # пользователям, выбирается через Collection.objects.alive()
+    objects = CollectionQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.title} от {self.user.username}"
@@ -113,6 +151,9 @@ class GameCollection(models.Model):
         verbose_name_plural = 'Игры в подборках'
         ordering = ['order']
         unique_together = ['collection', 'game']
+        indexes = [
+            models.Index(fields=['collection', 'order'], name='main_gamecollection_order'),
+        ]
 
 
 class CollectionLike(models.Model):
@@ -129,6 +170,9 @@ class CollectionLike(models.Model):
         verbose_name_plural = 'Лайки подборок'
         unique_together = ['user', 'collection']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='main_like_user_created'),
+        ]
 
 class Recommendation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Пользователь')
@@ -157,12 +201,16 @@ class Favorite(models.Model):
         verbose_name_plural = 'Избранные игры'
         ordering = ['-added_at']
         unique_together = ['user', 'game']
+        indexes = [
+            models.Index(fields=['user', '-added_at', '-id'], name='main_favorite_user_added'),
+        ]
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name='Пользователь')
     preferences = models.JSONField(default=list, verbose_name='Предпочтения')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата регистрации')
     collections_count = models.IntegerField(default=0, verbose_name='Количество созданных подборок')
+    affinity = models.BinaryField(default=b'', editable=False, verbose_name='Вектор предпочтений по тегам')
     
     def __str__(self):
         return f"Профиль {self.user.username}"
@@ -184,4 +232,153 @@ class Feedback(models.Model):
     class Meta:
         verbose_name = 'Обратная связь'
         verbose_name_plural = 'Обратные связи'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_processed', '-created_at', '-id'], name='main_feedback_inbox'),
+        ]
+
+class Job(models.Model):
+    """Фоновая задача из локальной очереди (см. main/jobs.py)"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Выполнена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name='Задача')
+    payload = models.JSONField(default=dict, verbose_name='Параметры')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='Статус')
+    attempts = models.IntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.IntegerField(default=3, verbose_name='Максимум попыток')
+    progress = models.IntegerField(default=0, verbose_name='Обработано')
+    total = models.IntegerField(default=0, verbose_name='Всего')
+    error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    run_after = models.DateTimeField(verbose_name='Запустить не раньше')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата завершения')
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+    def report(self, progress, total=None):
+        """Сохраняет прогресс выполнения, не трогая остальные поля"""
+        self.progress = progress
+        fields = ['progress']
+        if total is not None:
+            self.total = total
+            fields.append('total')
+        self.save(update_fields=fields)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='main_job_status_run_after'),
+        ]
+
+
+class RankingSnapshot(models.Model):
+    """Предрассчитанный рейтинг для главной страницы (см. main/rankings.py)"""
+    KIND_LATEST_GAMES = 'latest_games'
+    KIND_POPULAR_COLLECTIONS = 'popular_collections'
+
+    KIND_CHOICES = [
+        (KIND_LATEST_GAMES, 'Последние игры'),
+        (KIND_POPULAR_COLLECTIONS, 'Популярные подборки'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES, unique=True, verbose_name='Рейтинг')
+    items = models.JSONField(default=list, verbose_name='Элементы')
+    built_at = models.DateTimeField(verbose_name='Дата построения')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} от {self.built_at:%d.%m.%Y %H:%M}"
+
+    class Meta:
+        verbose_name = 'Снимок рейтинга'
+        verbose_name_plural = 'Снимки рейтингов'
+
+
+class TrendingState(models.Model):
+    """Счётчики трендов с затуханием, упакованные в массив float64 (см. main/trending.py)"""
+    KIND_GAMES = 'games'
+    KIND_COLLECTIONS = 'collections'
+
+    KIND_CHOICES = [
+        (KIND_GAMES, 'Игры'),
+        (KIND_COLLECTIONS, 'Подборки'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, unique=True, verbose_name='Объекты')
+    epoch = models.FloatField(verbose_name='Эпоха счётчиков (unix time)')
+    data = models.BinaryField(verbose_name='Счётчики')
+    # id последней учтённой строки Favorite или CollectionLike
+    last_event_id = models.BigIntegerField(default=0, verbose_name='Последнее учтённое событие')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    def __str__(self):
+        return f"Тренды: {self.get_kind_display()}"
+
+    class Meta:
+        verbose_name = 'Состояние трендов'
+        verbose_name_plural = 'Состояния трендов'
+
+
+class InvalidationEvent(models.Model):
+    """Событие шины инвалидации для остальных процессов (см. main/invalidation.py)"""
+    topic = models.CharField(max_length=50, verbose_name='Тема')
+    # список ключей или null — сбросить всё по теме
+    keys = models.JSONField(null=True, blank=True, verbose_name='Ключи')
+    origin = models.CharField(max_length=100, verbose_name='Процесс-отправитель')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')
+
+    def __str__(self):
+        return f"{self.topic} #{self.id}"
+
+    class Meta:
+        verbose_name = 'Событие инвалидации'
+        verbose_name_plural = 'События инвалидации'
+
+
+class CatalogRevision(models.Model):
+    """Ревизия каталога для проверки снимка индекса (см. main/catalog_snapshot.py), одна строка"""
+    revision = models.BigIntegerField(default=0, verbose_name='Ревизия')
+
+    def __str__(self):
+        return f"Ревизия каталога {self.revision}"
+
+    class Meta:
+        verbose_name = 'Ревизия каталога'
+        verbose_name_plural = 'Ревизии каталога'
+
+
+class ChangeLog(models.Model):
+    """Запись ленты изменений каталога для синхронизации клиентов (см. main/change_log.py)"""
+    RESOURCE_CHOICES = [
+        ('games', 'Игры'),
+        ('tags', 'Теги'),
+        ('collections', 'Подборки'),
+    ]
+
+    # id записи — версия изменения
+    resource = models.CharField(max_length=20, choices=RESOURCE_CHOICES, verbose_name='Ресурс')
+    object_id = models.IntegerField(verbose_name='ID объекта')
+    deleted = models.BooleanField(default=False, verbose_name='Удалён')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')
+
+    def __str__(self):
+        return f"{self.resource} {self.object_id} #{self.id}"
+
+    class Meta:
+        verbose_name = 'Изменение каталога'
+        verbose_name_plural = 'Изменения каталога'
+        indexes = [
+            models.Index(fields=['resource', 'object_id'], name='main_changelog_object'),
+        ]
@@ -0,0 +1,101 @@
+"""
+Keyset-пагинация: следующая страница начинается после последней строки
+предыдущей по (поле, id), без OFFSET. Курсор — непрозрачная строка для URL.
+
+EstimatedCountPaginator — для списков админки на больших таблицах, где
+точный COUNT(*) дороже самой страницы.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# до скольки строк список считается точно
+EXACT_COUNT_LIMIT = 10000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value, pk):
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = f'{value}|{pk}'.encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(model, field, cursor):
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, pk = raw.rsplit('|', 1)
+        return model._meta.get_field(field).to_python(value), int(pk)
+    except (ValueError, UnicodeDecodeError, ValidationError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def keyset_page(queryset, field, cursor, size):
+    """
+    Страница строк по убыванию (field, id) и курсор следующей страницы
+    (None, если это последняя страница).
+    """
+    if cursor:
+        value, pk = decode_cursor(queryset.model, field, cursor)
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+
+    rows = list(queryset.order_by(f'-{field}', '-id')[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        last = rows[size - 1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return rows[:size], next_cursor
+
+
+def estimate_table_rows(model, using):
+    """Число строк таблицы по статистике БД (без прохода по таблице) или None"""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT table_rows FROM information_schema.tables '
+                    'WHERE table_schema = DATABASE() AND table_name = %s', [table]
+                )
+            elif connection.vendor == 'sqlite':
+                # sqlite_stat1 заполняет ANALYZE; первое число stat — строк в таблице
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    return int(str(row[0]).split()[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Точно считает только первые EXACT_COUNT_LIMIT строк (COUNT по подзапросу
+    с LIMIT). Если строк больше, для списка без фильтров берётся оценка из
+    статистики БД, а для отфильтрованного — сам предел, то есть страницы
+    дальше предела не показываются.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        bounded = queryset.order_by()[:EXACT_COUNT_LIMIT + 1].count()
+        if bounded <= EXACT_COUNT_LIMIT:
+            return bounded
+        if not queryset.query.where:
+            estimate = estimate_table_rows(queryset.model, queryset.db)
+            if estimate:
+                return max(estimate, bounded)
+        return bounded
@@ -0,0 +1,178 @@
+"""
+Вектор предпочтений пользователя по тегам.
+
+Вектор хранится в UserProfile.affinity как упакованный массив float32, где
+индекс — id тега. Вклад в вектор дают игры из избранного, игры в подборках
+пользователя и явные предпочтения (UserProfile.preferences — имена тегов,
+которые пользователь выбирал на странице рекомендаций).
+
+Вектор обновляется инкрементально сигналами (см. main/signals.py), а
+rebuild_affinity пересчитывает его целиком. Когда меняются теги игры,
+векторы всех, у кого она в избранном или подборках, пересчитывает задача
+rebuild_preferences (main/jobs.py). Каждое изменение — чтение,
+правка и запись всего вектора, поэтому строка профиля читается с
+select_for_update, иначе параллельные изменения затирали бы друг друга.
+Изменения из сигналов идут в транзакции самого сигнала, без точки сохранения.
+"""
+from array import array
+from itertools import accumulate, chain
+from operator import sub
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Favorite, Game, GameCollection, Tag, UserProfile
+
+FAVORITE_WEIGHT = 1.0
+COLLECTION_WEIGHT = 0.5
+EXPLICIT_WEIGHT = 2.0
+
+MAX_EXPLICIT_PREFERENCES = 20
+
+
+def unpack(data):
+    vector = array('f')
+    if data:
+        vector.frombytes(bytes(data))
+    return vector
+
+
+def pack(vector):
+    return vector.tobytes()
+
+
+def _add(vector, tag_ids, weight):
+    for tag_id in tag_ids:
+        missing = tag_id + 1 - len(vector)
+        if missing > 0:
+            vector.extend(array('f', bytes(4 * missing)))
+        vector[tag_id] = max(0.0, vector[tag_id] + weight)
+
+
+def _game_tag_ids(game_id):
+    return list(Game.tags.through.objects.filter(game_id=game_id).values_list('tag_id', flat=True))
+
+
+def _locked_profile(user_id, create=True):
+    """Профиль с блокировкой строки до конца транзакции; вызывать внутри atomic"""
+    profile = UserProfile.objects.select_for_update().filter(user_id=user_id).first()
+    if profile is None and create:
+        UserProfile.objects.get_or_create(user_id=user_id)
+        profile = UserProfile.objects.select_for_update().get(user_id=user_id)
+    return profile
+
+
+def _update(user_id, tag_ids, weight):
+    if not tag_ids:
+        return
+    with transaction.atomic(savepoint=False):
+        # при удалении пользователя профиль может быть уже удалён — не создаём заново
+        profile = _locked_profile(user_id, create=weight > 0)
+        if profile is None:
+            return
+        vector = unpack(profile.affinity)
+        _add(vector, tag_ids, weight)
+        profile.affinity = pack(vector)
+        profile.save(update_fields=['affinity'])
+
+
+def apply_favorite(user_id, game_id, sign=1):
+    _update(user_id, _game_tag_ids(game_id), sign * FAVORITE_WEIGHT)
+
+
+def apply_collection_game(user_id, game_id, sign=1):
+    _update(user_id, _game_tag_ids(game_id), sign * COLLECTION_WEIGHT)
+
+
+def record_explicit(user, tag_names):
+    """
+    Запоминает выбранные пользователем теги как явные предпочтения. Вызывается
+    только по явному действию «Запомнить выбор», а не на каждый поиск.
+    Возвращает сохранённый список.
+    """
+    with transaction.atomic(savepoint=False):
+        profile = _locked_profile(user.id)
+        preferences = [name for name in profile.preferences if name not in tag_names]
+        preferences = (list(tag_names) + preferences)[:MAX_EXPLICIT_PREFERENCES]
+        if preferences == profile.preferences:
+            return preferences
+
+        names = {
+            name: tag_id
+            for name, tag_id in Tag.objects.filter(
+                name__in=set(preferences) | set(profile.preferences)
+            ).values_list('name', 'id')
+        }
+        vector = unpack(profile.affinity)
+        _add(vector, [names[name] for name in profile.preferences if name in names], -EXPLICIT_WEIGHT)
+        _add(vector, [names[name] for name in preferences if name in names], EXPLICIT_WEIGHT)
+
+        profile.preferences = preferences
+        profile.affinity = pack(vector)
+        profile.save(update_fields=['preferences', 'affinity'])
+    return preferences
+
+
+def rebuild_affinity(profile):
+    with transaction.atomic(savepoint=False):
+        # перечитываем под блокировкой: preferences могли измениться после загрузки profile
+        profile = _locked_profile(profile.user_id, create=False) or profile
+        return _rebuild(profile)
+
+
+def _rebuild(profile):
+    through = Game.tags.through.objects
+    vector = array('f')
+    _add(
+        vector,
+        through.filter(game__favorite__user_id=profile.user_id).values_list('tag_id', flat=True),
+        FAVORITE_WEIGHT,
+    )
+    collection_games = GameCollection.objects.filter(
+        collection__user_id=profile.user_id, collection__is_deleted=False
+    ).values('game_id')
+    _add(
+        vector,
+        through.filter(game_id__in=collection_games).values_list('tag_id', flat=True),
+        COLLECTION_WEIGHT,
+    )
+    _add(
+        vector,
+        Tag.objects.filter(name__in=profile.preferences).values_list('id', flat=True),
+        EXPLICIT_WEIGHT,
+    )
+    profile.affinity = pack(vector)
+    profile.save(update_fields=['affinity'])
+    return vector
+
+
+def load_affinity(user):
+    if not user.is_authenticated:
+        return None
+    data = UserProfile.objects.filter(user=user).values_list('affinity', flat=True).first()
+    vector = unpack(data)
+    return vector if any(vector) else None
+
+
+def profiles_with_games(game_ids):
+    """Профили, на векторы которых влияют теги этих игр"""
+    favorites = Favorite.objects.filter(game_id__in=game_ids).values('user_id')
+    collections = GameCollection.objects.filter(
+        game_id__in=game_ids, collection__is_deleted=False
+    ).values('collection__user_id')
+    return UserProfile.objects.filter(Q(user_id__in=favorites) | Q(user_id__in=collections))
+
+
+def affinity_scores(vector, candidate_tag_ids):
+    """
+    Скалярное произведение вектора пользователя с бинарным вектором тегов каждой
+    игры-кандидата, то есть сумма весов её тегов. Считается сразу по всем
+    кандидатам: веса всех тегов выбираются одним map, а суммы по играм — это
+    разности префиксных сумм (accumulate), без цикла Python по тегам.
+    """
+    flat = array('q', chain.from_iterable(candidate_tag_ids))
+    ends = list(accumulate(map(len, candidate_tag_ids)))
+    if flat and max(flat) >= len(vector):
+        vector = vector + array('f', bytes(4 * (max(flat) + 1 - len(vector))))
+    prefix = array('d', accumulate(map(vector.__getitem__, flat), initial=0.0))
+    return list(map(sub, map(prefix.__getitem__, ends), map(prefix.__getitem__, chain((0,), ends))))
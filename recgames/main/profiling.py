@@ -0,0 +1,151 @@
+"""
+Профилирование отдельных запросов по требованию персонала.
+
+Запрос с заголовком `X-Profile: 1` или параметром `?_profile=1` от сотрудника
+выполняется под cProfile и семплирующим профилировщиком, а все SQL-запросы
+записываются с временем и планом выполнения. Результат сохраняется в
+PROFILE_DIR/<id>/ и доступен для скачивания на /profiles/<id>/<файл>.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+ARTIFACTS = {
+    'profile.pstats': 'application/octet-stream',
+    'stacks.collapsed': 'text/plain; charset=utf-8',
+    'sql.json': 'application/json',
+}
+
+MAX_EXPLAINED_QUERIES = 50
+
+
+def profile_dir():
+    return Path(settings.PROFILE_DIR)
+
+
+def is_valid_profile_id(profile_id):
+    return profile_id.replace('-', '').isalnum()
+
+
+def wants_profile(request):
+    return request.headers.get('X-Profile') == '1' or request.GET.get('_profile') == '1'
+
+
+def allow_profile(user):
+    """Не больше PROFILE_RATE_LIMIT профилей на сотрудника за PROFILE_RATE_WINDOW секунд"""
+    key = f'profiling:rate:{user.pk}'
+    cache.add(key, 0, settings.PROFILE_RATE_WINDOW)
+    try:
+        used = cache.incr(key)
+    except ValueError:
+        # ключ успел истечь между add и incr
+        cache.set(key, 1, settings.PROFILE_RATE_WINDOW)
+        used = 1
+    return used <= settings.PROFILE_RATE_LIMIT
+
+
+class StackSampler(threading.Thread):
+    """Периодически снимает стек указанного потока; результат — collapsed stacks для flamegraph"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+        # исходные параметры нужны для EXPLAIN, в JSON они пишутся строками
+        self.raw_params = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': None if many else [str(param) for param in params or ()],
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+            self.raw_params.append(None if many else params)
+
+
+def explain(sql, params):
+    """План выполнения SELECT-запроса в виде списка строк"""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as exc:
+        return [f'EXPLAIN не удался: {exc}']
+
+
+def write_artifacts(request, profiler, sampler, recorder, duration):
+    profile_id = f"{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    target = profile_dir() / profile_id
+    target.mkdir(parents=True, exist_ok=True)
+
+    profiler.dump_stats(target / 'profile.pstats')
+    (target / 'stacks.collapsed').write_text(sampler.collapsed())
+
+    explained = {}
+    for query, params in zip(recorder.queries, recorder.raw_params):
+        if len(explained) >= MAX_EXPLAINED_QUERIES:
+            break
+        if query['sql'] not in explained and query['params'] is not None:
+            explained[query['sql']] = explain(query['sql'], params)
+    for query in recorder.queries:
+        query['plan'] = explained.get(query['sql'])
+
+    match = request.resolver_match
+    (target / 'sql.json').write_text(json.dumps({
+        'path': request.get_full_path(),
+        'view': match.view_name if match else None,
+        'duration_ms': round(duration * 1000, 3),
+        'query_count': len(recorder.queries),
+        'query_time_ms': round(sum(query['duration_ms'] for query in recorder.queries), 3),
+        'queries': recorder.queries,
+    }, ensure_ascii=False, indent=2))
+    return profile_id
+
+
+def list_profiles(limit=50):
+    root = profile_dir()
+    if not root.exists():
+        return []
+    return sorted((path.name for path in root.iterdir() if path.is_dir()), reverse=True)[:limit]
@@ -0,0 +1,175 @@
+"""
+Журнал медленных SQL-запросов и поиск N+1.
+
+QueryLogMiddleware оборачивает выполнение SQL в каждом запросе. Запросы
+дольше SLOW_QUERY_THRESHOLD_MS пишутся в лог вместе с отпечатком (SQL без
+литералов), местом вызова и планом выполнения. Если один и тот же SQL
+выполнился за запрос N_PLUS_ONE_THRESHOLD раз и больше (например,
+game.tags.all() в цикле), это помечается как N+1.
+
+Всё агрегируется по отпечатку и доступно персоналу на /slow-queries/.
+"""
+import hashlib
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from .profiling import explain
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = Path(__file__).resolve().parent
+SKIP_FILES = {'querylog.py', 'middleware.py', 'profiling.py', 'metrics.py', 'template_backend.py'}
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = IN_LIST.sub('IN (...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    normalized = normalize(sql)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+def call_site(view_name):
+    """Первый кадр стека из кода приложения, например 'views.py:85 get_recommendations'"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        path = Path(frame.f_code.co_filename)
+        if path.parent == APP_DIR and path.name not in SKIP_FILES:
+            return f'{path.name}:{frame.f_lineno} {frame.f_code.co_name}'
+        frame = frame.f_back
+    return view_name or 'unknown'
+
+
+class QueryStats:
+    def __init__(self, normalized):
+        self.normalized = normalized
+        self.slow_count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.n_plus_one = 0
+        self.max_repeats = 0
+        self.call_sites = Counter()
+        self.plan = None
+
+    def as_dict(self, key):
+        return {
+            'fingerprint': key,
+            'sql': self.normalized,
+            'slow_count': self.slow_count,
+            'total_ms': round(self.total_ms, 3),
+            'max_ms': round(self.max_ms, 3),
+            'n_plus_one': self.n_plus_one,
+            'max_repeats': self.max_repeats,
+            'call_sites': dict(self.call_sites.most_common(5)),
+            'plan': self.plan,
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _get(self, key, normalized):
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = QueryStats(normalized)
+        return stats
+
+    def needs_plan(self, key):
+        stats = self.stats.get(key)
+        return stats is None or stats.plan is None
+
+    def add_slow(self, key, normalized, duration_ms, site, plan):
+        with self.lock:
+            stats = self._get(key, normalized)
+            stats.slow_count += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.call_sites[site] += 1
+            if plan is not None:
+                stats.plan = plan
+
+    def add_n_plus_one(self, key, normalized, repeats, site):
+        with self.lock:
+            stats = self._get(key, normalized)
+            stats.n_plus_one += 1
+            stats.max_repeats = max(stats.max_repeats, repeats)
+            stats.call_sites[site] += 1
+
+    def report(self):
+        with self.lock:
+            rows = [stats.as_dict(key) for key, stats in self.stats.items()]
+        return sorted(rows, key=lambda row: (row['total_ms'], row['n_plus_one']), reverse=True)
+
+    def clear(self):
+        with self.lock:
+            self.stats.clear()
+
+
+registry = Registry()
+
+
+class RequestQueryLog:
+    """Обёртка для connection.execute_wrapper на время одного HTTP-запроса"""
+
+    def __init__(self, request, threshold_ms, repeat_threshold):
+        self.request = request
+        self.threshold_ms = threshold_ms
+        self.repeat_threshold = repeat_threshold
+        self.repeats = Counter()
+        self.repeat_sites = {}
+        self.slow = []
+
+    def view_name(self):
+        match = self.request.resolver_match
+        return match.view_name if match else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.repeats[sql] += 1
+            if self.repeats[sql] == self.repeat_threshold:
+                self.repeat_sites[sql] = call_site(self.view_name())
+            if duration_ms >= self.threshold_ms:
+                self.slow.append((sql, None if many else params, duration_ms, call_site(self.view_name())))
+
+    def finish(self):
+        """Разбирает собранное после ответа: EXPLAIN выполняется уже вне обёртки"""
+        view = self.view_name()
+        for sql, params, duration_ms, site in self.slow:
+            key, normalized = fingerprint(sql)
+            plan = None
+            if params is not None and registry.needs_plan(key):
+                plan = explain(sql, params)
+            registry.add_slow(key, normalized, duration_ms, site, plan)
+            logger.warning(
+                'Медленный запрос %.1f мс [%s] %s (%s): %s\nПлан: %s',
+                duration_ms, key, view, site, normalized, plan,
+            )
+
+        for sql, site in self.repeat_sites.items():
+            key, normalized = fingerprint(sql)
+            registry.add_n_plus_one(key, normalized, self.repeats[sql], site)
+            logger.warning(
+                'Возможный N+1: запрос [%s] выполнен %d раз за запрос %s (%s): %s',
+                key, self.repeats[sql], view, site, normalized,
+            )
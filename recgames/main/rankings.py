@@ -0,0 +1,131 @@
+"""
+Снимки рейтингов для главной страницы.
+
+Тяжёлые агрегаты (последние игры, подборки по лайкам) считаются командой
+`manage.py refresh_rankings`, а главная страница читает готовые списки id
+и достаёт объекты по первичному ключу. Игры в тренде берутся из main/trending.py.
+Готовая подборка для главной и список публичных подборок на странице
+подборок кэшируются через main/single_flight.py.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import single_flight, trending
+from .models import Game, Collection, RankingSnapshot
+
+LATEST_GAMES_LIMIT = 8
+POPULAR_COLLECTIONS_LIMIT = 6
+TRENDING_GAMES_LIMIT = 8
+
+HOME_RANKINGS_KEY = 'home_rankings'
+PUBLIC_COLLECTIONS_KEY = 'public_collections'
+
+
+def build_latest_games():
+    ids = Game.objects.order_by('-created_at').values_list('id', flat=True)[:LATEST_GAMES_LIMIT]
+    return [{'id': game_id} for game_id in ids]
+
+
+def build_popular_collections():
+    rows = Collection.objects.alive().filter(is_public=True).order_by(
+        '-likes_count', '-created_at'
+    ).values_list('id', 'likes_count', 'games_count')[:POPULAR_COLLECTIONS_LIMIT]
+    return [
+        {'id': collection_id, 'like_count': like_count, 'games_count': games_count}
+        for collection_id, like_count, games_count in rows
+    ]
+
+
+BUILDERS = {
+    RankingSnapshot.KIND_LATEST_GAMES: build_latest_games,
+    RankingSnapshot.KIND_POPULAR_COLLECTIONS: build_popular_collections,
+}
+
+
+def refresh_snapshots():
+    now = timezone.now()
+    snapshots = {}
+    with transaction.atomic():
+        for kind, builder in BUILDERS.items():
+            snapshots[kind], _ = RankingSnapshot.objects.update_or_create(
+                kind=kind, defaults={'items': builder(), 'built_at': now}
+            )
+    return snapshots
+
+
+def load_snapshots():
+    """
+    Один запрос за всеми снимками. Если снимков нет или фоновый пересчёт
+    давно не запускался (RANKINGS_MAX_AGE), снимки строятся на месте.
+    """
+    snapshots = {
+        snapshot.kind: snapshot
+        for snapshot in RankingSnapshot.objects.filter(kind__in=BUILDERS)
+    }
+    if len(snapshots) < len(BUILDERS):
+        return refresh_snapshots()
+
+    oldest = min(snapshot.built_at for snapshot in snapshots.values())
+    if timezone.now() - oldest > timedelta(seconds=settings.RANKINGS_MAX_AGE):
+        return refresh_snapshots()
+    return snapshots
+
+
+def _resolve(items, objects):
+    """Сопоставляет элементы снимка с объектами, пропуская удалённые после построения"""
+    resolved = []
+    for item in items:
+        obj = objects.get(item['id'])
+        if obj is None:
+            continue
+        for key, value in item.items():
+            if key != 'id':
+                setattr(obj, key, value)
+        resolved.append(obj)
+    return resolved
+
+
+def home_rankings():
+    snapshots = load_snapshots()
+    latest_items = snapshots[RankingSnapshot.KIND_LATEST_GAMES].items
+    # с запасом: часть игр из трендов могла быть удалена
+    trending_items = [
+        {'id': game_id, 'trend_score': score}
+        for game_id, score in trending.top_games(TRENDING_GAMES_LIMIT * 2)
+    ]
+    collection_items = snapshots[RankingSnapshot.KIND_POPULAR_COLLECTIONS].items
+
+    game_ids = {item['id'] for item in latest_items} | {item['id'] for item in trending_items}
+    games = Game.objects.in_bulk(game_ids)
+    collections = Collection.objects.alive().select_related('user').in_bulk(
+        [item['id'] for item in collection_items]
+    )
+
+    return {
+        'latest_games': _resolve(latest_items, games),
+        'trending_games': _resolve(trending_items, games)[:TRENDING_GAMES_LIMIT],
+        'popular_collections': _resolve(collection_items, collections),
+    }
+
+
+def cached_home_rankings():
+    return single_flight.get_or_compute(HOME_RANKINGS_KEY, home_rankings, settings.HOME_RANKINGS_CACHE_TTL)
+
+
+def public_collections():
+    return Collection.objects.alive().filter(
+        is_public=True
+    ).select_related('user').order_by('-likes_count', '-created_at')
+
+
+def cached_public_collections():
+    return single_flight.get_or_compute(
+        PUBLIC_COLLECTIONS_KEY, lambda: list(public_collections()), settings.COLLECTIONS_CACHE_TTL,
+    )
+
+
+def expire_public_collections():
+    single_flight.expire(PUBLIC_COLLECTIONS_KEY)
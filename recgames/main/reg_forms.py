@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db.models.functions import Lower
 
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(
@@ -30,6 +31,10 @@ class CustomUserCreationForm(UserCreationForm):
     
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        # LOWER(email) и email > '' совпадают с выражением и условием уникального
+        # индекса main_auth_user_email_lower
+        if User.objects.annotate(email_lower=Lower('email')).filter(
+            email_lower=email.lower(), email__gt=''
+        ).exists():
             raise ValidationError('Пользователь с таким email уже существует.')
         return email
\ No newline at end of file
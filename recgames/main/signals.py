@@ -0,0 +1,175 @@
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import (
+    catalog_index, catalog_snapshot, change_log, invalidation, jobs, preferences, rankings, single_flight,
+    tag_stats, thumbnails, user_state,
+)
+from .auth_backends import invalidate_user
+from .models import Game, Tag, Favorite, CollectionLike, Collection, GameCollection
+
+
+def _each(invalidate):
+    def handler(keys):
+        for key in keys:
+            invalidate(key)
+    return handler
+
+
+# обработчики шины инвалидации (main/invalidation.py): вызываются после коммита
+# в процессе, где случилось изменение, и в остальных процессах при опросе
+invalidation.subscribe('user', _each(invalidate_user))
+invalidation.subscribe('user_state', _each(user_state.invalidate))
+for topic in ('game', 'tag', 'game_tags'):
+    invalidation.subscribe(topic, lambda keys: catalog_index.invalidate())
+# на главной показываются названия и обложки игр
+invalidation.subscribe('game', lambda keys: single_flight.expire(rankings.HOME_RANKINGS_KEY))
+invalidation.subscribe('collection', lambda keys: rankings.expire_public_collections())
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidation.publish('user', instance.pk)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def game_changed(sender, instance, **kwargs):
+    catalog_snapshot.bump_revision()
+    change_log.record('games', [instance.pk])
+    invalidation.publish('game', instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    catalog_snapshot.bump_revision()
+    change_log.record('tags', [instance.pk])
+    invalidation.publish('tag', instance.pk)
+
+
+@receiver(m2m_changed, sender=Game.tags.through)
+def game_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        catalog_snapshot.bump_revision()
+        invalidation.publish('game_tags')
+
+    # статистику считаем до удаления, пока известно, какие теги у игры были
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    if reverse:
+        # tag.game_set.add(...): instance — тег, pk_set — игры
+        if action == 'pre_clear':
+            pk_set = set(sender.objects.filter(tag_id=instance.pk).values_list('game_id', flat=True))
+        changes = [(game_id, {instance.pk}) for game_id in pk_set]
+    else:
+        changes = [(instance.pk, pk_set)]
+
+    changed_tags = set()
+    for game_id, tag_ids in changes:
+        current = tag_stats.game_tag_ids(game_id)
+        if action == 'post_add':
+            tag_stats.apply_change(tag_ids, current, sign=1)
+        else:
+            tag_ids = current if tag_ids is None else current & set(tag_ids)
+            tag_stats.apply_change(tag_ids, current, sign=-1)
+        changed_tags.update(tag_ids)
+    # у тегов изменился games_count
+    change_log.record('tags', changed_tags)
+    game_ids = [game_id for game_id, _ in changes]
+    change_log.record('games', game_ids)
+    # векторы предпочтений тех, у кого эти игры, пересчитает задача
+    if preferences.profiles_with_games(game_ids).exists():
+        jobs.enqueue_once('rebuild_preferences', game_ids=sorted(game_ids))
+
+
+@receiver(pre_delete, sender=Game)
+def game_deleting(sender, instance, **kwargs):
+    # каскадное удаление связей не отправляет m2m_changed
+    tag_ids = tag_stats.game_tag_ids(instance.pk)
+    tag_stats.apply_change(tag_ids, (), sign=-1)
+    change_log.record('tags', tag_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    # у игр тега пропадёт тег, а m2m_changed при каскаде не придёт
+    change_log.record('games', tag_stats.GameTag.objects.filter(tag_id=instance.pk).values_list('game_id', flat=True))
+
+
+@receiver(post_save, sender=Game)
+def game_saved(sender, instance, created, update_fields, **kwargs):
+    if update_fields is not None and 'game_image' not in update_fields:
+        return
+    # у объекта, созданного не из БД (Game(...).save()), исходной обложки нет
+    changed = created or instance.game_image != getattr(instance, '_loaded_game_image', None)
+    instance._loaded_game_image = instance.game_image
+    if (changed and thumbnails.available()
+            and instance.cover_thumbnails.get('source') != instance.game_image):
+        jobs.enqueue_once('build_thumbnails', game_ids=[instance.id])
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_added(sender, instance, created, **kwargs):
+    invalidation.publish('user_state', instance.user_id)
+    if created:
+        preferences.apply_favorite(instance.user_id, instance.game_id)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_removed(sender, instance, **kwargs):
+    invalidation.publish('user_state', instance.user_id)
+    preferences.apply_favorite(instance.user_id, instance.game_id, sign=-1)
+
+
+def _collection_owner_id(collection_id):
+    return Collection.objects.filter(id=collection_id).values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender=Collection)
+@receiver(post_delete, sender=Collection)
+def collection_changed(sender, instance, **kwargs):
+    invalidation.publish('user_state', instance.user_id)
+    invalidation.publish('collection', instance.pk)
+    change_log.record('collections', [instance.pk])
+
+
+@receiver(post_save, sender=GameCollection)
+def collection_game_added(sender, instance, created, **kwargs):
+    if created:
+        Collection.objects.filter(id=instance.collection_id).update(games_count=F('games_count') + 1)
+        invalidation.publish('collection', instance.collection_id)
+        change_log.record('collections', [instance.collection_id])
+        owner_id = _collection_owner_id(instance.collection_id)
+        if owner_id is not None:
+            invalidation.publish('user_state', owner_id)
+            preferences.apply_collection_game(owner_id, instance.game_id)
+
+
+@receiver(post_delete, sender=GameCollection)
+def collection_game_removed(sender, instance, **kwargs):
+    Collection.objects.filter(id=instance.collection_id).update(games_count=F('games_count') - 1)
+    invalidation.publish('collection', instance.collection_id)
+    change_log.record('collections', [instance.collection_id])
+    owner_id = _collection_owner_id(instance.collection_id)
+    if owner_id is not None:
+        invalidation.publish('user_state', owner_id)
+        preferences.apply_collection_game(owner_id, instance.game_id, sign=-1)
+
+
+@receiver(post_save, sender=CollectionLike)
+def collection_liked(sender, instance, created, **kwargs):
+    invalidation.publish('user_state', instance.user_id)
+    if created:
+        Collection.objects.filter(id=instance.collection_id).update(likes_count=F('likes_count') + 1)
+        change_log.record('collections', [instance.collection_id])
+
+
+@receiver(post_delete, sender=CollectionLike)
+def collection_unliked(sender, instance, **kwargs):
+    invalidation.publish('user_state', instance.user_id)
+    Collection.objects.filter(id=instance.collection_id).update(likes_count=F('likes_count') - 1)
+    change_log.record('collections', [instance.collection_id])
@@ -0,0 +1,84 @@
+"""
+Кэширование дорогих вычислений без «стада» пересчётов.
+
+Когда популярная запись истекает, обычный кэш пропускает к БД все запросы,
+пришедшие до первой записи нового значения. get_or_compute пересчитывает
+значение не больше одного раза на ключ:
+
+- запись хранится дольше своего срока (ещё SINGLE_FLIGHT_STALE_TTL секунд),
+  и пока один процесс пересчитывает её под замком в кэше (cache.add), все
+  остальные отдают старое значение;
+- пересчёт начинается немного раньше срока со случайным сдвигом (XFetch:
+  чем дольше считается значение и чем ближе срок, тем вероятнее), поэтому
+  у горячих ключей значение обычно обновляется раньше, чем устареет;
+- если значения нет совсем, запросы без замка ждут его до SINGLE_FLIGHT_WAIT
+  секунд и только потом считают сами.
+
+expire() помечает запись устаревшей, не удаляя её: следующий читатель
+обновит её, остальные в это время получат старое значение.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# пауза между проверками, пока значение считает другой процесс
+POLL_INTERVAL = 0.05
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _should_refresh(entry, now, beta):
+    """XFetch: истёкшая запись обновляется всегда, свежая — с ростом вероятности к сроку"""
+    _, delta, expires_at = entry
+    return now - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _compute_and_store(key, compute, ttl):
+    start = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - start
+    cache.set(key, (value, delta, time.time() + ttl), ttl + settings.SINGLE_FLIGHT_STALE_TTL)
+    return value
+
+
+def _compute_locked(key, compute, ttl):
+    try:
+        return _compute_and_store(key, compute, ttl)
+    finally:
+        cache.delete(_lock_key(key))
+
+
+def _acquire(key):
+    return cache.add(_lock_key(key), 1, settings.SINGLE_FLIGHT_LOCK_TIMEOUT)
+
+
+def get_or_compute(key, compute, ttl, beta=1.0):
+    entry = cache.get(key)
+    if entry is not None:
+        if _should_refresh(entry, time.time(), beta) and _acquire(key):
+            return _compute_locked(key, compute, ttl)
+        return entry[0]
+
+    if _acquire(key):
+        return _compute_locked(key, compute, ttl)
+
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    # считающий процесс не успел или упал: лучше посчитать самим, чем отдать ошибку
+    return _compute_and_store(key, compute, ttl)
+
+
+def expire(key):
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, _ = entry
+        cache.set(key, (value, delta, 0), settings.SINGLE_FLIGHT_STALE_TTL)
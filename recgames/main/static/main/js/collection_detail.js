@@ -0,0 +1,96 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const favoriteButton = document.querySelector('.btn-favorite-header');
+
+    if (favoriteButton) {
+        favoriteButton.addEventListener('click', function() {
+            const collectionId = this.dataset.collectionId;
+            const isActive = this.classList.contains('active');
+
+            fetch(`/collection/${collectionId}/toggle-favorite/`, {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': getCookie('csrftoken'),
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({})
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.status === 'added') {
+                    this.classList.add('active');
+                    this.innerHTML = '<svg class="heart-icon" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M20.84 4.61a5.5 5.5 0 0 0-7.78 0L12 5.67l-1.06-1.06a5.5 5.5 0 0 0-7.78 7.78l1.06 1.06L12 21.23l7.78-7.78 1.06-1.06a5.5 5.5 0 0 0 0-7.78z"></path></svg> <span>В избранном</span>';
+                    this.setAttribute('title', 'Удалить из избранного');
+
+                    updateLikesCount(collectionId, data.likes_count);
+
+                    showNotification('Добавлено в избранное');
+                } else if (data.status === 'removed') {
+                    this.classList.remove('active');
+                    this.innerHTML = '<svg class="heart-icon" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M20.84 4.61a5.5 5.5 0 0 0-7.78 0L12 5.67l-1.06-1.06a5.5 5.5 0 0 0-7.78 7.78l1.06 1.06L12 21.23l7.78-7.78 1.06-1.06a5.5 5.5 0 0 0 0-7.78z"></path></svg> <span>В избранное</span>';
+                    this.setAttribute('title', 'Добавить в избранное');
+
+                    updateLikesCount(collectionId, data.likes_count);
+
+                    showNotification('Удалено из избранного');
+                } else if (data.status === 'error') {
+                    showNotification(data.message, 'error');
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                showNotification('Ошибка при обновлении', 'error');
+            });
+        });
+    }
+
+    function updateLikesCount(collectionId, likesCount) {
+        const likesElement = document.querySelector(`.likes-count[data-collection-id="${collectionId}"]`);
+        if (likesElement) {
+            likesElement.textContent = likesCount;
+        }
+
+        const allLikesElements = document.querySelectorAll(`.likes-count[data-collection-id="${collectionId}"]`);
+        allLikesElements.forEach(element => {
+            element.textContent = likesCount;
+        });
+    }
+
+    function getCookie(name) {
+        let cookieValue = null;
+        if (document.cookie && document.cookie !== '') {
+            const cookies = document.cookie.split(';');
+            for (let i = 0; i < cookies.length; i++) {
+                const cookie = cookies[i].trim();
+                if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                    cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                    break;
+                }
+            }
+        }
+        return cookieValue;
+    }
+
+    function showNotification(message, type = 'success') {
+        const notification = document.createElement('div');
+        notification.className = `notification ${type}`;
+        notification.textContent = message;
+        notification.style.cssText = `
+            position: fixed;
+            top: 20px;
+            right: 20px;
+            background: ${type === 'error' ? 'var(--danger)' : 'var(--success)'};
+            color: white;
+            padding: 15px 20px;
+            border-radius: 8px;
+            z-index: 1000;
+            animation: slideIn 0.3s ease;
+        `;
+
+        document.body.appendChild(notification);
+
+        setTimeout(() => {
+            notification.style.animation = 'slideOut 0.3s ease';
+            setTimeout(() => notification.remove(), 300);
+        }, 3000);
+    }
+});
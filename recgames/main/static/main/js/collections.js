@@ -0,0 +1,114 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const favoriteButtons = document.querySelectorAll('.favorite-heart-btn-collection');
+
+    favoriteButtons.forEach(button => {
+        button.addEventListener('click', function() {
+            const collectionId = this.dataset.collectionId;
+
+            fetch(`/collection/${collectionId}/toggle-favorite/`, {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': getCookie('csrftoken'),
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({})
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.status === 'added') {
+                    this.classList.add('active');
+                    this.setAttribute('title', 'Удалить из избранного');
+
+                    updateLikesCount(collectionId, data.likes_count);
+
+                    showNotification('Добавлено в избранное', 'success');
+                } else if (data.status === 'removed') {
+                    this.classList.remove('active');
+                    this.setAttribute('title', 'Добавить в избранное');
+
+                    updateLikesCount(collectionId, data.likes_count);
+
+                    showNotification('Удалено из избранного', 'success');
+                } else if (data.status === 'error') {
+                    showNotification(data.message, 'error');
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                showNotification('Ошибка при обновлении', 'error');
+            });
+        });
+    });
+
+    function updateLikesCount(collectionId, likesCount) {
+        const likesElements = document.querySelectorAll(`.likes-count[data-collection-id="${collectionId}"]`);
+        likesElements.forEach(element => {
+            element.innerHTML = `❤️ ${likesCount}`;
+        });
+    }
+
+    function getCookie(name) {
+        let cookieValue = null;
+        if (document.cookie && document.cookie !== '') {
+            const cookies = document.cookie.split(';');
+            for (let i = 0; i < cookies.length; i++) {
+                const cookie = cookies[i].trim();
+                if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                    cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                    break;
+                }
+            }
+        }
+        return cookieValue;
+    }
+
+    function showNotification(message, type = 'success') {
+        const notification = document.createElement('div');
+        notification.className = `notification ${type}`;
+        notification.textContent = message;
+        notification.style.cssText = `
+            position: fixed;
+            top: 20px;
+            right: 20px;
+            background: ${type === 'error' ? 'var(--danger)' : 'var(--success)'};
+            color: white;
+            padding: 15px 20px;
+            border-radius: 8px;
+            z-index: 1000;
+            animation: slideIn 0.3s ease;
+        `;
+
+        document.body.appendChild(notification);
+
+        setTimeout(() => {
+            notification.style.animation = 'slideOut 0.3s ease';
+            setTimeout(() => notification.remove(), 300);
+        }, 3000);
+    }
+
+    const style = document.createElement('style');
+    style.textContent = `
+        @keyframes slideIn {
+            from {
+                transform: translateX(100%);
+                opacity: 0;
+            }
+            to {
+                transform: translateX(0);
+                opacity: 1;
+            }
+        }
+
+        @keyframes slideOut {
+            from {
+                transform: translateX(0);
+                opacity: 1;
+            }
+            to {
+                transform: translateX(100%);
+                opacity: 0;
+            }
+        }
+    `;
+    document.head.appendChild(style);
+});
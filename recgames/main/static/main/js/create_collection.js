@@ -0,0 +1,36 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const customCheckboxes = document.querySelectorAll('.checkbox-custom');
+
+    customCheckboxes.forEach(checkbox => {
+        checkbox.addEventListener('click', function() {
+            const realCheckbox = this.previousElementSibling; 
+            if (realCheckbox && realCheckbox.type === 'checkbox') {
+                realCheckbox.checked = !realCheckbox.checked;
+                realCheckbox.dispatchEvent(new Event('change'));
+            }
+        });
+
+        const label = checkbox.closest('.checkbox-label');
+        if (label) {
+            label.addEventListener('click', function(e) {
+                if (!e.target.classList.contains('checkbox-custom')) {
+                    const realCheckbox = this.querySelector('input[type="checkbox"]');
+                    if (realCheckbox) {
+                        realCheckbox.checked = !realCheckbox.checked;
+                        realCheckbox.dispatchEvent(new Event('change'));
+                    }
+                }
+            });
+        }
+    });
+
+    const checkboxes = document.querySelectorAll('.checkbox-label input[type="checkbox"]');
+    checkboxes.forEach(checkbox => {
+        if (checkbox.checked) {
+            const customCheckbox = checkbox.nextElementSibling;
+            if (customCheckbox && customCheckbox.classList.contains('checkbox-custom')) {
+                checkbox.dispatchEvent(new Event('change'));
+            }
+        }
+    });
+});
@@ -0,0 +1,149 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // карточки подгружаются постранично, поэтому обработчики вешаются на документ
+    document.addEventListener('click', function(event) {
+        const collectionButton = event.target.closest('.favorite-heart-btn');
+        if (collectionButton) {
+            removeFromFavorites(collectionButton.dataset.collectionId, 'collection', collectionButton.closest('.collection-card'));
+            return;
+        }
+
+        const gameButton = event.target.closest('.favorite-heart-btn-game');
+        if (gameButton) {
+            removeFromFavorites(gameButton.dataset.gameId, 'game', gameButton.closest('.game-card'));
+        }
+    });
+
+    document.querySelectorAll('.btn-load-more').forEach(button => {
+        button.addEventListener('click', function() {
+            loadMore(this);
+        });
+    });
+
+    function loadMore(button) {
+        button.disabled = true;
+        const params = new URLSearchParams({kind: button.dataset.kind, after: button.dataset.next});
+
+        fetch(`/favorites/page/?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.error);
+            }
+            document.getElementById(button.dataset.target).insertAdjacentHTML('beforeend', data.html);
+            if (data.next) {
+                button.dataset.next = data.next;
+                button.disabled = false;
+            } else {
+                button.remove();
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            button.disabled = false;
+            showNotification('Не удалось загрузить', 'error');
+        });
+    }
+
+    function removeFromFavorites(id, type, element) {
+        const url = type === 'collection' 
+            ? `/collection/${id}/toggle-favorite/`
+            : `/game/${id}/toggle-favorite/`;
+
+        fetch(url, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': getCookie('csrftoken'),
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({})
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.status === 'removed') {
+                if (type === 'collection' && data.likes_count !== undefined) {
+                    const likesElement = element.querySelector(`.likes-count[data-collection-id="${id}"]`);
+                    if (likesElement) {
+                        likesElement.textContent = `❤️ ${data.likes_count}`;
+                    }
+                }
+
+                const button = element.querySelector('.favorite-heart-btn, .favorite-heart-btn-game');
+                if (button) {
+                    button.classList.remove('active');
+                    button.setAttribute('title', 'Добавить в избранное');
+                }
+
+                showNotification('Удалено из избранного');
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showNotification('Ошибка при удалении', 'error');
+        });
+    }
+
+    function getCookie(name) {
+        let cookieValue = null;
+        if (document.cookie && document.cookie !== '') {
+            const cookies = document.cookie.split(';');
+            for (let i = 0; i < cookies.length; i++) {
+                const cookie = cookies[i].trim();
+                if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                    cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                    break;
+                }
+            }
+        }
+        return cookieValue;
+    }
+
+    function showNotification(message, type = 'success') {
+        const notification = document.createElement('div');
+        notification.className = `notification ${type}`;
+        notification.textContent = message;
+        notification.style.cssText = `
+            position: fixed;
+            top: 20px;
+            right: 20px;
+            background: ${type === 'error' ? 'var(--danger)' : 'var(--success)'};
+            color: white;
+            padding: 15px 20px;
+            border-radius: 8px;
+            z-index: 1000;
+            animation: slideIn 0.3s ease;
+        `;
+
+        document.body.appendChild(notification);
+
+        setTimeout(() => {
+            notification.style.animation = 'slideOut 0.3s ease';
+            setTimeout(() => notification.remove(), 300);
+        }, 3000);
+    }
+
+    const style = document.createElement('style');
+    style.textContent = `
+        @keyframes slideIn {
+            from {
+                transform: translateX(100%);
+                opacity: 0;
+            }
+            to {
+                transform: translateX(0);
+                opacity: 1;
+            }
+        }
+
+        @keyframes slideOut {
+            from {
+                transform: translateX(0);
+                opacity: 1;
+            }
+            to {
+                transform: translateX(100%);
+                opacity: 0;
+            }
+        }
+    `;
+    document.head.appendChild(style);
+});
@@ -0,0 +1,156 @@
+function toggleFavoriteGame(gameId, button) {
+    fetch(`/game/${gameId}/toggle-favorite/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.status === 'added') {
+            button.classList.add('active');
+            button.innerHTML = 'В избранном';
+            showNotification('Добавлено в избранное');
+        } else if (data.status === 'removed') {
+            button.classList.remove('active');
+            button.innerHTML = 'В избранное';
+            showNotification('Удалено из избранного');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        showNotification('Ошибка при обновлении', 'error');
+    });
+}
+
+function addGameToCollection(collectionId, gameId) {
+    fetch(`/collection/${collectionId}/add-game-ajax/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            game_id: gameId
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.status === 'success') {
+            showNotification(data.message);
+
+            const option = document.querySelector(`.collection-option[data-collection-id="${collectionId}"]`);
+            if (option && !option.querySelector('.already-added')) {
+                option.innerHTML += ' <span class="already-added">(уже есть)</span>';
+            }
+        } else {
+            showNotification(data.message, 'error');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        showNotification('Ошибка при добавлении игры', 'error');
+    })
+    .finally(() => {
+        toggleCollectionDropdown();
+    });
+}
+
+function toggleCollectionDropdown() {
+    const dropdown = document.getElementById('collectionDropdown');
+    dropdown.classList.toggle('show');
+}
+
+document.addEventListener('click', function(event) {
+    const dropdown = document.getElementById('collectionDropdown');
+    const button = document.querySelector('.btn-add-to-collection');
+
+    if (!dropdown.contains(event.target) && !button.contains(event.target)) {
+        dropdown.classList.remove('show');
+    }
+});
+
+document.addEventListener('DOMContentLoaded', function() {
+    const favoriteButton = document.querySelector('.btn-favorite-game');
+    if (favoriteButton) {
+        favoriteButton.addEventListener('click', function() {
+            const gameId = this.dataset.gameId;
+            toggleFavoriteGame(gameId, this);
+        });
+    }
+
+    const collectionOptions = document.querySelectorAll('.collection-option');
+    collectionOptions.forEach(option => {
+        option.addEventListener('click', function() {
+            const collectionId = this.dataset.collectionId;
+            const gameId = this.dataset.gameId;
+
+            if (!this.querySelector('.already-added')) {
+                addGameToCollection(collectionId, gameId);
+
+                this.innerHTML += ' <span class="already-added">(уже есть)</span>';
+            } else {
+                showNotification('Игра уже есть в этой подборке', 'info');
+            }
+        });
+    });
+});
+
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+
+function showNotification(message, type = 'success') {
+    const notification = document.createElement('div');
+    notification.className = `notification ${type}`;
+    notification.textContent = message;
+    notification.style.cssText = `
+        position: fixed;
+        top: 20px;
+        right: 20px;
+        background: ${type === 'error' ? 'var(--danger)' : type === 'info' ? 'var(--primary)' : 'var(--success)'};
+        color: white;
+        padding: 15px 20px;
+        border-radius: 8px;
+        z-index: 1000;
+        animation: slideIn 0.3s ease;
+    `;
+
+    document.body.appendChild(notification);
+
+    setTimeout(() => {
+        notification.style.animation = 'slideOut 0.3s ease';
+        setTimeout(() => notification.remove(), 300);
+    }, 3000);
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const tags = document.querySelectorAll('.tag');
+
+    tags.forEach(tag => {
+        const text = tag.textContent.trim();
+        const textLength = text.length;
+
+        if (textLength > 20) {
+            tag.classList.add('long-tag');
+        }
+
+        if (text.includes(' ') || text.includes('-') || text.includes('_')) {
+            tag.style.wordBreak = 'break-word';
+            tag.style.overflowWrap = 'break-word';
+        }
+    });
+});
@@ -0,0 +1,384 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const includeTagsContainer = document.getElementById('include-tags-container');
+    const excludeTagsContainer = document.getElementById('exclude-tags-container');
+    const includeTagsCount = document.getElementById('include-tags-count');
+    const excludeTagsCount = document.getElementById('exclude-tags-count');
+    const clearAllBtn = document.getElementById('clear-all-btn');
+    const getRecommendationsBtn = document.getElementById('get-recommendations-btn');
+    // кнопки нет у анонимных пользователей
+    const savePreferencesBtn = document.getElementById('save-preferences-btn');
+    const resultsContainer = document.getElementById('results-container');
+    const resultsCount = document.getElementById('results-count');
+    const loadingIndicator = document.getElementById('loading-indicator');
+
+    let selectedIncludeTags = new Set();
+    let selectedExcludeTags = new Set();
+
+    const facetCheckboxes = document.querySelectorAll('.facet-checkbox');
+    const facetRanges = document.querySelectorAll('.facet-range');
+
+    function getFacets() {
+        const facets = {genres: [], platforms: []};
+        facetCheckboxes.forEach(checkbox => {
+            if (checkbox.checked) {
+                facets[checkbox.dataset.facet].push(checkbox.value);
+            }
+        });
+        facets.year_min = document.getElementById('facet-year-min').value;
+        facets.year_max = document.getElementById('facet-year-max').value;
+        facets.price_min = document.getElementById('facet-price-min').value;
+        facets.price_max = document.getElementById('facet-price-max').value;
+        return facets;
+    }
+
+    function hasFacets() {
+        return Array.from(facetCheckboxes).some(checkbox => checkbox.checked) ||
+            Array.from(facetRanges).some(input => input.value !== '');
+    }
+
+    function updateFacetCounts(facets) {
+        document.querySelectorAll('.facet-count').forEach(counter => {
+            const counts = facets[counter.dataset.facet] || {};
+            counter.textContent = counts[counter.dataset.value] || 0;
+        });
+    }
+
+    document.querySelectorAll('.facet-count').forEach(counter => {
+        counter.dataset.initial = counter.textContent;
+    });
+
+    facetCheckboxes.forEach(checkbox => checkbox.addEventListener('change', updateGetRecommendationsButton));
+    facetRanges.forEach(input => input.addEventListener('input', updateGetRecommendationsButton));
+
+    function initTags() {
+        const allTagButtons = document.querySelectorAll('.tag-btn');
+
+        allTagButtons.forEach(button => {
+            button.addEventListener('click', function() {
+                const tag = this.getAttribute('data-tag');
+                const type = this.getAttribute('data-type');
+
+                if (type === 'include') {
+                    toggleTag(selectedIncludeTags, tag, this, includeTagsCount, 'include');
+                    if (selectedExcludeTags.has(tag)) {
+                        removeTagFromExclude(tag);
+                    }
+                } else {
+                    toggleTag(selectedExcludeTags, tag, this, excludeTagsCount, 'exclude');
+                    if (selectedIncludeTags.has(tag)) {
+                        removeTagFromInclude(tag);
+                    }
+                }
+
+                updateGetRecommendationsButton();
+                loadRelatedTags();
+            });
+        });
+    }
+
+    const relatedTags = document.getElementById('related-tags');
+    const relatedTagsList = document.getElementById('related-tags-list');
+    let relatedTagsRequest = 0;
+
+    function loadRelatedTags() {
+        const request = ++relatedTagsRequest;
+        if (selectedIncludeTags.size === 0) {
+            relatedTags.style.display = 'none';
+            return;
+        }
+
+        const params = new URLSearchParams();
+        selectedIncludeTags.forEach(tag => params.append('tag', tag));
+
+        fetch(`/recommendations/related-tags/?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                // ответ на устаревший выбор тегов не показываем
+                if (request !== relatedTagsRequest || !data.success) return;
+                showRelatedTags(data.tags);
+            })
+            .catch(error => console.error('Error:', error));
+    }
+
+    function showRelatedTags(tags) {
+        relatedTagsList.innerHTML = '';
+        tags.forEach(tag => {
+            const button = document.createElement('button');
+            button.className = 'related-tag-btn';
+            button.title = `Вместе с выбранными: до ${tag.score}`;
+            button.textContent = `${tag.name} `;
+            const count = document.createElement('span');
+            count.className = 'tag-count';
+            count.textContent = tag.score;
+            button.appendChild(count);
+            button.addEventListener('click', function() {
+                const tagButton = document.querySelector(`.tag-btn[data-tag="${CSS.escape(tag.name)}"][data-type="include"]`);
+                if (tagButton) tagButton.click();
+            });
+            relatedTagsList.appendChild(button);
+        });
+        relatedTags.style.display = tags.length > 0 ? 'block' : 'none';
+    }
+
+    function toggleTag(tagSet, tag, button, counterElement, type) {
+        if (tagSet.has(tag)) {
+            tagSet.delete(tag);
+            button.classList.remove('selected', type);
+        } else {
+            tagSet.add(tag);
+            button.classList.add('selected', type);
+        }
+
+        counterElement.textContent = tagSet.size;
+    }
+
+    function removeTagFromInclude(tag) {
+        selectedIncludeTags.delete(tag);
+        includeTagsCount.textContent = selectedIncludeTags.size;
+        const button = document.querySelector(`.tag-btn[data-tag="${tag}"][data-type="include"]`);
+        if (button) button.classList.remove('selected', 'include');
+    }
+
+    function removeTagFromExclude(tag) {
+        selectedExcludeTags.delete(tag);
+        excludeTagsCount.textContent = selectedExcludeTags.size;
+        const button = document.querySelector(`.tag-btn[data-tag="${tag}"][data-type="exclude"]`);
+        if (button) button.classList.remove('selected', 'exclude');
+    }
+
+    function updateGetRecommendationsButton() {
+        if (selectedIncludeTags.size === 0 && selectedExcludeTags.size === 0 && !hasFacets()) {
+            getRecommendationsBtn.disabled = true;
+            getRecommendationsBtn.textContent = '🔍 Получить рекомендации';
+        } else {
+            getRecommendationsBtn.disabled = false;
+            getRecommendationsBtn.textContent = '🔍 Получить рекомендации';
+        }
+        if (savePreferencesBtn) {
+            savePreferencesBtn.disabled = selectedIncludeTags.size === 0;
+            savePreferencesBtn.textContent = '⭐ Запомнить выбор';
+        }
+    }
+
+    if (savePreferencesBtn) {
+        savePreferencesBtn.addEventListener('click', function() {
+            savePreferencesBtn.disabled = true;
+            fetch('/recommendations/save-preferences/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCSRFToken()
+                },
+                body: JSON.stringify({include_tags: Array.from(selectedIncludeTags)})
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    savePreferencesBtn.textContent = '✅ Выбор запомнен';
+                } else {
+                    savePreferencesBtn.disabled = false;
+                    showError(data.error || 'Произошла ошибка');
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                savePreferencesBtn.disabled = false;
+            });
+        });
+    }
+
+    clearAllBtn.addEventListener('click', function() {
+        selectedIncludeTags.clear();
+        selectedExcludeTags.clear();
+
+        document.querySelectorAll('.tag-btn.selected').forEach(button => {
+            button.classList.remove('selected', 'include', 'exclude');
+        });
+
+        includeTagsCount.textContent = '0';
+        excludeTagsCount.textContent = '0';
+        loadRelatedTags();
+
+        facetCheckboxes.forEach(checkbox => { checkbox.checked = false; });
+        facetRanges.forEach(input => { input.value = ''; });
+        document.querySelectorAll('.facet-count').forEach(counter => {
+            counter.textContent = counter.dataset.initial;
+        });
+
+        updateGetRecommendationsButton();
+        showPlaceholder();
+    });
+
+    getRecommendationsBtn.addEventListener('click', function() {
+        if (selectedIncludeTags.size === 0 && selectedExcludeTags.size === 0 && !hasFacets()) {
+            return;
+        }
+
+        showLoading();
+
+        const data = {
+            include_tags: Array.from(selectedIncludeTags),
+            exclude_tags: Array.from(selectedExcludeTags),
+            facets: getFacets()
+        };
+
+        fetch('/recommendations/get/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCSRFToken()
+            },
+            body: JSON.stringify(data)
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                displayResults(data.games);
+                updateFacetCounts(data.facets);
+                resultsCount.textContent = `${data.count} ${getWordForm(data.count, ['игра', 'игры', 'игр'])} найдено`;
+            } else {
+                showError(data.error || 'Произошла ошибка');
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showError('Ошибка при загрузке данных');
+        })
+        .finally(() => {
+            hideLoading();
+        });
+    });
+
+    function getCSRFToken() {
+        const cookieValue = document.cookie
+            .split('; ')
+            .find(row => row.startsWith('csrftoken='))
+            ?.split('=')[1];
+        return cookieValue || '';
+    }
+
+    function getWordForm(number, forms) {
+        const cases = [2, 0, 1, 1, 1, 2];
+        return forms[(number % 100 > 4 && number % 100 < 20) ? 2 : cases[(number % 10 < 5) ? number % 10 : 5]];
+    }
+
+    function lazyLoadImages() {
+        const images = document.querySelectorAll('.game-result-image img');
+        images.forEach(img => {
+            if (img.complete) {
+                img.style.opacity = '1';
+            } else {
+                img.onload = function() {
+                    this.style.opacity = '1';
+                };
+                img.onerror = function() {
+                    this.src = '/static/images/no-image.jpg';
+                    this.style.opacity = '1';
+                };
+            }
+        });
+    }
+
+    function showLoading() {
+        resultsContainer.innerHTML = `
+            <div class="loading-state">
+                <div class="loading-spinner"></div>
+                <p>Ищем подходящие игры...</p>
+            </div>
+        `;
+        loadingIndicator.style.display = 'inline';
+        getRecommendationsBtn.disabled = true;
+        getRecommendationsBtn.textContent = '⏳ Обработка...';
+    }
+
+    function hideLoading() {
+        loadingIndicator.style.display = 'none';
+        getRecommendationsBtn.disabled = false;
+        getRecommendationsBtn.textContent = '🔍 Получить рекомендации';
+    }
+
+    function truncateText(text, maxLength) {
+        if (text.length <= maxLength) return text;
+        return text.substring(0, maxLength) + '...';
+    }
+
+    function displayResults(games) {
+        if (games.length === 0) {
+            resultsContainer.innerHTML = `
+                <div class="no-results-placeholder">
+                    <div class="placeholder-icon">😕</div>
+                    <p>По выбранным тегам игры не найдены</p>
+                    <p class="placeholder-tip">Попробуйте изменить критерии поиска</p>
+                </div>
+            `;
+            return;
+        }
+
+        let html = '';
+        games.forEach(game => {
+            const imageUrl = game.thumbnail || game.game_image || '/static/images/no-image.jpg';
+
+            const truncatedTitle = truncateText(game.title, 40);
+            const truncatedDeveloper = truncateText(game.developer, 30);
+
+            html += `
+                <a href="/game/${game.id}/" class="game-result-card">
+                    <div class="game-result-image">
+                        <img src="${imageUrl}" 
+                             alt="${game.title}" 
+                             loading="lazy"
+                             onerror="this.src='/static/images/no-image.jpg'">
+                    </div>
+                    <div class="game-result-info">
+                        <h4 class="game-result-title" title="${game.title}">${truncatedTitle}</h4>
+                        <div class="game-result-meta">
+                            <span class="game-result-genre" title="${game.genres}">${game.genres}</span>
+                            <span class="game-result-year">${game.release_year}</span>
+                            <span class="game-result-rating">★ ${game.rating}</span>
+                        </div>
+                        <div class="game-result-price-section">
+                            <div class="game-result-price">${game.price} ₽</div>
+                        </div>
+                        <div class="game-result-developer" title="${game.developer}">${truncatedDeveloper}</div>
+                        ${game.tags.length > 0 ? `
+                        <div class="game-result-tags">
+                            ${game.tags.map(tag => `<span class="result-tag" title="${tag}">${tag}</span>`).join('')}
+                        </div>
+                        ` : '<div class="game-result-tags"></div>'}
+                    </div>
+                </a>
+            `;
+        });
+
+        resultsContainer.innerHTML = html;
+
+        setTimeout(lazyLoadImages, 100);
+    }
+
+    function showError(message) {
+        resultsContainer.innerHTML = `
+            <div class="no-results-placeholder">
+                <div class="placeholder-icon">⚠️</div>
+                <p>${message}</p>
+                <button onclick="location.reload()" class="secondary-btn" style="margin-top: 20px;">
+                    ⟳ Обновить страницу
+                </button>
+            </div>
+        `;
+        resultsCount.textContent = '0 игр найдено';
+    }
+
+    function showPlaceholder() {
+        resultsContainer.innerHTML = `
+            <div class="no-results-placeholder">
+                <div class="placeholder-icon">✨</div>
+                <p>Выберите теги и нажмите "Получить рекомендации"</p>
+                <p class="placeholder-tip">Чем больше теги вы выберете, тем точнее будут рекомендации</p>
+            </div>
+        `;
+        resultsCount.textContent = '0 игр найдено';
+    }
+
+    initTags();
+    updateGetRecommendationsButton();
+});
@@ -0,0 +1,125 @@
+"""
+Статистика тегов: сколько игр у каждого тега (Tag.games_count) и сколько игр
+у каждой пары тегов (TagCooccurrence, разреженная матрица — строки только
+для встречавшихся пар, в обе стороны).
+
+Сигнал m2m_changed по Game.tags (main/signals.py) обновляет счётчики на ±1
+при каждом изменении тегов игры, поэтому подсказки для выбранных тегов
+читаются одним запросом без агрегации по таблице связей. rebuild()
+пересчитывает всё с нуля (после bulk_create и в миграции).
+"""
+from collections import Counter
+from itertools import groupby, permutations
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Game, Tag, TagCooccurrence
+
+BATCH_SIZE = 5000
+
+GameTag = Game.tags.through
+
+
+def _partners(changed, unchanged):
+    """
+    Для каждого тега — теги, пары с которыми затронуты изменением:
+    changed×unchanged в обе стороны и пары внутри changed
+    """
+    partners = {tag_id: (changed - {tag_id}) | unchanged for tag_id in changed}
+    if changed:
+        for tag_id in unchanged:
+            partners[tag_id] = changed
+    return {tag_id: others for tag_id, others in partners.items() if others}
+
+
+def apply_change(changed, unchanged, sign):
+    """
+    Учитывает, что у одной игры теги changed добавились (sign=1) или убрались
+    (sign=-1), а теги unchanged остались на месте. Счётчики пар обновляются
+    одним UPDATE на тег, а не одним условием на все пары: у игры с десятками
+    тегов пар сотни, и такое условие не разбирается SQLite.
+    """
+    changed, unchanged = set(changed), set(unchanged) - set(changed)
+    if not changed:
+        return
+
+    with transaction.atomic():
+        Tag.objects.filter(id__in=changed).update(games_count=F('games_count') + sign)
+
+        partners = _partners(changed, unchanged)
+        if sign > 0:
+            TagCooccurrence.objects.bulk_create(
+                [TagCooccurrence(tag_id=tag_id, other_id=other_id)
+                 for tag_id, others in partners.items() for other_id in others],
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        for tag_id, others in partners.items():
+            TagCooccurrence.objects.filter(tag_id=tag_id, other_id__in=others).update(
+                games_count=F('games_count') + sign
+            )
+
+
+def game_tag_ids(game_id):
+    return set(GameTag.objects.filter(game_id=game_id).values_list('tag_id', flat=True))
+
+
+def games_count_subquery():
+    counts = GameTag.objects.filter(
+        tag=OuterRef('pk')
+    ).order_by().values('tag').annotate(c=Count('id')).values('c')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def count_pairs(game_tags):
+    """Число игр для каждой упорядоченной пары тегов; game_tags отсортированы по игре"""
+    pairs = Counter()
+    for _, rows in groupby(game_tags, key=lambda row: row[0]):
+        pairs.update(permutations([tag_id for _, tag_id in rows], 2))
+    return pairs
+
+
+def rebuild():
+    """Пересчитывает счётчики тегов и матрицу встречаемости по таблице связей"""
+    pairs = count_pairs(GameTag.objects.order_by('game_id').values_list('game_id', 'tag_id').iterator())
+
+    with transaction.atomic():
+        Tag.objects.update(games_count=games_count_subquery())
+        TagCooccurrence.objects.all().delete()
+        rows = [TagCooccurrence(tag_id=tag_id, other_id=other_id, games_count=count)
+                for (tag_id, other_id), count in pairs.items()]
+        TagCooccurrence.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def related(tag_ids, limit=10):
+    """
+    Теги, которые встречаются вместе с каждым из выбранных. score — минимум
+    совместных игр по выбранным тегам, то есть верхняя граница числа игр,
+    которые останутся, если добавить тег к выбору. Читаются только строки
+    выбранных тегов.
+    """
+    tag_ids = set(tag_ids)
+    if not tag_ids:
+        return []
+
+    scores = {}
+    seen = {}
+    rows = TagCooccurrence.objects.filter(
+        tag_id__in=tag_ids, games_count__gt=0
+    ).exclude(other_id__in=tag_ids).values_list('other_id', 'games_count')
+    for other_id, count in rows:
+        scores[other_id] = min(scores.get(other_id, count), count)
+        seen[other_id] = seen.get(other_id, 0) + 1
+
+    top = sorted(
+        (other_id for other_id in scores if seen[other_id] == len(tag_ids)),
+        key=lambda other_id: -scores[other_id],
+    )[:limit]
+    tags = Tag.objects.in_bulk(top)
+    return [
+        {'name': tags[other_id].name, 'games_count': tags[other_id].games_count, 'score': scores[other_id]}
+        for other_id in top
+    ]
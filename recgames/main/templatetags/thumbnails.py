@@ -0,0 +1,11 @@
+from django import template
+
+from main import thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(game, size='card'):
+    """URL миниатюры обложки, а пока её нет — исходной обложки"""
+    return thumbnails.url_for(game, size)
@@ -1,3 +1,1731 @@
-from django.test import TestCase
+import gzip
+import heapq
+import io
+import json
+import pickle
+import random
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from importlib import import_module
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Count
+from django.db.models.functions import Lower
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import (
+    api, benchmark, catalog_index, catalog_snapshot, change_log, compression, deletion, feedback, invalidation, jobs,
+    preferences, rankings, single_flight, tag_stats, thumbnails, trending, user_state,
+)
+from .models import (
+    ChangeLog, Collection, CollectionLike, Favorite, Feedback, Game, GameCollection, InvalidationEvent, Job,
+    RankingSnapshot, Tag, TagCooccurrence, TrendingState, UserProfile,
+)
+from .auth_backends import CachedModelBackend
+from .catalog_index import CatalogIndex, PRICE_BUCKETS, Selection, decade, index_from_db, price_bucket
+from .reg_forms import CustomUserCreationForm
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from .trending import DecayedScores, MIN_SCORE
+
+MD5_HASHER = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def small_index():
+    """Три игры: id 1 и 3 с тегом RPG (id 10), id 2 и 3 с тегом Coop (id 20)"""
+    games = [
+        (1, 'Alpha', 'RPG', 'PC', 1995, 0, 7),
+        (2, 'Beta', 'Action', 'Xbox', 2005, 500, 9),
+        (3, 'Gamma', 'RPG', 'PC', 2015, 1500, 8),
+    ]
+    game_tags = [(1, 10), (3, 10), (2, 20), (3, 20)]
+    tags = [(10, 'RPG'), (20, 'Coop'), (30, 'Empty')]
+    return CatalogIndex.from_rows(games, game_tags, tags)
+
+
+def create_game(title, **fields):
+    defaults = {
+        'genre': 'RPG', 'developer': 'Studio', 'release_year': 2010, 'price': 500,
+        'platforms': 'PC', 'rating': 5, 'description': 'Описание',
+        'game_image': 'https://example.com/cover.jpg', 'steam_url': 'https://example.com/steam',
+    }
+    defaults.update(fields)
+    return Game.objects.create(title=title, **defaults)
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    BASELINE = {'home': {'p95_ms': 10.0, 'queries': 5}, 'wire:home:gzip': {'bytes': 1000}}
+
+    def test_within_threshold(self):
+        results = {'home': {'p95_ms': 11.9, 'queries': 5}, 'wire:home:gzip': {'bytes': 1150}}
+        self.assertEqual(benchmark.compare(results, self.BASELINE, 0.2), [])
+
+    def test_regressions(self):
+        results = {'home': {'p95_ms': 12.5, 'queries': 6}, 'wire:home:gzip': {'bytes': 1300}}
+        self.assertEqual(len(benchmark.compare(results, self.BASELINE, 0.2)), 3)
+
+    def test_new_scenario_is_not_a_regression(self):
+        self.assertEqual(benchmark.compare({'search': {'p95_ms': 99.0}}, self.BASELINE, 0.2), [])
+
+    def test_percentiles(self):
+        result = benchmark.Result('x', latencies=[n / 1000 for n in range(1, 101)], queries=[3] * 100)
+        self.assertEqual(result.summary(), {
+            'iterations': 100, 'p50_ms': 50.0, 'p95_ms': 95.0, 'p99_ms': 99.0, 'queries': 3,
+        })
+
+
+@override_settings(CATALOG_SNAPSHOT_AUTO_WRITE=False, PASSWORD_HASHERS=MD5_HASHER)
+class BenchmarkScenarioTests(TestCase):
+    """Сценарии проходят через тестовый клиент на маленьком каталоге без ошибок"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_catalog_is_seeded(self):
+        catalog = benchmark.generate_catalog(60, seed=3)
+        self.assertEqual(len(catalog.game_ids), 60)
+        self.assertEqual(Game.objects.count(), 60)
+        # счётчики, которые bulk_create не обновляет, пересчитаны
+        collection = Collection.objects.order_by('id').first()
+        self.assertEqual(collection.games_count, collection.games.count())
+        self.assertTrue(TagCooccurrence.objects.exists())
+        self.assertEqual(benchmark.load_catalog().game_ids, catalog.game_ids)
+
+    def test_all_scenarios_run(self):
+        catalog = benchmark.generate_catalog(60)
+        results = benchmark.run_scenarios(catalog, sorted(benchmark.SCENARIOS), iterations=1, warmup=0)
+        self.assertEqual(set(results), set(benchmark.SCENARIOS))
+        self.assertTrue(all(summary['iterations'] == 1 for summary in results.values()))
+
+
+class FlakyTask:
+    """Задача, которая падает первые fail_times раз"""
+    fail_times = 0
+    calls = 0
+
+    @classmethod
+    def run(cls, job):
+        cls.calls += 1
+        if cls.calls <= cls.fail_times:
+            raise RuntimeError('сбой')
+
+
+jobs.task('test_flaky')(FlakyTask.run)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        FlakyTask.calls = 0
+        FlakyTask.fail_times = 0
+
+    def test_claim_takes_ready_jobs_in_order(self):
+        later = jobs.enqueue('test_flaky')
+        first = jobs.enqueue('test_flaky')
+        Job.objects.filter(id=later.id).update(run_after=timezone.now() + timedelta(minutes=5))
+
+        claimed = jobs.claim_next()
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual(claimed.status, Job.STATUS_RUNNING)
+        # занятая и отложенная задачи повторно не выдаются
+        self.assertIsNone(jobs.claim_next())
+
+    def run_failing(self):
+        with self.assertLogs('main.jobs', 'ERROR'):
+            return jobs.run_job(jobs.claim_next())
+
+    def test_retry_with_backoff(self):
+        FlakyTask.fail_times = 2
+        job = jobs.enqueue('test_flaky', max_attempts=3)
+
+        job = self.run_failing()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_PENDING, 1))
+        first_delay = job.run_after - timezone.now()
+        self.assertIn('сбой', job.error)
+        self.assertIsNone(jobs.claim_next())
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        job = self.run_failing()
+        second_delay = job.run_after - timezone.now()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_PENDING, 2))
+        self.assertGreater(second_delay, first_delay)
+        self.assertAlmostEqual(second_delay.total_seconds(), (jobs.RETRY_DELAY * 2).total_seconds(), delta=1)
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        job = jobs.run_job(jobs.claim_next())
+        self.assertEqual((job.status, job.attempts, job.error), (Job.STATUS_DONE, 3, ''))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_fails_after_max_attempts(self):
+        FlakyTask.fail_times = 5
+        jobs.enqueue('test_flaky', max_attempts=1)
+        job = self.run_failing()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_enqueue_once_reuses_pending_job(self):
+        job = jobs.enqueue_once('test_flaky')
+        self.assertEqual(jobs.enqueue_once('test_flaky').id, job.id)
+        jobs.run_pending()
+        self.assertNotEqual(jobs.enqueue_once('test_flaky').id, job.id)
+
+    def test_unknown_task(self):
+        with self.assertRaises(KeyError):
+            jobs.enqueue('нет такой задачи')
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER)
+class JobTaskTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='x')
+        cls.games = [create_game(f'Игра {n}') for n in range(3)]
+
+    def create_collection(self, orders):
+        collection = Collection.objects.create(user=self.user, title='Подборка', description='')
+        for game, order in zip(self.games, orders):
+            GameCollection.objects.create(collection=collection, game=game, order=order)
+        return collection
+
+    def orders(self, collection):
+        return list(GameCollection.objects.filter(collection=collection).order_by('id').values_list('order', flat=True))
+
+    def test_reorder_only_selected_collections(self):
+        selected = self.create_collection([5, 9, 2])
+        other = self.create_collection([4, 8, 6])
+
+        jobs.enqueue('reorder_games', collection_ids=[selected.id])
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(self.orders(selected), [2, 3, 1])
+        self.assertEqual(self.orders(other), [4, 8, 6])
+
+    def test_recount_counters(self):
+        collection = self.create_collection([1, 2, 3])
+        CollectionLike.objects.create(user=self.user, collection=collection)
+        Collection.objects.filter(id=collection.id).update(games_count=0, likes_count=7)
+
+        jobs.enqueue('recount_games', collection_ids=[collection.id])
+        job = jobs.enqueue('recount_likes', collection_ids=[collection.id])
+        jobs.run_pending()
+        collection.refresh_from_db()
+        self.assertEqual((collection.games_count, collection.likes_count), (3, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.progress, job.total), (1, 1))
+
+
+@override_settings(CATALOG_SNAPSHOT_AUTO_WRITE=False, PASSWORD_HASHERS=MD5_HASHER)
+class RankingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='x')
+        cls.fans = [User.objects.create_user(f'fan{n}', password='x') for n in range(3)]
+        cls.games = [create_game(f'Игра {n}') for n in range(10)]
+
+    def setUp(self):
+        cache.clear()
+
+    def create_collection(self, likes, **fields):
+        collection = Collection.objects.create(user=self.user, title='Подборка', description='', **fields)
+        for fan in self.fans[:likes]:
+            CollectionLike.objects.create(user=fan, collection=collection)
+        return collection
+
+    def test_snapshots(self):
+        popular = self.create_collection(3)
+        less_popular = self.create_collection(1)
+        self.create_collection(3, is_public=False)
+        self.create_collection(3, is_deleted=True)
+
+        snapshots = rankings.refresh_snapshots()
+        latest = snapshots[RankingSnapshot.KIND_LATEST_GAMES].items
+        self.assertEqual(len(latest), rankings.LATEST_GAMES_LIMIT)
+        self.assertEqual(
+            [item['id'] for item in latest],
+            list(Game.objects.order_by('-created_at').values_list('id', flat=True)[:rankings.LATEST_GAMES_LIMIT]),
+        )
+        self.assertEqual(
+            snapshots[RankingSnapshot.KIND_POPULAR_COLLECTIONS].items,
+            [{'id': popular.id, 'like_count': 3, 'games_count': 0},
+             {'id': less_popular.id, 'like_count': 1, 'games_count': 0}],
+        )
+
+    def test_deleted_objects_are_skipped(self):
+        collection = self.create_collection(1)
+        rankings.refresh_snapshots()
+        deleted = Game.objects.get(id=rankings.load_snapshots()[RankingSnapshot.KIND_LATEST_GAMES].items[0]['id'])
+        deleted.delete()
+        Collection.objects.filter(id=collection.id).update(is_deleted=True)
+
+        result = rankings.home_rankings()
+        self.assertNotIn(deleted.id, [game.id for game in result['latest_games']])
+        self.assertEqual(len(result['latest_games']), rankings.LATEST_GAMES_LIMIT - 1)
+        self.assertEqual(result['popular_collections'], [])
+
+    def test_stale_snapshot_is_rebuilt(self):
+        rankings.refresh_snapshots()
+        old = timezone.now() - timedelta(seconds=settings.RANKINGS_MAX_AGE + 1)
+        RankingSnapshot.objects.update(built_at=old)
+        snapshots = rankings.load_snapshots()
+        self.assertTrue(all(snapshot.built_at > old for snapshot in snapshots.values()))
+
+    def test_home_page_reads_snapshots(self):
+        self.create_collection(2)
+        Favorite.objects.create(user=self.fans[0], game=self.games[-1])
+        self.client.get('/')
+        # рейтинги уже в кэше: анонимная главная обходится без запросов к БД
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['latest_games']), rankings.LATEST_GAMES_LIMIT)
+
+        self.client.force_login(self.fans[0])
+        response = self.client.get('/')
+        favorites = [game.id for game in response.context['latest_games'] if game.is_favorite]
+        self.assertEqual(favorites, [self.games[-1].id])
+
+
+class DecayedScoresTests(SimpleTestCase):
+    HALF_LIFE = 100.0
+
+    def test_score_halves_every_half_life(self):
+        scores = DecayedScores(self.HALF_LIFE, epoch=1000.0)
+        scores.add(3, 1.0, 1000.0)
+        self.assertAlmostEqual(scores.score(3, 1100.0), 0.5)
+        self.assertAlmostEqual(scores.score(3, 1200.0), 0.25)
+        self.assertEqual(scores.score(99, 1200.0), 0.0)
+
+    def test_later_event_counts_more(self):
+        scores = DecayedScores(self.HALF_LIFE, epoch=0.0)
+        scores.add(1, 1.0, 0.0)
+        scores.add(2, 1.0, 100.0)
+        self.assertEqual([obj_id for obj_id, _ in scores.top(10, 100.0)], [2, 1])
+        self.assertAlmostEqual(scores.top(10, 100.0)[0][1], 1.0)
+
+    def test_rebase_keeps_scores(self):
+        scores = DecayedScores(self.HALF_LIFE, epoch=0.0)
+        scores.add(1, 2.0, 50.0)
+        before = scores.score(1, 300.0)
+        scores.rebase(200.0)
+        self.assertEqual(scores.epoch, 200.0)
+        self.assertAlmostEqual(scores.score(1, 300.0), before)
+
+    def test_far_future_event_rebases(self):
+        scores = DecayedScores(self.HALF_LIFE, epoch=0.0)
+        later = self.HALF_LIFE * 100
+        scores.add(1, 1.0, later)
+        self.assertEqual(scores.epoch, later)
+        self.assertAlmostEqual(scores.score(1, later), 1.0)
+
+    def test_top_skips_faded_scores(self):
+        scores = DecayedScores(self.HALF_LIFE, epoch=0.0)
+        scores.add(1, 1.0, 0.0)
+        # через 10 периодов счёт меньше тысячной
+        self.assertLess(scores.score(1, 1000.0), MIN_SCORE)
+        self.assertEqual(scores.top(10, 1000.0), [])
+
+    def test_top_is_kept_until_scores_change(self):
+        scores = DecayedScores(self.HALF_LIFE, epoch=0.0)
+        scores.add(1, 1.0, 0.0)
+        scores.add(2, 2.0, 0.0)
+        with mock.patch.object(trending.heapq, 'nlargest', wraps=heapq.nlargest) as nlargest:
+            first = scores.top(10, 50.0)
+            later = scores.top(10, 100.0)
+            self.assertEqual(nlargest.call_count, 1)
+            self.assertEqual([obj_id for obj_id, _ in later], [2, 1])
+            self.assertAlmostEqual(later[0][1], first[0][1] / 2 ** 0.5)
+
+            scores.add(3, 5.0, 100.0)
+            self.assertEqual(scores.top(10, 100.0)[0][0], 3)
+            scores.rebase(100.0)
+            self.assertAlmostEqual(scores.top(10, 100.0)[0][1], 5.0)
+            self.assertEqual(nlargest.call_count, 3)
+
+    def test_bytes_round_trip(self):
+        scores = DecayedScores(self.HALF_LIFE, epoch=10.0)
+        scores.add(4, 3.0, 10.0)
+        restored = DecayedScores.from_bytes(self.HALF_LIFE, 10.0, scores.to_bytes())
+        self.assertEqual(list(restored.values), list(scores.values))
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER)
+class TrendingSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{n}', password='x') for n in range(3)]
+        cls.games = [create_game(f'Игра {n}') for n in range(3)]
+
+    def setUp(self):
+        self.engine = trending.TrendingEngine(half_life=3600, sync_interval=60)
+
+    def test_sync_counts_only_new_events(self):
+        for user in self.users:
+            Favorite.objects.create(user=user, game=self.games[1])
+        Favorite.objects.create(user=self.users[0], game=self.games[2])
+
+        self.assertEqual(self.engine.sync(), 4)
+        self.assertEqual([game_id for game_id, _ in self.engine.top(TrendingState.KIND_GAMES, 10)],
+                         [self.games[1].id, self.games[2].id])
+        self.assertEqual(self.engine.sync(), 0)
+
+        Favorite.objects.create(user=self.users[1], game=self.games[0])
+        self.assertEqual(self.engine.sync(), 1)
+        state = TrendingState.objects.get(kind=TrendingState.KIND_GAMES)
+        self.assertEqual(state.last_event_id, Favorite.objects.order_by('-id').first().id)
+
+    def test_reload_reads_state_written_by_worker(self):
+        Favorite.objects.create(user=self.users[0], game=self.games[0])
+        self.engine.sync()
+        other = trending.TrendingEngine(half_life=3600, sync_interval=60)
+        self.assertEqual([game_id for game_id, _ in other.top(TrendingState.KIND_GAMES, 10)], [self.games[0].id])
+
+    def test_periodic_job_reuses_its_row(self):
+        first, = jobs.enqueue_periodic()
+        self.assertEqual(first.name, 'sync_trending')
+        # ждёт в очереди — второй раз не ставится
+        self.assertEqual(jobs.enqueue_periodic(), [])
+        jobs.run_pending()
+        # период ещё не прошёл
+        self.assertEqual(jobs.enqueue_periodic(), [])
+
+        long_ago = timezone.now() - timedelta(seconds=settings.TRENDING_SYNC_INTERVAL + 1)
+        Job.objects.filter(id=first.id).update(run_after=long_ago)
+        again, = jobs.enqueue_periodic()
+        self.assertEqual(again.id, first.id)
+        self.assertEqual((again.status, again.attempts), (Job.STATUS_PENDING, 0))
+        self.assertEqual(Job.objects.filter(name='sync_trending').count(), 1)
+
+    def test_old_periodic_rows_are_pruned(self):
+        old = timezone.now() - timedelta(hours=1)
+        for _ in range(3):
+            job = jobs.enqueue('sync_trending', max_attempts=1)
+            Job.objects.filter(id=job.id).update(status=Job.STATUS_DONE, run_after=old)
+        jobs.enqueue_periodic()
+        self.assertEqual(Job.objects.filter(name='sync_trending').count(), 1)
+
+    def test_trending_view(self):
+        self.addCleanup(setattr, trending.engine, 'loaded_at', None)
+        collection = Collection.objects.create(user=self.users[0], title='Подборка', description='')
+        Favorite.objects.create(user=self.users[0], game=self.games[2])
+        CollectionLike.objects.create(user=self.users[1], collection=collection)
+        trending.engine.sync()
+
+        data = self.client.get('/trending/', {'limit': '5'}).json()
+        self.assertTrue(data['success'])
+        self.assertEqual([game['id'] for game in data['games']], [self.games[2].id])
+        self.assertEqual([item['id'] for item in data['collections']], [collection.id])
+
+
+@override_settings(CATALOG_SNAPSHOT_AUTO_WRITE=False, PASSWORD_HASHERS=MD5_HASHER)
+class PreferencesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('player', password='x')
+        cls.rpg = Tag.objects.create(name='RPG', slug='rpg')
+        cls.coop = Tag.objects.create(name='Coop', slug='coop')
+        cls.horror = Tag.objects.create(name='Horror', slug='horror')
+        cls.rpg_game = create_game('Ролевая', rating=3)
+        cls.rpg_game.tags.set([cls.rpg])
+        cls.coop_game = create_game('Кооператив', rating=9)
+        cls.coop_game.tags.set([cls.coop, cls.horror])
+
+    def setUp(self):
+        cache.clear()
+
+    def weights(self):
+        vector = preferences.unpack(UserProfile.objects.get(user=self.user).affinity)
+        return {tag.name: vector[tag.id] if tag.id < len(vector) else 0.0
+                for tag in (self.rpg, self.coop, self.horror)}
+
+    def test_favorites_and_collections_update_vector(self):
+        favorite = Favorite.objects.create(user=self.user, game=self.rpg_game)
+        collection = Collection.objects.create(user=self.user, title='Подборка', description='')
+        GameCollection.objects.create(collection=collection, game=self.coop_game, order=1)
+        self.assertEqual(self.weights(), {'RPG': 1.0, 'Coop': 0.5, 'Horror': 0.5})
+
+        favorite.delete()
+        self.assertEqual(self.weights(), {'RPG': 0.0, 'Coop': 0.5, 'Horror': 0.5})
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(list(preferences.rebuild_affinity(profile)), list(preferences.unpack(profile.affinity)))
+
+    def test_explicit_preferences_replace_previous(self):
+        self.assertEqual(preferences.record_explicit(self.user, ['Coop']), ['Coop'])
+        self.assertEqual(preferences.record_explicit(self.user, ['RPG', 'Coop']), ['RPG', 'Coop'])
+        self.assertEqual(self.weights(), {'RPG': 2.0, 'Coop': 2.0, 'Horror': 0.0})
+
+    def test_scores_match_sum_of_tag_weights(self):
+        vector = array('f', [0.0, 1.5, 0.5, 2.0])
+        candidates = [[1, 3], [], [2], [3, 7], [1, 2, 3]]
+        self.assertEqual(
+            preferences.affinity_scores(vector, candidates),
+            [sum(vector[tag_id] for tag_id in tag_ids if tag_id < len(vector)) for tag_ids in candidates],
+        )
+        self.assertEqual(preferences.affinity_scores(vector, []), [])
+
+    def test_tag_change_rebuilds_owners_vectors(self):
+        Favorite.objects.create(user=self.user, game=self.rpg_game)
+        self.rpg_game.tags.add(self.coop)
+        self.assertEqual(self.weights()['Coop'], 0.0)
+
+        job = Job.objects.get(name='rebuild_preferences')
+        self.assertEqual(job.payload, {'game_ids': [self.rpg_game.id]})
+        # повторное изменение до запуска задачи не ставит вторую
+        self.rpg_game.tags.remove(self.rpg)
+        self.assertEqual(Job.objects.filter(name='rebuild_preferences').count(), 1)
+
+        jobs.run_pending()
+        self.assertEqual(self.weights(), {'RPG': 0.0, 'Coop': 1.0, 'Horror': 0.0})
+
+    def test_tag_change_without_owners_does_not_enqueue(self):
+        self.coop_game.tags.add(self.rpg)
+        self.assertFalse(Job.objects.filter(name='rebuild_preferences').exists())
+
+    def post_json(self, url, payload):
+        return self.client.post(url, json.dumps(payload), content_type='application/json').json()
+
+    def test_recommendations_are_personalized(self):
+        anonymous = self.post_json('/recommendations/get/', {})
+        self.assertFalse(anonymous['personalized'])
+        self.assertEqual([game['id'] for game in anonymous['games']], [self.coop_game.id, self.rpg_game.id])
+
+        self.client.force_login(self.user)
+        Favorite.objects.create(user=self.user, game=self.rpg_game)
+        personal = self.post_json('/recommendations/get/', {})
+        self.assertTrue(personal['personalized'])
+        self.assertEqual([game['id'] for game in personal['games']], [self.rpg_game.id, self.coop_game.id])
+        self.assertEqual(personal['games'][0]['match_score'], 1.0)
+
+    def test_search_does_not_save_preferences(self):
+        self.client.force_login(self.user)
+        self.post_json('/recommendations/get/', {'include_tags': ['RPG']})
+        self.assertFalse(UserProfile.objects.filter(user=self.user).exclude(preferences=[]).exists())
+
+        response = self.post_json('/recommendations/save-preferences/', {'include_tags': ['RPG', 'Нет такого']})
+        self.assertEqual(response, {'success': True, 'preferences': ['RPG']})
+        self.assertFalse(self.post_json('/recommendations/save-preferences/', {'include_tags': []})['success'])
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER)
+class FavoritesPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('player', password='x')
+        cls.games = [create_game(f'Игра {n}') for n in range(7)]
+        moment = timezone.now()
+        for n, game in enumerate(cls.games):
+            favorite = Favorite.objects.create(user=cls.user, game=game)
+            # по три записи с одинаковым временем: граница страницы проходит внутри группы
+            Favorite.objects.filter(id=favorite.id).update(added_at=moment - timedelta(minutes=n // 3))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_encode_decode_round_trip(self):
+        moment = timezone.now()
+        cursor = encode_cursor(moment, 42)
+        self.assertEqual(decode_cursor(Favorite, 'added_at', cursor), (moment, 42))
+
+    def test_invalid_cursor(self):
+        for cursor in ('', '!!!', encode_cursor('not a date', 1), encode_cursor(timezone.now(), 'x')):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(Favorite, 'added_at', cursor)
+
+    def test_keyset_pages_with_equal_values(self):
+        favorites = Favorite.objects.filter(user=self.user)
+        expected = list(favorites.order_by('-added_at', '-id').values_list('id', flat=True))
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            page, cursor = keyset_page(favorites, 'added_at', cursor, 2)
+            seen.extend(favorite.id for favorite in page)
+            pages += 1
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 4)
+
+    def test_exact_last_page_has_no_cursor(self):
+        favorites = Favorite.objects.filter(user=self.user, game__in=self.games[:4])
+        page, cursor = keyset_page(favorites, 'added_at', None, 2)
+        page, cursor = keyset_page(favorites, 'added_at', cursor, 2)
+        self.assertEqual(len(page), 2)
+        self.assertIsNone(cursor)
+
+    @mock.patch('main.views.FAVORITES_PAGE_SIZE', 3)
+    def test_favorites_page_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/favorites/')
+        self.assertEqual(len(response.context['favorite_games']), 3)
+
+        cursor, count = response.context['games_next'], 3
+        while cursor:
+            data = self.client.get('/favorites/page/', {'kind': 'games', 'after': cursor}).json()
+            self.assertTrue(data['success'])
+            count += data['count']
+            cursor = data['next']
+        self.assertEqual(count, len(self.games))
+
+        response = self.client.get('/favorites/page/', {'kind': 'games', 'after': '!!!'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER)
+class CollectionCountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='x')
+        cls.fans = [User.objects.create_user(f'fan{n}', password='x') for n in range(3)]
+        cls.admin = User.objects.create_superuser('admin', password='x')
+        cls.game = create_game('Игра')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counters_follow_rows(self):
+        collection = Collection.objects.create(user=self.owner, title='Подборка', description='')
+        GameCollection.objects.create(collection=collection, game=self.game, order=1)
+        likes = [CollectionLike.objects.create(user=fan, collection=collection) for fan in self.fans]
+        likes[0].delete()
+        collection.refresh_from_db()
+        self.assertEqual((collection.games_count, collection.likes_count), (1, 2))
+
+    def test_reset_likes_action(self):
+        collection = Collection.objects.create(user=self.owner, title='Подборка', description='')
+        other = Collection.objects.create(user=self.owner, title='Другая', description='')
+        for fan in self.fans:
+            CollectionLike.objects.create(user=fan, collection=collection)
+            CollectionLike.objects.create(user=fan, collection=other)
+
+        self.client.force_login(self.admin)
+        response = self.client.post('/admin/main/collection/', {
+            'action': 'reset_likes', '_selected_action': [collection.id],
+        })
+        self.assertEqual(response.status_code, 302)
+        jobs.run_pending()
+
+        collection.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(collection.likes_count, 0)
+        self.assertFalse(CollectionLike.objects.filter(collection=collection).exists())
+        self.assertEqual(other.likes_count, 3)
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER)
+class UserStateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('player', password='x')
+        cls.other = User.objects.create_user('other', password='x')
+        cls.games = [create_game(f'Игра {n}') for n in range(3)]
+        cls.collection = Collection.objects.create(user=cls.user, title='Своя', description='')
+        GameCollection.objects.create(collection=cls.collection, game=cls.games[1], order=1)
+        cls.liked = Collection.objects.create(user=cls.other, title='Чужая', description='')
+        CollectionLike.objects.create(user=cls.user, collection=cls.liked)
+        Favorite.objects.create(user=cls.user, game=cls.games[0])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_membership(self):
+        state = pickle.loads(pickle.dumps(user_state.build_state(self.user.id)))
+        self.assertTrue(state.is_favorite(self.games[0].id))
+        self.assertFalse(state.is_favorite(self.games[1].id))
+        self.assertTrue(state.likes(self.liked.id))
+        self.assertTrue(state.owns(self.collection.id))
+        self.assertFalse(state.owns(self.liked.id))
+        self.assertTrue(state.in_collection(self.collection.id, self.games[1].id))
+        self.assertFalse(state.in_collection(self.collection.id, self.games[0].id))
+
+    def test_cached_until_invalidated(self):
+        user_state.get_state(self.user)
+        with self.assertNumQueries(0):
+            self.assertFalse(user_state.get_state(self.user).is_favorite(self.games[2].id))
+
+        Favorite.objects.create(user=self.user, game=self.games[2])
+        # TestCase не коммитит транзакцию, поэтому то, что шина сделала бы после коммита, вызываем сами
+        invalidation.flush()
+        self.assertTrue(user_state.get_state(self.user).is_favorite(self.games[2].id))
+
+    def test_anonymous_state_is_empty(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(user_state.get_state(AnonymousUser()).is_favorite(self.games[0].id))
+
+    def test_game_page_follows_toggle(self):
+        self.client.force_login(self.user)
+        game = self.games[2]
+        self.assertFalse(self.client.get(f'/game/{game.id}/').context['is_favorite'])
+
+        data = self.client.post(f'/game/{game.id}/toggle-favorite/').json()
+        invalidation.flush()
+        self.assertEqual(data['status'], 'added')
+        response = self.client.get(f'/game/{game.id}/')
+        self.assertTrue(response.context['is_favorite'])
+        self.assertEqual(
+            [(collection.id, collection.game_is_added) for collection in response.context['user_collections']],
+            [(self.collection.id, False)],
+        )
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER, INVALIDATION_POLL_INTERVAL=3600)
+class CachedAuthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('player', password='old-password')
+
+    def setUp(self):
+        cache.clear()
+        self.backend = CachedModelBackend()
+
+    def test_user_loaded_once(self):
+        self.assertEqual(self.backend.get_user(self.user.id), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.id), self.user)
+
+    def test_authenticated_page_without_session_and_user_queries(self):
+        self.client.force_login(self.user)
+        self.client.get('/about/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/about/')
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_password_change_ends_cached_login(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/profile/').status_code, 200)
+
+        self.user.set_password('new-password')
+        self.user.save()
+        # TestCase не коммитит транзакцию, поэтому то, что шина сделала бы после коммита, вызываем сами
+        invalidation.flush()
+        self.assertEqual(self.backend.get_user(self.user.id).password, self.user.password)
+        response = self.client.get('/profile/')
+        self.assertRedirects(response, '/accounts/login/?next=/profile/', fetch_redirect_response=False)
+
+    def test_logout_removes_cached_session(self):
+        self.client.force_login(self.user)
+        session_key = self.client.session.session_key
+        self.client.get('/logout/')
+        self.assertFalse(SessionStore().exists(session_key))
+        self.assertIsNone(cache.get(SessionStore.cache_key_prefix + session_key))
+
+    def test_inactive_cached_user_is_rejected(self):
+        self.backend.get_user(self.user.id)
+        self.user.is_active = False
+        self.user.save()
+        invalidation.flush()
+        self.assertIsNone(self.backend.get_user(self.user.id))
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER)
+class EmailLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('player', email='Player@Example.com', password='x')
+
+    def setUp(self):
+        cache.clear()
+
+    def form(self, email):
+        return CustomUserCreationForm({
+            'username': 'newcomer', 'email': email, 'password1': 'Sl0zhnyi-parol', 'password2': 'Sl0zhnyi-parol',
+        })
+
+    def test_email_is_taken_regardless_of_case(self):
+        self.assertIn('email', self.form('player@example.COM').errors)
+        self.assertTrue(self.form('other@example.com').is_valid())
+
+    def test_lookup_uses_unique_index(self):
+        plan = User.objects.annotate(email_lower=Lower('email')).filter(
+            email_lower='player@example.com', email__gt=''
+        ).explain()
+        self.assertIn('main_auth_user_email_lower', plan)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user('twin', email='PLAYER@example.com')
+        # пустой email может быть у нескольких аккаунтов
+        User.objects.create_user('no_email_1')
+        User.objects.create_user('no_email_2')
+
+    def test_migration_clears_later_duplicates(self):
+        migration = import_module('main.migrations.0018_auth_user_email_unique')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX main_auth_user_email_lower')
+        twin = User.objects.create_user('twin', email='PLAYER@example.com')
+        other = User.objects.create_user('other', email='other@example.com')
+
+        migration.clear_duplicate_emails(django_apps, None)
+        self.assertEqual(
+            list(User.objects.filter(id__in=[self.user.id, twin.id, other.id]).order_by('id').values_list('email', flat=True)),
+            ['Player@example.com', '', 'other@example.com'],
+        )
+
+    def test_register_and_login(self):
+        response = self.client.post('/register/', {
+            'username': 'newcomer', 'email': 'PLAYER@example.com', 'password1': 'Sl0zhnyi-parol', 'password2': 'Sl0zhnyi-parol',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('email', response.context['form'].errors)
+
+        response = self.client.post('/register/', {
+            'username': 'newcomer', 'email': 'new@example.com', 'password1': 'Sl0zhnyi-parol', 'password2': 'Sl0zhnyi-parol',
+        })
+        self.assertRedirects(response, '/profile/')
+        self.client.get('/logout/')
+        response = self.client.post('/login/', {'username': 'newcomer', 'password': 'Sl0zhnyi-parol'})
+        self.assertRedirects(response, '/profile/')
+        self.assertEqual(self.client.post('/login/', {'username': 'newcomer', 'password': 'wrong'}).status_code, 302)
+
+
+class CompressionTests(SimpleTestCase):
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            compression.accepted_encodings('gzip;q=0.5, BR, identity; q=0, , deflate;q=bad'),
+            {'gzip': 0.5, 'br': 1.0, 'identity': 0.0, 'deflate': 0.0},
+        )
+
+    def test_negotiate(self):
+        self.assertEqual(compression.negotiate('gzip, deflate'), 'gzip')
+        self.assertIsNone(compression.negotiate(''))
+        self.assertIsNone(compression.negotiate('gzip;q=0, identity'))
+        # * относится только к кодировкам, не перечисленным явно
+        self.assertIsNone(compression.negotiate('*, gzip;q=0, br;q=0'))
+        self.assertEqual(compression.negotiate('*;q=0.1, br;q=0'), 'gzip')
+        with mock.patch.dict(compression.ENCODERS, {'br': None, 'gzip': None}, clear=True):
+            self.assertEqual(compression.negotiate('gzip, br'), 'br')
+            self.assertEqual(compression.negotiate('gzip, br;q=0.9'), 'gzip')
+
+    def test_minify_html_keeps_preserved_tags(self):
+        html = (
+            '  <div>\n    <p>a  b</p>\n\n  </div>\n'
+            '<PRE>\n  код\n    с отступами\n</PRE>\n'
+            '<script>\n  var x = 1;\n</script>\n  <span>c</span>\n'
+        )
+        self.assertEqual(
+            compression.minify_html(html),
+            '<div>\n<p>a  b</p>\n</div>\n'
+            '<PRE>\n  код\n    с отступами\n</PRE>\n'
+            '<script>\n  var x = 1;\n</script>\n<span>c</span>',
+        )
+
+    def test_dumps_is_compact(self):
+        content = compression.dumps({'title': 'Ведьмак', 'tags': [1, 2], 'at': datetime(2024, 1, 2, 3, 4, 5)})
+        self.assertEqual(content, '{"title":"Ведьмак","tags":[1,2],"at":"2024-01-02T03:04:05"}'.encode())
+        with self.assertRaises(TypeError):
+            compression.CompactJsonResponse([1, 2])
+        self.assertEqual(compression.CompactJsonResponse([1, 2], safe=False).content, b'[1,2]')
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER, HTML_MINIFY=True, COMPRESSION_MIN_SIZE=512)
+class CompressionMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='x', is_staff=True)
+        cls.player = User.objects.create_user('player', password='x')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_gzip_when_accepted(self):
+        plain = self.client.get('/about/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/about/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_html_is_minified(self):
+        content = self.client.get('/about/').content.decode()
+        self.assertNotIn('\n ', content)
+        self.assertNotIn('\n\n', content)
+
+    def test_slow_queries_for_staff_only(self):
+        self.assertEqual(self.client.get('/slow-queries/').status_code, 403)
+        self.client.login(username='player', password='x')
+        self.assertEqual(self.client.get('/slow-queries/').status_code, 403)
+
+        self.client.login(username='staff', password='x')
+        response = self.client.get('/slow-queries/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('queries', response.json())
+        self.assertEqual(self.client.post('/slow-queries/').status_code, 200)
+
+
+class ThumbnailTests(TestCase):
+    COVER_URL = 'https://cdn.example.com/apps/10/header.jpg'
+
+    def setUp(self):
+        covers = tempfile.TemporaryDirectory()
+        output = tempfile.TemporaryDirectory()
+        self.addCleanup(covers.cleanup)
+        self.addCleanup(output.cleanup)
+        self.covers = Path(covers.name)
+        self.enterContext(override_settings(
+            THUMBNAIL_SOURCE={'BACKEND': 'main.thumbnails.DirectorySource', 'root': covers.name},
+            THUMBNAIL_DIR=Path(output.name),
+            THUMBNAIL_FORMAT='JPEG',
+        ))
+
+    def write_cover(self, relative, data):
+        path = self.covers / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    def test_directory_source(self):
+        self.write_cover('apps/10/header.jpg', b'cover')
+        source = thumbnails.get_source()
+        self.assertEqual(source.fetch(self.COVER_URL), b'cover')
+        with self.assertRaises(ValueError):
+            source.fetch('https://cdn.example.com/../../etc/passwd')
+
+    def test_store_names_file_by_content(self):
+        name = thumbnails.store(b'thumbnail')
+        self.assertRegex(name, thumbnails.NAME_PATTERN)
+        self.assertEqual(thumbnails.store(b'thumbnail'), name)
+        self.assertEqual(thumbnails.path_for(name).read_bytes(), b'thumbnail')
+
+        response = self.client.get(f'/thumbnails/{name}')
+        self.assertEqual(b''.join(response.streaming_content), b'thumbnail')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get('/thumbnails/../settings.py').status_code, 404)
+        self.assertEqual(self.client.get(f'/thumbnails/{"0" * 40}.jpg').status_code, 404)
+
+    def test_url_for_falls_back_to_cover(self):
+        game = create_game('Игра', game_image=self.COVER_URL)
+        self.assertEqual(thumbnails.url_for(game, 'card'), self.COVER_URL)
+        game.cover_thumbnails = {'source': self.COVER_URL, 'card': f'{"a" * 40}.jpg'}
+        self.assertEqual(thumbnails.url_for(game, 'card'), f'/thumbnails/{"a" * 40}.jpg')
+        self.assertEqual(thumbnails.url_for(game, 'large'), self.COVER_URL)
+        # обложка сменилась, старые миниатюры не подходят
+        game.game_image = 'https://cdn.example.com/apps/10/new.jpg'
+        self.assertEqual(thumbnails.url_for(game, 'card'), game.game_image)
+
+    def test_missing_cover_counts_as_failed(self):
+        game = create_game('Игра', game_image=self.COVER_URL)
+        with self.assertLogs('main.thumbnails', 'ERROR'):
+            self.assertEqual(thumbnails.build_for_games([game.id]), (0, 1))
+        game.refresh_from_db()
+        self.assertEqual(game.cover_thumbnails, {})
+
+    def test_cover_change_enqueues_build(self):
+        with mock.patch.object(thumbnails, 'available', return_value=True):
+            game = create_game('Игра', game_image=self.COVER_URL)
+            game.title = 'Новое название'
+            game.save()
+            self.assertEqual(Job.objects.filter(name='build_thumbnails').count(), 1)
+
+            with self.assertLogs('main.thumbnails', 'ERROR'):
+                jobs.run_pending()
+            game.game_image = 'https://cdn.example.com/apps/10/new.jpg'
+            game.save()
+        self.assertEqual(
+            list(Job.objects.filter(name='build_thumbnails').values_list('payload', flat=True)),
+            [{'game_ids': [game.id]}] * 2,
+        )
+
+    @skipUnless(thumbnails.available(), 'Pillow не установлен')
+    def test_build_for_games(self):
+        from PIL import Image
+
+        cover = io.BytesIO()
+        Image.new('RGB', (1200, 600), 'red').save(cover, 'JPEG')
+        self.write_cover('apps/10/header.jpg', cover.getvalue())
+        game = create_game('Игра', game_image=self.COVER_URL)
+
+        self.assertEqual(thumbnails.build_for_games([game.id]), (1, 0))
+        game.refresh_from_db()
+        self.assertEqual(game.cover_thumbnails['source'], self.COVER_URL)
+        with Image.open(thumbnails.path_for(game.cover_thumbnails['card'])) as image:
+            self.assertEqual(image.size, (460, 230))
+        # миниатюры соответствуют обложке, повторно не строятся
+        self.assertEqual(thumbnails.build_for_games([game.id]), (0, 0))
+
+
+class TagMaskTests(SimpleTestCase):
+    def setUp(self):
+        self.index = small_index()
+
+    def search_ids(self, **selection):
+        return self.index.search(Selection(**selection))[0]
+
+    def test_unknown_include_tag_is_ignored(self):
+        self.assertEqual(self.search_ids(include_tags=['RPG', 'Нет такого']), self.search_ids(include_tags=['RPG']))
+        self.assertEqual(self.search_ids(include_tags=['Нет такого']), [2, 3, 1])
+
+    def test_unknown_exclude_tag_is_ignored(self):
+        self.assertEqual(self.search_ids(exclude_tags=['Нет такого']), [2, 3, 1])
+
+    def test_known_tag_without_games_empties_result(self):
+        self.assertEqual(self.search_ids(include_tags=['Empty']), [])
+
+
+@override_settings(CATALOG_SNAPSHOT_AUTO_WRITE=False)
+class CatalogIndexSearchTests(TestCase):
+    """Выдача и счётчики фасетов индекса совпадают с обычными запросами ORM"""
+
+    SELECTIONS = [
+        Selection(),
+        Selection(include_tags=['Coop']),
+        Selection(include_tags=['Coop', 'Open world'], exclude_tags=['Horror']),
+        Selection(genres=['RPG', 'Action']),
+        Selection(include_tags=['Coop'], platforms=['PC'], year_min=2000, year_max=2019),
+        Selection(exclude_tags=['Coop'], price_min=1, price_max=1999),
+        Selection(genres=['Puzzle'], price_min=2000),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        tags = [Tag.objects.create(name=name, slug=f'tag-{n}') for n, name in enumerate(['Coop', 'Open world', 'Horror'])]
+        for n in range(40):
+            game = create_game(
+                f'Игра {n}',
+                genre=rng.choice(['RPG', 'Action', 'Puzzle']),
+                platforms=rng.choice(['PC', 'Xbox']),
+                release_year=rng.randint(1990, 2024),
+                price=rng.choice([0, 199, 700, 1500, 2500]),
+                rating=rng.randint(0, 10),
+            )
+            game.tags.set(rng.sample(tags, rng.randint(0, 3)))
+
+    def orm_games(self, selection, skip_facet=None):
+        games = Game.objects.all()
+        for name in selection.include_tags:
+            games = games.filter(tags__name=name)
+        for name in selection.exclude_tags:
+            games = games.exclude(tags__name=name)
+        if selection.genres and skip_facet != 'genres':
+            games = games.filter(genre__in=selection.genres)
+        if selection.platforms and skip_facet != 'platforms':
+            games = games.filter(platforms__in=selection.platforms)
+        if skip_facet != 'decades':
+            if selection.year_min is not None:
+                games = games.filter(release_year__gte=selection.year_min)
+            if selection.year_max is not None:
+                games = games.filter(release_year__lte=selection.year_max)
+        if skip_facet != 'prices':
+            if selection.price_min is not None:
+                games = games.filter(price__gte=selection.price_min)
+            if selection.price_max is not None:
+                games = games.filter(price__lte=selection.price_max)
+        return games
+
+    def orm_facets(self, selection):
+        facets = {}
+        for facet, field in (('genres', 'genre'), ('platforms', 'platforms')):
+            rows = self.orm_games(selection, facet).values(field).annotate(count=Count('id', distinct=True))
+            facets[facet] = {row[field]: row['count'] for row in rows}
+        years = self.orm_games(selection, 'decades').values_list('release_year', flat=True)
+        prices = self.orm_games(selection, 'prices').values_list('price', flat=True)
+        facets['decades'] = {}
+        for year in years:
+            facets['decades'][decade(year)] = facets['decades'].get(decade(year), 0) + 1
+        facets['prices'] = {}
+        for price in prices:
+            facets['prices'][price_bucket(price)] = facets['prices'].get(price_bucket(price), 0) + 1
+        return facets
+
+    def test_search_matches_orm(self):
+        index = index_from_db()
+        for selection in self.SELECTIONS:
+            with self.subTest(selection=selection):
+                game_ids, facets = index.search(selection)
+                expected = list(self.orm_games(selection).order_by('-rating', '-id').values_list('id', flat=True))
+                self.assertEqual(game_ids, expected)
+                self.assertEqual(facets, self.orm_facets(selection))
+
+    def test_search_titles(self):
+        index = index_from_db()
+        # icontains в SQLite не сравнивает кириллицу без учёта регистра, поэтому фильтр в Python
+        expected = [
+            game_id for game_id, title in Game.objects.order_by('-rating', '-id').values_list('id', 'title')
+            if 'игра 1' in title.lower()
+        ]
+        self.assertTrue(expected)
+        self.assertEqual(index.search_titles('ИГРА 1', 50), expected)
+
+    def test_price_buckets_cover_all_prices(self):
+        self.assertEqual([price_bucket(low) for key, low, _ in PRICE_BUCKETS], [key for key, _, _ in PRICE_BUCKETS])
+
+    def test_recommendations_view(self):
+        cache.clear()
+        selection = Selection(include_tags=['Coop'], genres=['RPG', 'Action'], year_min=2000)
+        response = self.client.post('/recommendations/get/', {
+            'include_tags': ['Coop'], 'facets': {'genres': ['RPG', 'Action'], 'year_min': '2000'},
+        }, content_type='application/json')
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(
+            [game['id'] for game in data['games']],
+            list(self.orm_games(selection).order_by('-rating', '-id').values_list('id', flat=True)),
+        )
+        self.assertEqual(data['facets']['genres'], self.orm_facets(selection)['genres'])
+
+
+@override_settings(CATALOG_SNAPSHOT_AUTO_WRITE=False)
+class TagStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [Tag.objects.create(name=f'Тег {n}', slug=f'tag-{n}') for n in range(40)]
+        cls.games = [create_game(f'Игра {n}') for n in range(3)]
+
+    def assertStatsMatchLinks(self):
+        """Счётчики, обновлённые сигналами, совпадают с пересчётом по таблице связей"""
+        links = tag_stats.GameTag.objects.order_by('game_id').values_list('game_id', 'tag_id')
+        expected_pairs = {pair: count for pair, count in tag_stats.count_pairs(links).items()}
+        pairs = {
+            (tag_id, other_id): count for tag_id, other_id, count in
+            TagCooccurrence.objects.filter(games_count__gt=0).values_list('tag_id', 'other_id', 'games_count')
+        }
+        self.assertEqual(pairs, expected_pairs)
+        self.assertFalse(TagCooccurrence.objects.filter(games_count__lt=0).exists())
+        self.assertEqual(
+            dict(Tag.objects.values_list('id', 'games_count')),
+            dict(Tag.objects.annotate(count=Count('game')).values_list('id', 'count')),
+        )
+
+    def test_add_and_remove(self):
+        first, second, _ = self.games
+        a, b, c = self.tags[:3]
+        first.tags.add(a, b)
+        first.tags.add(c)
+        second.tags.add(a, c)
+        self.assertStatsMatchLinks()
+        self.assertEqual(TagCooccurrence.objects.get(tag=a, other=c).games_count, 2)
+
+        first.tags.remove(a)
+        self.assertStatsMatchLinks()
+        self.assertEqual(TagCooccurrence.objects.get(tag=c, other=a).games_count, 1)
+        # повторное добавление и удаление отсутствующего тега ничего не меняют
+        first.tags.add(b)
+        second.tags.remove(b)
+        self.assertStatsMatchLinks()
+
+    def test_reverse_add_and_clear(self):
+        a, b = self.tags[:2]
+        a.game_set.add(*self.games)
+        b.game_set.add(self.games[0], self.games[1])
+        self.assertStatsMatchLinks()
+        self.assertEqual(TagCooccurrence.objects.get(tag=b, other=a).games_count, 2)
+
+        a.game_set.clear()
+        self.assertStatsMatchLinks()
+        self.games[1].tags.clear()
+        self.assertStatsMatchLinks()
+        self.assertEqual(Tag.objects.get(id=b.id).games_count, 1)
+
+    def test_delete_game(self):
+        first, second, _ = self.games
+        first.tags.add(*self.tags[:3])
+        second.tags.add(*self.tags[1:4])
+        first.delete()
+        self.assertStatsMatchLinks()
+        self.assertEqual(TagCooccurrence.objects.get(tag=self.tags[1], other=self.tags[2]).games_count, 1)
+
+    def test_game_with_many_tags(self):
+        # сотни пар в одном изменении
+        self.games[0].tags.add(*self.tags[:20])
+        self.games[0].tags.add(*self.tags[20:])
+        self.games[1].tags.set(self.tags[10:35])
+        self.assertStatsMatchLinks()
+        self.games[0].tags.remove(*self.tags[5:30])
+        self.assertStatsMatchLinks()
+        self.games[0].delete()
+        self.assertStatsMatchLinks()
+
+    def test_rebuild_matches_incremental(self):
+        self.games[0].tags.add(*self.tags[:4])
+        self.games[1].tags.add(*self.tags[2:6])
+        TagCooccurrence.objects.update(games_count=0)
+        Tag.objects.update(games_count=0)
+        tag_stats.rebuild()
+        self.assertStatsMatchLinks()
+
+    def test_related(self):
+        a, b, c, d = self.tags[:4]
+        self.games[0].tags.add(a, b, c)
+        self.games[1].tags.add(a, b)
+        self.games[2].tags.add(a, d)
+
+        self.assertEqual(tag_stats.related([], 10), [])
+        related = [(tag['name'], tag['score']) for tag in tag_stats.related([a.id], 10)]
+        self.assertEqual(related[0], (b.name, 2))
+        self.assertCountEqual(related[1:], [(c.name, 1), (d.name, 1)])
+        # связанный тег должен встречаться с каждым из выбранных
+        self.assertEqual([tag['name'] for tag in tag_stats.related([a.id, b.id], 10)], [c.name])
+        self.assertEqual(tag_stats.related([a.id], 1)[0]['games_count'], 2)
+
+        response = self.client.get('/recommendations/related-tags/', {'tag': [a.name, b.name]})
+        self.assertEqual(response.json(), {
+            'success': True, 'tags': [{'name': c.name, 'games_count': 1, 'score': 1}],
+        })
+
+
+@override_settings(SINGLE_FLIGHT_WAIT=0.2)
+class SingleFlightTests(SimpleTestCase):
+    KEY = 'test:single_flight'
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='новое'):
+        def compute():
+            self.calls += 1
+            return value
+        return compute
+
+    def fail(self):
+        raise AssertionError('пересчёт не ожидался')
+
+    def test_computes_once_and_caches(self):
+        self.assertEqual(single_flight.get_or_compute(self.KEY, self.compute(), 60), 'новое')
+        self.assertEqual(single_flight.get_or_compute(self.KEY, self.fail, 60), 'новое')
+        self.assertEqual(self.calls, 1)
+        self.assertIsNone(cache.get(single_flight._lock_key(self.KEY)))
+
+    def test_stale_value_served_while_locked(self):
+        single_flight.get_or_compute(self.KEY, self.compute('старое'), 60)
+        single_flight.expire(self.KEY)
+        # пересчитывает другой процесс
+        cache.add(single_flight._lock_key(self.KEY), 1)
+        self.assertEqual(single_flight.get_or_compute(self.KEY, self.fail, 60), 'старое')
+
+    def test_fresh_value_refreshed_early_near_expiry(self):
+        single_flight.get_or_compute(self.KEY, self.compute('старое'), 60)
+        value, _, _ = cache.get(self.KEY)
+        # до срока секунда, а значение считалось минуту: XFetch почти наверняка обновит
+        cache.set(self.KEY, (value, 60.0, time.time() + 1))
+        with mock.patch('main.single_flight.random.random', return_value=0.5):
+            self.assertEqual(single_flight.get_or_compute(self.KEY, self.compute('новое'), 60), 'новое')
+            # далеко от срока — нет
+            self.assertEqual(single_flight.get_or_compute(self.KEY, self.fail, 60), 'новое')
+
+    def test_expired_value_recomputed_by_lock_holder(self):
+        single_flight.get_or_compute(self.KEY, self.compute('старое'), 60)
+        single_flight.expire(self.KEY)
+        self.assertEqual(single_flight.get_or_compute(self.KEY, self.compute('новое'), 60), 'новое')
+        self.assertIsNone(cache.get(single_flight._lock_key(self.KEY)))
+
+    def test_waits_then_computes_when_lock_holder_is_silent(self):
+        cache.add(single_flight._lock_key(self.KEY), 1)
+        start = time.monotonic()
+        self.assertEqual(single_flight.get_or_compute(self.KEY, self.compute(), 60), 'новое')
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(self.calls, 1)
+
+    def test_waiter_gets_value_of_lock_holder(self):
+        cache.add(single_flight._lock_key(self.KEY), 1)
+        # другой процесс дописывает значение, пока этот ждёт
+        writer = threading.Timer(0.05, lambda: cache.set(self.KEY, ('чужое', 0.0, time.time() + 60)))
+        writer.start()
+        self.addCleanup(writer.join)
+        self.assertEqual(single_flight.get_or_compute(self.KEY, self.fail, 60), 'чужое')
+
+    def test_lock_released_after_error(self):
+        with self.assertRaises(AssertionError):
+            single_flight.get_or_compute(self.KEY, self.fail, 60)
+        self.assertIsNone(cache.get(single_flight._lock_key(self.KEY)))
+
+
+class RecordingTransport:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, origin, events):
+        self.sent.append(events)
+
+    def receive(self, origin):
+        return {}
+
+
+class InvalidationBusTests(TestCase):
+    def setUp(self):
+        # события, оставшиеся от других тестов: TestCase не коммитит, и flush после них не выполнялся
+        invalidation._pending.events = {}
+        self.received = []
+        invalidation.subscribe('test', self.received.append)
+        self.addCleanup(invalidation._handlers['test'].remove, self.received.append)
+        self.transport = RecordingTransport()
+        patcher = mock.patch.object(invalidation, 'get_transport', return_value=self.transport)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_merge(self):
+        events = {}
+        invalidation.merge(events, 'game', [1, 2])
+        invalidation.merge(events, 'game', [2, 3])
+        invalidation.merge(events, 'tag', None)
+        invalidation.merge(events, 'tag', [5])
+        self.assertEqual(events, {'game': {1, 2, 3}, 'tag': None})
+
+    def test_publish_dispatches_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                invalidation.publish('test', 1)
+                invalidation.publish('test', 2, 1)
+                invalidation.publish('other', 7)
+            self.assertEqual(self.received, [])
+        self.assertEqual(self.received, [{1, 2}])
+        self.assertEqual(self.transport.sent, [{'test': {1, 2}, 'other': {7}}])
+
+    def test_failing_handler_does_not_stop_others(self):
+        def broken(keys):
+            raise RuntimeError('сбой')
+
+        invalidation.subscribe('test', broken)
+        self.addCleanup(invalidation._handlers['test'].remove, broken)
+        invalidation.subscribe('test', self.received.append)
+        self.addCleanup(invalidation._handlers['test'].remove, self.received.append)
+        with self.assertLogs('main.invalidation', 'ERROR'):
+            invalidation.dispatch({'test': None})
+        self.assertEqual(self.received, [None, None])
+
+    def test_deferred_sends_once(self):
+        with invalidation.deferred():
+            invalidation.publish('test', 1)
+            invalidation.flush()
+            with invalidation.deferred():
+                invalidation.publish('test', 2)
+                invalidation.flush()
+            invalidation.publish('test')
+            invalidation.flush()
+            # свой процесс видит каждое изменение сразу
+            self.assertEqual(self.received, [{1}, {2}, None])
+            self.assertEqual(self.transport.sent, [])
+        self.assertEqual(self.transport.sent, [{'test': None}])
+
+    def test_poll_dispatches_received_events(self):
+        self.transport.receive = lambda origin: {'test': {3}}
+        invalidation.poll(force=True)
+        self.assertEqual(self.received, [{3}])
+        # следующий опрос раньше INVALIDATION_POLL_INTERVAL пропускается
+        with override_settings(INVALIDATION_POLL_INTERVAL=60):
+            invalidation.poll()
+        self.assertEqual(self.received, [{3}])
+
+
+class OutboxTransportTests(TestCase):
+    def test_receives_only_events_of_other_processes(self):
+        transport = invalidation.OutboxTransport()
+        # первый опрос только запоминает момент запуска
+        self.assertEqual(transport.receive('этот'), {})
+
+        transport.send('соседний', {'game': {1, 2}, 'tag': None})
+        transport.send('соседний', {'game': {3}, 'tag': {4}})
+        transport.send('этот', {'collection': {9}})
+        self.assertEqual(transport.receive('этот'), {'game': {1, 2, 3}, 'tag': None})
+        # прочитанные строки повторно не выдаются, хотя попадают в окно overlap
+        self.assertEqual(transport.receive('этот'), {})
+
+        transport.send('соседний', {'game': {5}})
+        self.assertEqual(transport.receive('этот'), {'game': {5}})
+
+    def test_prunes_old_events(self):
+        transport = invalidation.OutboxTransport(retention=60, prune_interval=0)
+        transport.send('соседний', {'game': {1}})
+        InvalidationEvent.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        transport.send('соседний', {'game': {2}})
+        self.assertEqual(list(InvalidationEvent.objects.values_list('keys', flat=True)), [[2]])
+
+
+class CatalogSnapshotTests(TestCase):
+    SELECTIONS = [
+        Selection(),
+        Selection(include_tags=['RPG']),
+        Selection(exclude_tags=['Coop'], genres=['RPG']),
+        Selection(year_min=2000, price_max=999),
+    ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'catalog.snapshot'
+        self.enterContext(override_settings(CATALOG_SNAPSHOT_PATH=self.path))
+        self.addCleanup(setattr, catalog_snapshot, '_snapshot', None)
+
+    def test_round_trip(self):
+        index = small_index()
+        catalog_snapshot.write(index, 'v1')
+        loaded = catalog_snapshot.load('v1')
+
+        self.assertIsNotNone(loaded)
+        self.assertEqual(list(loaded.ranked_ids), list(index.ranked_ids))
+        self.assertEqual(loaded.tag_ids, index.tag_ids)
+        for selection in self.SELECTIONS:
+            with self.subTest(selection=selection):
+                self.assertEqual(loaded.search(selection), index.search(selection))
+        self.assertEqual(loaded.search_titles('MM', 10), index.search_titles('MM', 10))
+
+    def test_version_mismatch(self):
+        catalog_snapshot.write(small_index(), 'v1')
+        self.assertIsNone(catalog_snapshot.load('v2'))
+
+    def test_rewritten_snapshot_is_reopened(self):
+        catalog_snapshot.write(small_index(), 'v1')
+        self.assertIsNotNone(catalog_snapshot.load('v1'))
+        catalog_snapshot.write(small_index(), 'v2')
+        self.assertIsNotNone(catalog_snapshot.load('v2'))
+
+    def test_missing_or_foreign_file(self):
+        self.assertIsNone(catalog_snapshot.load('v1'))
+        self.path.write_bytes(b'not a snapshot at all')
+        self.assertIsNone(catalog_snapshot.open_snapshot())
+
+    def test_db_version_changes_with_catalog(self):
+        before = catalog_snapshot.db_version()
+        game = create_game('Новая игра')
+        after_create = catalog_snapshot.db_version()
+        self.assertNotEqual(after_create, before)
+        game.tags.add(Tag.objects.create(name='RPG', slug='rpg'))
+        self.assertNotEqual(catalog_snapshot.db_version(), after_create)
+
+    @override_settings(CATALOG_SNAPSHOT_AUTO_WRITE=True)
+    def test_build_index_writes_and_reuses_snapshot(self):
+        create_game('Игра')
+        index = catalog_index.build_index()
+        self.assertTrue(self.path.exists())
+        with mock.patch.object(catalog_index, 'index_from_db', side_effect=AssertionError('запрос к БД')):
+            loaded = catalog_index.build_index()
+        self.assertEqual(list(loaded.ranked_ids), list(index.ranked_ids))
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER, FEEDBACK_BURST=2, FEEDBACK_REFILL_SECONDS=60)
+class FeedbackTests(TestCase):
+    MESSAGE = {'name': 'Игрок', 'email': 'player@example.com', 'message': 'Привет'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='x', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_messages(self, count, **fields):
+        moment = timezone.now()
+        for n in range(count):
+            message = Feedback.objects.create(name=f'n{n}', email='a@example.com', message='m', **fields)
+            # auto_now_add не даёт задать время при создании. По три сообщения с одинаковым
+            # временем: граница страницы проходит внутри группы
+            Feedback.objects.filter(id=message.id).update(created_at=moment - timedelta(minutes=n // 3))
+
+    def test_bucket_limits_burst_and_refills(self):
+        with mock.patch('main.feedback.time.time', return_value=1000.0):
+            self.assertTrue(feedback.take_token('10.0.0.1'))
+            self.assertTrue(feedback.take_token('10.0.0.1'))
+            self.assertFalse(feedback.take_token('10.0.0.1'))
+            # у другого адреса своё ведро
+            self.assertTrue(feedback.take_token('10.0.0.2'))
+        with mock.patch('main.feedback.time.time', return_value=1060.0):
+            self.assertTrue(feedback.take_token('10.0.0.1'))
+            self.assertFalse(feedback.take_token('10.0.0.1'))
+
+    def test_client_ip(self):
+        request = mock.Mock(META={'REMOTE_ADDR': '10.0.0.1', 'HTTP_X_FORWARDED_FOR': '1.1.1.1, 2.2.2.2'})
+        self.assertEqual(feedback.client_ip(request), '10.0.0.1')
+        with override_settings(FEEDBACK_CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR'):
+            # адрес, дописанный нашим прокси, а не подставленный клиентом
+            self.assertEqual(feedback.client_ip(request), '2.2.2.2')
+            request.META['HTTP_X_FORWARDED_FOR'] = ''
+            self.assertEqual(feedback.client_ip(request), '10.0.0.1')
+
+    def test_contact_throttled(self):
+        for _ in range(2):
+            self.assertRedirects(self.client.post('/contact/', self.MESSAGE), '/contact/')
+        response = self.client.post('/contact/', self.MESSAGE)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Feedback.objects.count(), 2)
+        # невалидная форма жетон не тратит и не отклоняется с 429
+        self.assertEqual(self.client.post('/contact/', {'name': 'Игрок'}).status_code, 200)
+
+    def test_contact_database_error(self):
+        with mock.patch.object(Feedback.objects, 'create', side_effect=DatabaseError('нет места')):
+            with self.assertLogs('main.feedback', 'ERROR'):
+                response = self.client.post('/contact/', self.MESSAGE)
+        self.assertEqual(response.status_code, 503)
+
+    def test_cursor_round_trip(self):
+        moment = timezone.now()
+        self.assertEqual(decode_cursor(Feedback, 'created_at', encode_cursor(moment, 42)), (moment, 42))
+        for cursor in ('', '!!!', encode_cursor('not a date', 1), encode_cursor(timezone.now(), 'x')):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(Feedback, 'created_at', cursor)
+
+    def test_inbox_pages(self):
+        self.create_messages(7)
+        self.create_messages(2, is_processed=True)
+        expected = list(
+            Feedback.objects.filter(is_processed=False).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.client.login(username='staff', password='x')
+
+        seen, cursor, pages = [], None, 0
+        with mock.patch('main.views.FEEDBACK_PAGE_SIZE', 2):
+            while True:
+                params = {'status': 'new'}
+                if cursor:
+                    params['after'] = cursor
+                response = self.client.get('/feedback/', params)
+                seen.extend(message.id for message in response.context['feedbacks'])
+                cursor = response.context['next_cursor']
+                pages += 1
+                if cursor is None:
+                    break
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 4)
+        self.assertRedirects(
+            self.client.get('/feedback/', {'status': 'new', 'after': '!!!'}), '/feedback/?status=new',
+        )
+
+    def test_mark_processed(self):
+        self.create_messages(3)
+        ids = list(Feedback.objects.values_list('id', flat=True))
+        self.assertEqual(feedback.mark_processed(ids[:1]), 1)
+        # уже обработанные не считаются
+        self.assertEqual(feedback.mark_processed(ids[:2]), 1)
+
+        self.client.login(username='staff', password='x')
+        response = self.client.post('/feedback/processed/', {'ids': [str(ids[2]), 'x'], 'status': 'all'})
+        self.assertRedirects(response, '/feedback/?status=all')
+        self.assertFalse(Feedback.objects.filter(is_processed=False).exists())
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='x')
+        cls.tags = [Tag.objects.create(name=f'Тег {n}', slug=f'tag-{n}') for n in range(5)]
+        cls.games = [create_game(f'Игра {n}') for n in range(3)]
+        cls.games[0].tags.add(cls.tags[1], cls.tags[0])
+        cls.public = Collection.objects.create(user=cls.user, title='Открытая', description='', is_public=True)
+        Collection.objects.create(user=cls.user, title='Закрытая', description='', is_public=False)
+        Collection.objects.create(user=cls.user, title='Удалённая', description='', is_public=True, is_deleted=True)
+        for order, game in enumerate(reversed(cls.games)):
+            GameCollection.objects.create(collection=cls.public, game=game, order=order)
+
+    def test_pages_follow_ids(self):
+        seen, after = [], None
+        while True:
+            params = {'limit': '2', 'fields': 'name'}
+            if after:
+                params['after'] = after
+            response = api.fetch('tags', params)
+            seen.extend(row['id'] for row in response['results'])
+            self.assertEqual(set(response['results'][0]), {'id', 'name'})
+            after = response['next']
+            if after is None:
+                break
+        self.assertEqual(seen, [tag.id for tag in self.tags])
+
+    def test_bad_params(self):
+        for params in ({'after': '!!!'}, {'limit': '0'}, {'limit': 'x'}, {'fields': 'title,secret'}, {'ids': '1,x'}):
+            with self.subTest(params=params), self.assertRaises(api.ApiError):
+                api.fetch('games', params)
+
+    def test_batch_keeps_order_and_reports_missing(self):
+        ids = [self.games[2].id, 999, self.games[0].id, self.games[2].id]
+        response = api.fetch('games', {'ids': ','.join(map(str, ids)), 'fields': 'title,tags'})
+        self.assertEqual(response['results'], [
+            {'id': self.games[2].id, 'title': 'Игра 2', 'tags': []},
+            {'id': self.games[0].id, 'title': 'Игра 0', 'tags': ['Тег 0', 'Тег 1']},
+        ])
+        self.assertEqual(response['missing'], [999])
+
+    def test_related_fields_read_only_when_requested(self):
+        with self.assertNumQueries(1):
+            api.fetch('games', {'fields': 'title'})
+        with self.assertNumQueries(2):
+            api.fetch('games', {'fields': 'title,tags'})
+
+    def test_only_public_alive_collections(self):
+        response = api.fetch('collections', {'fields': 'title,user,games'})
+        self.assertEqual(response['results'], [{
+            'id': self.public.id, 'title': 'Открытая', 'user': 'owner',
+            'games': [game.id for game in reversed(self.games)],
+        }])
+
+    def test_view_etag(self):
+        response = self.client.get('/api/games/', {'fields': 'title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 3)
+        etag = response['ETag']
+
+        response = self.client.get('/api/games/', {'fields': 'title'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        # после изменения данных тело и ETag другие
+        create_game('Новая игра')
+        response = self.client.get('/api/games/', {'fields': 'title'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_view_errors(self):
+        self.assertEqual(self.client.get('/api/tags/', {'limit': '0'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/tags/').status_code, 405)
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER, CHANGE_FEED_LAG=0)
+class ChangeLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='x')
+        cls.admin = User.objects.create_superuser('admin', password='x')
+
+    def setUp(self):
+        cache.clear()
+
+    def create_collection(self, **fields):
+        return Collection.objects.create(user=self.user, title='Подборка', description='', **fields)
+
+    def entry(self, collection):
+        return ChangeLog.objects.get(resource='collections', object_id=collection.id)
+
+    def test_private_and_deleted_collections_are_tombstones(self):
+        public = self.create_collection()
+        self.assertFalse(self.entry(public).deleted)
+
+        public.is_public = False
+        public.save()
+        self.assertTrue(self.entry(public).deleted)
+
+        hidden = self.create_collection()
+        Collection.objects.filter(id=hidden.id).update(is_deleted=True)
+        change_log.record('collections', [hidden.id])
+        self.assertTrue(self.entry(hidden).deleted)
+
+    def test_only_last_entry_per_object(self):
+        collection = self.create_collection()
+        collection.save()
+        collection.save()
+        self.assertEqual(ChangeLog.objects.filter(resource='collections', object_id=collection.id).count(), 1)
+
+    def test_since_paging(self):
+        since = change_log.current_version()
+        collections = [self.create_collection() for _ in range(5)]
+
+        seen, version, has_more = [], since, True
+        while has_more:
+            changes, version, has_more = change_log.changes(version, limit=2)
+            seen.extend(change['id'] for change in changes)
+        self.assertEqual(seen, [collection.id for collection in collections])
+        self.assertEqual(version, change_log.current_version())
+        self.assertEqual(change_log.changes(version), ([], version, False))
+
+    def test_recent_entries_are_held_back(self):
+        since = change_log.current_version()
+        self.create_collection()
+        with override_settings(CHANGE_FEED_LAG=60):
+            self.assertEqual(change_log.changes(since), ([], since, True))
+
+    def test_admin_make_private(self):
+        public = [self.create_collection(is_public=True) for _ in range(2)]
+        hidden = self.create_collection(is_public=False)
+        since = change_log.current_version()
+
+        self.client.login(username='admin', password='x')
+        response = self.client.post('/admin/main/collection/', {
+            'action': 'make_private', '_selected_action': [collection.id for collection in (*public, hidden)],
+        }, follow=True)
+        self.assertContains(response, '2 подборок стали приватными')
+        self.assertFalse(Collection.objects.filter(is_public=True).exists())
+
+        changes, _, _ = change_log.changes(since)
+        self.assertEqual(
+            [(change['id'], change['deleted']) for change in changes],
+            [(collection.id, True) for collection in public],
+        )
+
+    def test_changes_view(self):
+        response = self.client.get('/api/changes/')
+        version = response.json()['version']
+        collection = self.create_collection()
+
+        data = self.client.get('/api/changes/', {'since': version}).json()
+        self.assertEqual([change['id'] for change in data['changes']], [collection.id])
+        self.assertFalse(data['has_more'])
+        for params in ({'since': 'x'}, {'since': '-1'}, {'since': '0', 'limit': '0'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/changes/', params).status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=MD5_HASHER)
+class DeletionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='x')
+        cls.fan = User.objects.create_user('fan', password='x')
+        cls.games = [create_game(f'Игра {n}') for n in range(5)]
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(mock.patch.object(deletion, 'DELETE_BATCH_SIZE', 2))
+
+    def create_collection(self, user, games=()):
+        collection = Collection.objects.create(user=user, title='Подборка', description='')
+        for order, game in enumerate(games, 1):
+            GameCollection.objects.create(collection=collection, game=game, order=order)
+        return collection
+
+    def test_collection_hidden_then_purged_in_batches(self):
+        collection = self.create_collection(self.owner, self.games)
+        CollectionLike.objects.create(user=self.fan, collection=collection)
+        UserProfile.objects.get_or_create(user=self.owner)
+
+        job = deletion.schedule_collections_deletion([collection])
+        self.assertFalse(Collection.objects.alive().filter(id=collection.id).exists())
+        self.assertTrue(Collection.objects.filter(id=collection.id).exists())
+        self.assertEqual(UserProfile.objects.get(user=self.owner).collections_count, 0)
+        self.assertTrue(ChangeLog.objects.get(resource='collections', object_id=collection.id).deleted)
+
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_DONE)
+        # 5 игр и 1 лайк пачками по 2 и сама подборка
+        self.assertEqual(job.progress, 7)
+        self.assertFalse(Collection.objects.filter(id=collection.id).exists())
+        self.assertFalse(GameCollection.objects.filter(collection_id=collection.id).exists())
+        self.assertFalse(CollectionLike.objects.filter(collection_id=collection.id).exists())
+
+    def test_restored_collection_is_not_purged(self):
+        collection = self.create_collection(self.owner, self.games[:2])
+        deletion.schedule_collections_deletion([collection])
+        Collection.objects.filter(id=collection.id).update(is_deleted=False)
+        jobs.run_pending()
+        self.assertEqual(GameCollection.objects.filter(collection_id=collection.id).count(), 2)
+
+    def test_user_purge_updates_liked_collections(self):
+        liked = [self.create_collection(self.owner) for _ in range(3)]
+        for collection in liked:
+            CollectionLike.objects.create(user=self.fan, collection=collection)
+        own = self.create_collection(self.fan, self.games)
+
+        deletion.schedule_user_deletion(self.fan)
+        self.assertFalse(User.objects.get(id=self.fan.id).is_active)
+        self.assertFalse(Collection.objects.alive().filter(id=own.id).exists())
+
+        jobs.run_pending()
+        self.assertFalse(User.objects.filter(id=self.fan.id).exists())
+        self.assertFalse(Collection.objects.filter(id=own.id).exists())
+        self.assertEqual(
+            list(Collection.objects.filter(id__in=[c.id for c in liked]).values_list('likes_count', flat=True)),
+            [0, 0, 0],
+        )
+
+    def test_delete_view_only_for_owner(self):
+        collection = self.create_collection(self.owner, self.games[:2])
+        self.client.login(username='fan', password='x')
+        self.client.post(f'/collection/{collection.id}/delete/')
+        self.assertTrue(Collection.objects.alive().filter(id=collection.id).exists())
+
+        self.client.login(username='owner', password='x')
+        self.assertRedirects(self.client.post(f'/collection/{collection.id}/delete/'), '/collections/')
+        self.assertFalse(Collection.objects.alive().filter(id=collection.id).exists())
+        self.assertEqual(Job.objects.get(name='purge_collections').payload, {'collection_ids': [collection.id]})
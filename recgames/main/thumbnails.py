@@ -0,0 +1,177 @@
+"""
+Миниатюры обложек игр.
+
+Game.game_image — внешний URL полноразмерной обложки. build_for_games скачивает
+обложку через источник THUMBNAIL_SOURCE, уменьшает её до каждого размера из
+SIZES и сохраняет в THUMBNAIL_DIR под именем, равным хэшу содержимого
+(одинаковые картинки хранятся один раз). Имена файлов записываются в
+Game.cover_thumbnails вместе с исходным URL; фильтр {{ game|thumbnail:'card' }}
+отдаёт миниатюру, а пока её нет или обложка сменилась — исходный URL.
+
+Pillow указан в requirements.txt, но импорт необязателен: без него миниатюры
+не строятся и везде остаются исходные обложки. Задача build_thumbnails
+ставится при создании игры и при смене game_image, не чаще одной ожидающей
+на игру.
+"""
+import hashlib
+import io
+import logging
+import re
+import tempfile
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from .models import Game
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# размер → ограничивающий прямоугольник; пропорции обложки сохраняются
+SIZES = {
+    'card': (460, 460),
+    'large': (1000, 1000),
+}
+
+NAME_PATTERN = re.compile(r'^[0-9a-f]{40}\.(webp|jpg)$')
+
+
+def available():
+    return Image is not None
+
+
+class HttpSource:
+    """Скачивает обложку по её URL"""
+
+    def __init__(self, timeout=10, max_bytes=10 * 1024 * 1024):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+
+    def fetch(self, url):
+        request = urllib.request.Request(url, headers={'User-Agent': 'RecGames thumbnailer'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = response.read(self.max_bytes + 1)
+        if len(data) > self.max_bytes:
+            raise ValueError(f'Обложка больше {self.max_bytes} байт: {url}')
+        return data
+
+
+class DirectorySource:
+    """
+    Берёт обложку из локального каталога по пути из URL (для тестов и офлайн-сборки):
+    https://cdn.example.com/apps/10/header.jpg → <root>/apps/10/header.jpg
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def fetch(self, url):
+        path = (self.root / urlparse(url).path.lstrip('/')).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f'Путь вне каталога обложек: {url}')
+        return path.read_bytes()
+
+
+def get_source():
+    options = dict(settings.THUMBNAIL_SOURCE)
+    return import_string(options.pop('BACKEND'))(**options)
+
+
+def thumbnail_dir():
+    return Path(settings.THUMBNAIL_DIR)
+
+
+def output_format():
+    if settings.THUMBNAIL_FORMAT == 'WEBP' and features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def render(data, box):
+    """Байты миниатюры, вписанной в box"""
+    image_format, _ = output_format()
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(box, Image.Resampling.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA') or image_format == 'JPEG':
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, image_format, quality=settings.THUMBNAIL_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def store(content):
+    """Сохраняет миниатюру под хэшем содержимого и возвращает имя файла"""
+    _, extension = output_format()
+    name = f'{hashlib.sha1(content).hexdigest()}.{extension}'
+    path = path_for(name)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # запись во временный файл и переименование: читатель не увидит недописанный файл
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as temporary:
+            temporary.write(content)
+        Path(temporary.name).replace(path)
+    return name
+
+
+def path_for(name):
+    return thumbnail_dir() / name[:2] / name
+
+
+def build(source, url):
+    data = source.fetch(url)
+    thumbnails = {'source': url}
+    for size, box in SIZES.items():
+        thumbnails[size] = store(render(data, box))
+    return thumbnails
+
+
+def build_for_games(game_ids, workers=None, force=False):
+    """
+    Строит миниатюры для игр в пуле потоков. Игры, у которых миниатюры уже
+    соответствуют текущей обложке, пропускаются. Возвращает (построено, ошибок).
+    """
+    games = Game.objects.filter(id__in=game_ids).values_list('id', 'game_image', 'cover_thumbnails')
+    pending = [
+        (game_id, url) for game_id, url, thumbnails in games
+        if force or thumbnails.get('source') != url
+    ]
+    if not pending:
+        return 0, 0
+
+    source = get_source()
+    built = failed = 0
+
+    def work(item):
+        game_id, url = item
+        try:
+            return game_id, build(source, url)
+        except Exception:
+            logger.exception('Не удалось построить миниатюру игры #%s (%s)', game_id, url)
+            return game_id, None
+
+    with ThreadPoolExecutor(max_workers=workers or settings.THUMBNAIL_WORKERS) as pool:
+        for game_id, thumbnails in pool.map(work, pending):
+            if thumbnails is None:
+                failed += 1
+                continue
+            # update, а не save: сигнал post_save снова поставил бы задачу
+            Game.objects.filter(id=game_id).update(cover_thumbnails=thumbnails)
+            built += 1
+    return built, failed
+
+
+def url_for(game, size):
+    thumbnails = game.cover_thumbnails
+    if thumbnails.get('source') == game.game_image and size in thumbnails:
+        return reverse('thumbnail', args=[thumbnails[size]])
+    return game.game_image
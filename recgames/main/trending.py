@@ -0,0 +1,207 @@
+"""
+Тренды игр и подборок по событиям «добавили в избранное» / «лайкнули».
+
+Каждое событие увеличивает счёт объекта, а счёт экспоненциально затухает со
+временем (период полураспада TRENDING_HALF_LIFE). Чтобы не пересчитывать
+затухание у всех объектов, хранится значение, приведённое к моменту `epoch`:
+
+    score(t) = values[id] * exp(-rate * (t - epoch))
+
+поэтому событие — это одно сложение в массиве по индексу id.
+
+События — это сами строки Favorite и CollectionLike: в выдачу попадают только
+закоммиченные. Задача `sync_trending` (main/jobs.py, раз в
+TRENDING_SYNC_INTERVAL секунд) дочитывает строки с id больше запомненного в
+TrendingState и переносит счётчики к текущей эпохе, поэтому множитель
+exp(rate * (t - epoch)) не растёт. Веб-процессы только перечитывают
+состояние не чаще раза в TRENDING_SYNC_INTERVAL секунд и до следующего
+перечитывания отдают запомненный топ. Удалённая до
+синхронизации строка не учитывается; SQLite может выдать её id повторно, и
+тогда не учтётся и новая — тренды это не искажает заметно.
+"""
+import heapq
+import math
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import CollectionLike, Favorite, TrendingState
+
+# счёт ниже этого порога (меньше сотой доли свежего события) трендом не считается
+MIN_SCORE = 0.01
+
+# exp(rate * (t - epoch)) растёт со временем; при таком множителе счётчики
+# переносятся к новой эпохе, чтобы не терять точность
+MAX_GROWTH = math.exp(50)
+
+
+class DecayedScores:
+    """Счётчики с экспоненциальным затуханием в плотном массиве, индекс — id объекта"""
+
+    def __init__(self, half_life, epoch, values=None):
+        self.rate = math.log(2) / half_life
+        self.epoch = epoch
+        self.values = values if values is not None else array('d')
+        # limit → лучшие (значение, id); затухание у всех счётчиков одинаковое,
+        # поэтому порядок меняется только при изменении values
+        self._best = {}
+
+    def _ensure(self, obj_id):
+        missing = obj_id + 1 - len(self.values)
+        if missing > 0:
+            self.values.extend(array('d', bytes(8 * missing)))
+
+    def add(self, obj_id, weight, timestamp):
+        growth = math.exp(self.rate * (timestamp - self.epoch))
+        if growth > MAX_GROWTH:
+            self.rebase(timestamp)
+            growth = 1.0
+        self._ensure(obj_id)
+        self.values[obj_id] += weight * growth
+        self._best.clear()
+
+    def rebase(self, epoch):
+        factor = math.exp(-self.rate * (epoch - self.epoch))
+        self.values = array('d', (value * factor for value in self.values))
+        self.epoch = epoch
+        self._best.clear()
+
+    def score(self, obj_id, now):
+        if obj_id >= len(self.values):
+            return 0.0
+        return self.values[obj_id] * math.exp(-self.rate * (now - self.epoch))
+
+    def top(self, limit, now):
+        """Лучшие `limit` объектов: [(id, счёт на момент now)]"""
+        best = self._best.get(limit)
+        if best is None:
+            best = self._best[limit] = heapq.nlargest(
+                limit,
+                ((value, obj_id) for obj_id, value in enumerate(self.values) if value > 0),
+            )
+        decay = math.exp(-self.rate * (now - self.epoch))
+        return [(obj_id, value * decay) for value, obj_id in best if value * decay >= MIN_SCORE]
+
+    def to_bytes(self):
+        return self.values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, half_life, epoch, data):
+        values = array('d')
+        values.frombytes(bytes(data))
+        return cls(half_life, epoch, values)
+
+
+class TrendingEngine:
+    KINDS = (TrendingState.KIND_GAMES, TrendingState.KIND_COLLECTIONS)
+
+    def __init__(self, half_life, sync_interval):
+        self.half_life = half_life
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        now = time.time()
+        self.scores = {kind: DecayedScores(half_life, now) for kind in self.KINDS}
+        self.loaded_at = None
+
+    def top(self, kind, limit):
+        self.maybe_reload()
+        with self.lock:
+            return self.scores[kind].top(limit, time.time())
+
+    def maybe_reload(self):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.sync_interval:
+            self.reload()
+
+    def _load(self, states, now):
+        scores = {}
+        for kind in self.KINDS:
+            state = states.get(kind)
+            if state is None:
+                scores[kind] = DecayedScores(self.half_life, now)
+            else:
+                scores[kind] = DecayedScores.from_bytes(self.half_life, state.epoch, state.data)
+        return scores
+
+    def _replace(self, scores):
+        with self.lock:
+            self.scores = scores
+            self.loaded_at = time.monotonic()
+
+    def reload(self):
+        """Перечитывает общее состояние из БД, ничего не записывая"""
+        states = {state.kind: state for state in TrendingState.objects.filter(kind__in=self.KINDS)}
+        self._replace(self._load(states, time.time()))
+
+    def sync(self):
+        """
+        Добавляет к общему состоянию события, закоммиченные после прошлой
+        синхронизации, и переносит счётчики к текущей эпохе. Выполняется
+        в задаче, а не в запросе: перезаписывает массивы целиком.
+        Возвращает число учтённых событий.
+        """
+        now = time.time()
+        added = 0
+        with transaction.atomic():
+            states = {
+                state.kind: state
+                for state in TrendingState.objects.select_for_update().filter(kind__in=self.KINDS)
+            }
+            scores = self._load(states, now)
+            for kind in self.KINDS:
+                last_event_id = states[kind].last_event_id if kind in states else 0
+                events = EVENT_SOURCES[kind]().filter(id__gt=last_event_id).order_by('id')
+                for event_id, obj_id, created_at in events.iterator(chunk_size=2000):
+                    scores[kind].add(obj_id, 1.0, created_at.timestamp())
+                    last_event_id = event_id
+                    added += 1
+                if now > scores[kind].epoch:
+                    scores[kind].rebase(now)
+                TrendingState.objects.update_or_create(kind=kind, defaults={
+                    'epoch': scores[kind].epoch,
+                    'data': scores[kind].to_bytes(),
+                    'last_event_id': last_event_id,
+                })
+        self._replace(scores)
+        return added
+
+    def reset(self, scores, last_event_ids):
+        """Заменяет общее состояние целиком (используется при пересборке из истории)"""
+        with transaction.atomic():
+            for kind, values in scores.items():
+                TrendingState.objects.update_or_create(kind=kind, defaults={
+                    'epoch': values.epoch,
+                    'data': values.to_bytes(),
+                    'last_event_id': last_event_ids[kind],
+                })
+        self._replace(scores)
+
+
+def _favorite_events():
+    return Favorite.objects.values_list('id', 'game_id', 'added_at')
+
+
+def _like_events():
+    return CollectionLike.objects.values_list('id', 'collection_id', 'created_at')
+
+
+# (id события, id объекта, время) для каждого вида трендов
+EVENT_SOURCES = {
+    TrendingState.KIND_GAMES: _favorite_events,
+    TrendingState.KIND_COLLECTIONS: _like_events,
+}
+
+engine = TrendingEngine(
+    half_life=settings.TRENDING_HALF_LIFE,
+    sync_interval=settings.TRENDING_SYNC_INTERVAL,
+)
+
+
+def top_games(limit):
+    return engine.top(TrendingState.KIND_GAMES, limit)
+
+
+def top_collections(limit):
+    return engine.top(TrendingState.KIND_COLLECTIONS, limit)
@@ -6,8 +6,12 @@ urlpatterns = [
     path('game/<int:game_id>/', views.game_detail, name='game_detail'), 
     path('recommendations/', views.recommendations, name='recommendations'),
     path('recommendations/get/', views.get_recommendations, name='get_recommendations'), 
+    path('recommendations/save-preferences/', views.save_preferences, name='save_preferences'),
+    path('recommendations/related-tags/', views.related_tags, name='related_tags'),
+    path('trending/', views.trending_view, name='trending'),
     path('search/', views.search, name='search'),
     path('favorites/', views.favorites, name='favorites'),
+    path('favorites/page/', views.favorites_page, name='favorites_page'),
     path('collections/', views.collections, name='collections'),
     path('collection/<int:collection_id>/', views.collection_detail, name='collection_detail'),
     path('collection/create/', views.create_collection, name='create_collection'),
@@ -20,7 +24,17 @@ urlpatterns = [
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
     path('feedback/', views.feedback_list, name='feedback_list'),
+    path('feedback/processed/', views.feedback_mark_processed, name='feedback_mark_processed'),
+    path('api/games/', views.api_resource, {'name': 'games'}, name='api_games'),
+    path('api/tags/', views.api_resource, {'name': 'tags'}, name='api_tags'),
+    path('api/collections/', views.api_resource, {'name': 'collections'}, name='api_collections'),
+    path('api/changes/', views.api_changes, name='api_changes'),
     path('register/', views.register_view, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('slow-queries/', views.slow_queries, name='slow_queries'),
+    path('thumbnails/<str:name>', views.thumbnail, name='thumbnail'),
+    path('profiles/', views.profiles_list, name='profiles_list'),
+    path('profiles/<str:profile_id>/<str:name>', views.profile_artifact, name='profile_artifact'),
 ]
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+Кэшируемое состояние пользователя: избранные игры, лайкнутые подборки,
+свои подборки и какие игры в них лежат.
+
+Всё хранится отсортированными массивами int64 и проверяется через bisect,
+поэтому вопросы «игра в избранном?» и «игра в подборке?» не требуют SQL.
+Состояние лежит в кэше под ключом с номером версии пользователя; сигналы
+(main/signals.py) через шину инвалидации (main/invalidation.py) увеличивают
+версию при любом изменении, и старая запись просто перестаёт читаться.
+"""
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Favorite, CollectionLike, Collection, GameCollection
+
+# меняется при изменении формата UserState, чтобы не читать старые записи
+STATE_FORMAT = 1
+
+
+def _sorted_array(values):
+    return array('q', sorted(values))
+
+
+def _contains(values, value):
+    index = bisect_left(values, value)
+    return index < len(values) and values[index] == value
+
+
+def _membership_key(collection_id, game_id):
+    return (collection_id << 32) | game_id
+
+
+class UserState:
+    __slots__ = ('favorite_game_ids', 'liked_collection_ids', 'owned_collection_ids', 'collection_games')
+
+    def __init__(self, favorite_game_ids, liked_collection_ids, owned_collection_ids, collection_games):
+        self.favorite_game_ids = _sorted_array(favorite_game_ids)
+        self.liked_collection_ids = _sorted_array(liked_collection_ids)
+        self.owned_collection_ids = _sorted_array(owned_collection_ids)
+        self.collection_games = _sorted_array(
+            _membership_key(collection_id, game_id) for collection_id, game_id in collection_games
+        )
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def is_favorite(self, game_id):
+        return _contains(self.favorite_game_ids, game_id)
+
+    def likes(self, collection_id):
+        return _contains(self.liked_collection_ids, collection_id)
+
+    def owns(self, collection_id):
+        return _contains(self.owned_collection_ids, collection_id)
+
+    def in_collection(self, collection_id, game_id):
+        return _contains(self.collection_games, _membership_key(collection_id, game_id))
+
+
+EMPTY_STATE = UserState((), (), (), ())
+
+
+def _version_key(user_id):
+    return f'user_state:version:{user_id}'
+
+
+def _state_key(user_id, version):
+    return f'user_state:{STATE_FORMAT}:{user_id}:{version}'
+
+
+def build_state(user_id):
+    return UserState(
+        Favorite.objects.filter(user_id=user_id).values_list('game_id', flat=True),
+        CollectionLike.objects.filter(user_id=user_id).values_list('collection_id', flat=True),
+        Collection.objects.alive().filter(user_id=user_id).values_list('id', flat=True),
+        GameCollection.objects.filter(
+            collection__user_id=user_id, collection__is_deleted=False
+        ).values_list('collection_id', 'game_id'),
+    )
+
+
+def get_state(user):
+    if not user.is_authenticated:
+        return EMPTY_STATE
+
+    # версия читается до построения: если её увеличат, пока мы читаем БД,
+    # устаревшее состояние запишется под старым ключом и не будет прочитано
+    version = cache.get_or_set(_version_key(user.pk), time.time_ns, None)
+    key = _state_key(user.pk, version)
+    state = cache.get(key)
+    if state is None:
+        state = build_state(user.pk)
+        cache.set(key, state, settings.USER_STATE_TTL)
+    return state
+
+
+def invalidate(user_id):
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # версия вытеснена из кэша: новая не должна совпасть ни с одной прежней
+        cache.set(key, time.time_ns(), None)
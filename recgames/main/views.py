@@ -1,49 +1,102 @@
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
+from django.template.loader import render_to_string
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseForbidden, FileResponse, Http404
 from django.contrib.auth.models import User
-from django.db.models import Q, Count
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.static import serve
+import hashlib
 import json
+import re
 from .models import Game, Collection, Feedback, Tag, Favorite, GameCollection, CollectionLike
 from .forms import FeedbackForm, CollectionForm, AddGameToCollectionForm
 from .reg_forms import CustomUserCreationForm  
+from .pagination import keyset_page, InvalidCursor
+from .compression import CompactJsonResponse
+from .user_state import get_state as get_user_state
+from .rankings import cached_home_rankings, cached_public_collections, public_collections
+from . import api, catalog_index, change_log, deletion, feedback, metrics, profiling, querylog, single_flight, tag_stats, thumbnails, trending
+from .catalog_index import Selection
+from .preferences import load_affinity, affinity_scores, record_explicit
 
 def home(request):
-    latest_games = Game.objects.all().order_by('-created_at')[:8]
-    popular_collections = Collection.objects.filter(is_public=True).annotate(
-        like_count=Count('collectionlike')
-    ).order_by('-like_count', '-created_at')[:6]
+    rankings = cached_home_rankings()
     
-    favorite_game_ids = []
-    if request.user.is_authenticated:
-        favorite_game_ids = Favorite.objects.filter(
-            user=request.user, 
-            game__in=latest_games
-        ).values_list('game_id', flat=True)
+    state = get_user_state(request.user)
+    for game in rankings['latest_games'] + rankings['trending_games']:
+        game.is_favorite = state.is_favorite(game.id)
+    for collection in rankings['popular_collections']:
+        collection.is_liked = state.likes(collection.id)
     
     context = {
         'title': 'Главная страница',
-        'latest_games': latest_games,
-        'popular_collections': popular_collections,
-        'favorite_game_ids': list(favorite_game_ids),  
+        'latest_games': rankings['latest_games'],
+        'trending_games': rankings['trending_games'],
+        'popular_collections': rankings['popular_collections'],
     }
     return render(request, 'main/home.html', context)
 
+def trending_view(request):
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+    except ValueError:
+        limit = 10
+    
+    game_scores = trending.top_games(limit * 2)
+    collection_scores = trending.top_collections(limit * 2)
+    
+    games = Game.objects.in_bulk([game_id for game_id, _ in game_scores])
+    collections = Collection.objects.alive().filter(is_public=True).in_bulk(
+        [collection_id for collection_id, _ in collection_scores]
+    )
+    
+    trending_games = []
+    for game_id, score in game_scores:
+        game = games.get(game_id)
+        if game is not None:
+            trending_games.append({
+                'id': game.id,
+                'title': game.title,
+                'game_image': game.game_image,
+                'thumbnail': thumbnails.url_for(game, 'card'),
+                'rating': float(game.rating),
+                'score': round(score, 3),
+            })
+    
+    trending_collections = []
+    for collection_id, score in collection_scores:
+        collection = collections.get(collection_id)
+        if collection is not None:
+            trending_collections.append({
+                'id': collection.id,
+                'title': collection.title,
+                'score': round(score, 3),
+            })
+    
+    return CompactJsonResponse({
+        'success': True,
+        'games': trending_games[:limit],
+        'collections': trending_collections[:limit],
+    })
+
 def game_detail(request, game_id):
     game = get_object_or_404(Game, id=game_id)
     
-    is_favorite = False
-    if request.user.is_authenticated:
-        is_favorite = Favorite.objects.filter(user=request.user, game=game).exists()
+    state = get_user_state(request.user)
+    is_favorite = state.is_favorite(game.id)
     
     user_collections = []
     if request.user.is_authenticated:
-        user_collections = Collection.objects.filter(user=request.user)
+        user_collections = list(Collection.objects.alive().filter(user=request.user))
         
         for collection in user_collections:
-            collection.game_is_added = collection.games.filter(id=game.id).exists()
+            collection.game_is_added = state.in_collection(collection.id, game.id)
     
     context = {
         'title': game.title,
@@ -55,72 +108,122 @@ def game_detail(request, game_id):
 
 def recommendations(request):
     all_tags = Tag.objects.all().order_by('name')
+    _, facets = catalog_index.get_index().search(Selection())
     
     context = {
         'title': 'Рекомендации',
         'all_tags': all_tags,
+        'genres': [(value, label, facets['genres'].get(value, 0)) for value, label in Game.GENRE_CHOICES],
+        'platforms': [(value, label, facets['platforms'].get(value, 0)) for value, label in Game.PLATFORM_CHOICES],
     }
     return render(request, 'main/recommendations.html', context)
 
+def _recommendation_results(selection):
+    """Неперсонализированная выдача по выбору тегов и фасетов, общая для всех пользователей"""
+    index = catalog_index.get_index()
+    game_ids, facets = index.search(selection)
+    games_by_id = Game.objects.prefetch_related('tags').in_bulk(game_ids)
+    games = [games_by_id[game_id] for game_id in game_ids if game_id in games_by_id]
+    
+    return {
+        'games': [{
+            'id': game.id,
+            'title': game.title,
+            'genres': game.get_genre_display(),
+            'release_year': game.release_year,
+            'rating': float(game.rating),
+            'price': int(game.price),
+            'game_image': game.game_image,
+            'thumbnail': thumbnails.url_for(game, 'card'),
+            'developer': game.developer,
+            'tags': [tag.name for tag in game.tags.all()],
+        } for game in games],
+        'tag_ids': [[tag.id for tag in game.tags.all()] for game in games],
+        'facets': facets,
+    }
+
 def get_recommendations(request):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            include_tags_names = data.get('include_tags', [])
-            exclude_tags_names = data.get('exclude_tags', [])
-            
-            include_tags = Tag.objects.filter(name__in=include_tags_names)
-            exclude_tags = Tag.objects.filter(name__in=exclude_tags_names)
+            selection = Selection.from_request_data(data)
             
-            games = Game.objects.all()
-            
-            if include_tags:
-                for tag in include_tags:
-                    games = games.filter(tags=tag)
+            # версия каталога в ключе: после изменения каталога старые выдачи не читаются
+            key = f'recommendations:{catalog_index.version()}:{selection.cache_key()}'
+            results = single_flight.get_or_compute(
+                key, lambda: _recommendation_results(selection), settings.RECOMMENDATIONS_CACHE_TTL,
+            )
+            recommended_games = [dict(game, match_score=None) for game in results['games']]
             
-            if exclude_tags:
-                games = games.exclude(tags__in=exclude_tags)
-
-            games = games.distinct()
-            games = games.order_by('-rating')
-            recommended_games = []
-            for game in games:
-                recommended_games.append({
-                    'id': game.id,
-                    'title': game.title,
-                    'genres': game.get_genre_display(),
-                    'release_year': game.release_year,
-                    'rating': float(game.rating),
-                    'price': int(game.price),
-                    'game_image': game.game_image,
-                    'developer': game.developer,
-                    'tags': [tag.name for tag in game.tags.all()]
-                })
+            affinity = load_affinity(request.user)
+            personal_scores = None
+            if affinity is not None:
+                personal_scores = affinity_scores(affinity, results['tag_ids'])
+                order = sorted(
+                    range(len(recommended_games)),
+                    key=lambda i: (-personal_scores[i], -recommended_games[i]['rating']),
+                )
+                recommended_games = [
+                    dict(recommended_games[i], match_score=round(personal_scores[i], 2)) for i in order
+                ]
             
-            return JsonResponse({
+            return CompactJsonResponse({
                 'success': True,
                 'games': recommended_games,
-                'count': len(recommended_games)
+                'count': len(recommended_games),
+                'personalized': personal_scores is not None,
+                'facets': results['facets'],
             })
             
         except Exception as e:
-            return JsonResponse({
+            return CompactJsonResponse({
                 'success': False,
                 'error': str(e)
             })
     
-    return JsonResponse({
+    return CompactJsonResponse({
         'success': False,
         'error': 'Только POST запросы'
     })
 
+@login_required
+def save_preferences(request):
+    """Явное «Запомнить выбор»: включённые теги становятся предпочтениями пользователя"""
+    if request.method != 'POST':
+        return CompactJsonResponse({'success': False, 'error': 'Только POST запросы'})
+    try:
+        names = list(json.loads(request.body).get('include_tags', []))
+    except (ValueError, AttributeError, TypeError):
+        return CompactJsonResponse({'success': False, 'error': 'Неверный запрос'})
+    known = set(Tag.objects.filter(name__in=names).values_list('name', flat=True))
+    tag_names = [name for name in dict.fromkeys(names) if name in known]
+    if not tag_names:
+        return CompactJsonResponse({'success': False, 'error': 'Выберите хотя бы один тег'})
+    return CompactJsonResponse({
+        'success': True,
+        'preferences': record_explicit(request.user, tag_names),
+    })
+
+def related_tags(request):
+    names = request.GET.getlist('tag')
+    tag_ids = Tag.objects.filter(name__in=names).values_list('id', flat=True)
+    return CompactJsonResponse({
+        'success': True,
+        'tags': tag_stats.related(tag_ids, limit=settings.RELATED_TAGS_LIMIT),
+    })
+
+SEARCH_LIMIT = 50
+
 def search(request):
     query = request.GET.get('q', '').strip()
     games = []
     results_count = 0
     
     if query:
-        games = list(Game.objects.filter(title__icontains=query).order_by('-rating')[:50])
+        # поиск по названиям из индекса каталога вместо LIKE по всей таблице
+        game_ids = catalog_index.get_index().search_titles(query, SEARCH_LIMIT)
+        games_by_id = Game.objects.in_bulk(game_ids)
+        games = [games_by_id[game_id] for game_id in game_ids if game_id in games_by_id]
         results_count = len(games)
     
     context = {
@@ -131,48 +234,88 @@ def search(request):
     }
     return render(request, 'main/search.html', context)
 
+FAVORITES_PAGE_SIZE = 24
+
+def _favorite_games_page(user, cursor=None):
+    favorites = Favorite.objects.filter(user=user).select_related('game')
+    page, next_cursor = keyset_page(favorites, 'added_at', cursor, FAVORITES_PAGE_SIZE)
+    return [favorite.game for favorite in page], next_cursor
+
+def _favorite_collections_page(user, cursor=None):
+    likes = CollectionLike.objects.filter(user=user, collection__is_deleted=False).exclude(
+        collection__user=user
+    ).select_related('collection__user')
+    page, next_cursor = keyset_page(likes, 'created_at', cursor, FAVORITES_PAGE_SIZE)
+    return [like.collection for like in page], next_cursor
+
 @login_required
 def favorites(request):
-    favorite_games = Game.objects.filter(
-        favorite__user=request.user
-    ).order_by('-favorite__added_at')
-    
-    favorite_collections = Collection.objects.filter(
-        collectionlike__user=request.user
-    ).exclude(user=request.user).order_by('-collectionlike__created_at')
-    
-    for collection in favorite_collections:
-        collection.likes_count = collection.collectionlike_set.count()
+    favorite_games, games_next = _favorite_games_page(request.user)
+    favorite_collections, collections_next = _favorite_collections_page(request.user)
     
     context = {
         'title': 'Избранное',
         'favorite_games': favorite_games,
         'favorite_collections': favorite_collections,
+        'games_next': games_next,
+        'collections_next': collections_next,
     }
     return render(request, 'main/favorites.html', context)
 
+@login_required
+def favorites_page(request):
+    """Следующая страница избранного для подгрузки без перезагрузки"""
+    kind = request.GET.get('kind')
+    cursor = request.GET.get('after')
+    
+    try:
+        if kind == 'games':
+            items, next_cursor = _favorite_games_page(request.user, cursor)
+            html = ''.join(
+                render_to_string('main/includes/favorite_game_card.html', {'game': game}, request)
+                for game in items
+            )
+        elif kind == 'collections':
+            items, next_cursor = _favorite_collections_page(request.user, cursor)
+            html = ''.join(
+                render_to_string('main/includes/favorite_collection_card.html', {'collection': collection}, request)
+                for collection in items
+            )
+        else:
+            return CompactJsonResponse({'success': False, 'error': 'Неизвестный раздел'}, status=400)
+    except InvalidCursor:
+        return CompactJsonResponse({'success': False, 'error': 'Неверный курсор'}, status=400)
+    
+    return CompactJsonResponse({
+        'success': True,
+        'html': html,
+        'count': len(items),
+        'next': next_cursor,
+    })
+
 def collections(request):
     query = request.GET.get('q', '').strip()
     
     my_collections = None
     if request.user.is_authenticated:
-        my_collections = Collection.objects.filter(user=request.user)
-    
-    popular_collections = Collection.objects.filter(
-        is_public=True
-    )
-    
-    if request.user.is_authenticated:
-        popular_collections = popular_collections.exclude(user=request.user)
-    
-    popular_collections = popular_collections.annotate(
-        like_count=Count('collectionlike')
-    ).order_by('-like_count', '-created_at')
+        my_collections = Collection.objects.alive().filter(user=request.user)
     
     if query:
         if my_collections is not None: 
             my_collections = my_collections.filter(title__icontains=query)
-        popular_collections = popular_collections.filter(title__icontains=query)
+        popular_collections = list(public_collections().filter(title__icontains=query))
+    else:
+        # список без поиска одинаков для всех, кроме своих подборок — их убираем ниже
+        popular_collections = cached_public_collections()
+    
+    if request.user.is_authenticated:
+        popular_collections = [
+            collection for collection in popular_collections if collection.user_id != request.user.id
+        ]
+    
+    state = get_user_state(request.user)
+    for collection in popular_collections:
+        collection.is_liked = state.likes(collection.id)
     
     context = {
         'title': 'Подборки',
@@ -184,23 +327,18 @@ def collections(request):
     return render(request, 'main/collections.html', context)
 
 def collection_detail(request, collection_id):
-    collection = get_object_or_404(Collection, id=collection_id)
+    collection = get_object_or_404(Collection.objects.alive(), id=collection_id)
     
-    is_owner = request.user.is_authenticated and collection.user == request.user
+    is_owner = request.user.is_authenticated and collection.user_id == request.user.id
     
     is_favorite = False
     if request.user.is_authenticated and not is_owner:
-        is_favorite = CollectionLike.objects.filter(
-            user=request.user, 
-            collection=collection
-        ).exists()
+        is_favorite = get_user_state(request.user).likes(collection.id)
     
     games_in_collection = Game.objects.filter(
         gamecollection__collection=collection
     ).order_by('gamecollection__order')
     
-    collection.likes_count = collection.collectionlike_set.count()
-    
     all_games = Game.objects.all()
     
     form = None
@@ -249,10 +387,10 @@ def collection_detail(request, collection_id):
 @login_required
 def add_game_to_collection(request, collection_id):
     """Добавить игру в подборку со страницы игры"""
-    collection = get_object_or_404(Collection, id=collection_id)
+    collection = get_object_or_404(Collection.objects.alive(), id=collection_id)
     
     if collection.user != request.user:
-        return JsonResponse({
+        return CompactJsonResponse({
             'status': 'error', 
             'message': 'Вы не можете добавлять игры в чужую подборку'
         }, status=403)
@@ -263,7 +401,7 @@ def add_game_to_collection(request, collection_id):
             game_id = data.get('game_id')
             
             if not game_id:
-                return JsonResponse({
+                return CompactJsonResponse({
                     'status': 'error', 
                     'message': 'ID игры не указан'
                 }, status=400)
@@ -271,7 +409,7 @@ def add_game_to_collection(request, collection_id):
             game = get_object_or_404(Game, id=game_id)
             
             if GameCollection.objects.filter(collection=collection, game=game).exists():
-                return JsonResponse({
+                return CompactJsonResponse({
                     'status': 'error', 
                     'message': 'Эта игра уже есть в подборке'
                 }, status=400)
@@ -287,23 +425,23 @@ def add_game_to_collection(request, collection_id):
                 order=max_order + 1
             )
             
-            return JsonResponse({
+            return CompactJsonResponse({
                 'status': 'success', 
                 'message': f'Игра "{game.title}" добавлена в подборку "{collection.title}"'
             })
             
         except json.JSONDecodeError:
-            return JsonResponse({
+            return CompactJsonResponse({
                 'status': 'error', 
                 'message': 'Неверный формат данных'
             }, status=400)
         except Exception as e:
-            return JsonResponse({
+            return CompactJsonResponse({
                 'status': 'error', 
                 'message': f'Ошибка: {str(e)}'
             }, status=500)
     
-    return JsonResponse({
+    return CompactJsonResponse({
         'status': 'error', 
         'message': 'Неверный метод запроса'
     }, status=405)
@@ -329,9 +467,14 @@ def contact(request):
     if request.method == 'POST':
         form = FeedbackForm(request.POST)
         if form.is_valid():
-            form.save() 
+            if not feedback.take_token(feedback.client_ip(request)):
+                form.add_error(None, 'Слишком много сообщений, попробуйте позже.')
+                return render(request, 'main/contact.html', {'title': 'Обратная связь', 'form': form}, status=429)
+            if feedback.submit(**form.cleaned_data) is None:
+                form.add_error(None, 'Не удалось отправить сообщение, попробуйте позже.')
+                return render(request, 'main/contact.html', {'title': 'Обратная связь', 'form': form}, status=503)
             messages.success(request, 'Ваше сообщение успешно отправлено! Мы ответим вам в ближайшее время.')
-            return redirect('contact') 
+            return redirect('contact')
     else:
         form = FeedbackForm()
     
@@ -341,18 +484,52 @@ def contact(request):
     }
     return render(request, 'main/contact.html', context)
 
+FEEDBACK_PAGE_SIZE = 50
+
+FEEDBACK_STATUSES = {
+    'new': {'is_processed': False},
+    'processed': {'is_processed': True},
+    'all': {},
+}
+
 @login_required
 def feedback_list(request):
     if not request.user.is_staff:
         return redirect('home')
     
-    feedbacks = Feedback.objects.all()
+    status = request.GET.get('status', 'new')
+    if status not in FEEDBACK_STATUSES:
+        status = 'new'
+    feedbacks = Feedback.objects.filter(**FEEDBACK_STATUSES[status])
+    try:
+        page, next_cursor = keyset_page(feedbacks, 'created_at', request.GET.get('after'), FEEDBACK_PAGE_SIZE)
+    except InvalidCursor:
+        return redirect(f"{reverse('feedback_list')}?status={status}")
+    
     context = {
         'title': 'Сообщения обратной связи',
-        'feedbacks': feedbacks
+        'feedbacks': page,
+        'status': status,
+        'next_cursor': next_cursor,
     }
     return render(request, 'main/feedback_list.html', context)
 
+@login_required
+def feedback_mark_processed(request):
+    if not request.user.is_staff:
+        return redirect('home')
+    if request.method != 'POST':
+        return redirect('feedback_list')
+    
+    ids = [int(value) for value in request.POST.getlist('ids') if value.isdigit()]
+    if ids:
+        updated = feedback.mark_processed(ids)
+        messages.success(request, f'Отмечено обработанными: {updated}')
+    status = request.POST.get('status')
+    if status in FEEDBACK_STATUSES:
+        return redirect(f"{reverse('feedback_list')}?status={status}")
+    return redirect('feedback_list')
+
 def register_view(request):
     if request.user.is_authenticated:
         return redirect('profile')
@@ -360,10 +537,17 @@ def register_view(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
-            user = form.save()
-            login(request, user)
-            messages.success(request, f'Добро пожаловать, {user.username}!')
-            return redirect('profile')
+            try:
+                with transaction.atomic():
+                    user = form.save()
+            except IntegrityError:
+                # имя или email заняла параллельная регистрация уже после проверки формы
+                form = CustomUserCreationForm(request.POST)
+                form.is_valid()
+            else:
+                login(request, user)
+                messages.success(request, f'Добро пожаловать, {user.username}!')
+                return redirect('profile')
     else:
         form = CustomUserCreationForm()
     
@@ -411,18 +595,18 @@ def toggle_favorite_game(request, game_id):
         
         if not created:
             favorite.delete()
-            return JsonResponse({'status': 'removed', 'message': 'Удалено из избранного'})
+            return CompactJsonResponse({'status': 'removed', 'message': 'Удалено из избранного'})
         else:
-            return JsonResponse({'status': 'added', 'message': 'Добавлено в избранное'})
+            return CompactJsonResponse({'status': 'added', 'message': 'Добавлено в избранное'})
     
-    return JsonResponse({'status': 'error', 'message': 'Неверный запрос'})
+    return CompactJsonResponse({'status': 'error', 'message': 'Неверный запрос'})
 
 @login_required
 def toggle_favorite_collection(request, collection_id):
-    collection = get_object_or_404(Collection, id=collection_id)
+    collection = get_object_or_404(Collection.objects.alive(), id=collection_id)
     
-    if collection.user == request.user:
-        return JsonResponse({
+    if collection.user_id == request.user.id:
+        return CompactJsonResponse({
             'status': 'error', 
             'message': 'Нельзя добавить свою собственную подборку в избранное'
         })
@@ -435,21 +619,21 @@ def toggle_favorite_collection(request, collection_id):
         
         if not created:
             like.delete()
-            likes_count = collection.collectionlike_set.count()
-            return JsonResponse({
+            collection.refresh_from_db(fields=['likes_count'])
+            return CompactJsonResponse({
                 'status': 'removed', 
                 'message': 'Удалено из избранного',
-                'likes_count': likes_count
+                'likes_count': collection.likes_count
             })
         else:
-            likes_count = collection.collectionlike_set.count()
-            return JsonResponse({
+            collection.refresh_from_db(fields=['likes_count'])
+            return CompactJsonResponse({
                 'status': 'added', 
                 'message': 'Добавлено в избранное',
-                'likes_count': likes_count
+                'likes_count': collection.likes_count
             })
     
-    return JsonResponse({'status': 'error', 'message': 'Неверный запрос'})
+    return CompactJsonResponse({'status': 'error', 'message': 'Неверный запрос'})
 
 @login_required
 def create_collection(request):
@@ -472,7 +656,7 @@ def create_collection(request):
 
 @login_required
 def remove_game_from_collection(request, collection_id, game_id):
-    collection = get_object_or_404(Collection, id=collection_id)
+    collection = get_object_or_404(Collection.objects.alive(), id=collection_id)
     
     if collection.user != request.user:
         return redirect('collection_detail', collection_id=collection.id)
@@ -485,11 +669,124 @@ def remove_game_from_collection(request, collection_id, game_id):
 
 @login_required
 def delete_collection(request, collection_id):
-    collection = get_object_or_404(Collection, id=collection_id)
+    collection = get_object_or_404(Collection.objects.alive(), id=collection_id)
     
     if collection.user != request.user:
         return redirect('collections')
     
-    collection.delete()
+    # строки подборки удалит фоновая задача, из списков она пропадает сразу
+    deletion.schedule_collections_deletion([collection])
     messages.success(request, 'Подборка успешно удалена!')
-    return redirect('collections')
\ No newline at end of file
+    return redirect('collections')
+
+def metrics_view(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden('Доступно только персоналу')
+    
+    return HttpResponse(
+        metrics.render_prometheus(settings.METRICS_SAMPLE_RATE),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+def slow_queries(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden('Доступно только персоналу')
+    
+    if request.method == 'POST':
+        querylog.registry.clear()
+    
+    return CompactJsonResponse({'queries': querylog.registry.report()})
+
+def profiles_list(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden('Доступно только персоналу')
+    
+    return CompactJsonResponse({
+        'profiles': [
+            {
+                'id': profile_id,
+                'files': {
+                    name: request.build_absolute_uri(f'/profiles/{profile_id}/{name}')
+                    for name in profiling.ARTIFACTS
+                },
+            }
+            for profile_id in profiling.list_profiles()
+        ]
+    })
+
+def profile_artifact(request, profile_id, name):
+    if not request.user.is_staff:
+        return HttpResponseForbidden('Доступно только персоналу')
+    
+    if name not in profiling.ARTIFACTS or not profiling.is_valid_profile_id(profile_id):
+        raise Http404
+    path = profiling.profile_dir() / profile_id / name
+    if not path.exists():
+        raise Http404
+    
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f'{profile_id}-{name}',
+        content_type=profiling.ARTIFACTS[name]
+    )
+
+def thumbnail(request, name):
+    if not thumbnails.NAME_PATTERN.match(name):
+        raise Http404
+    path = thumbnails.path_for(name)
+    if not path.exists():
+        raise Http404
+    
+    content_type = 'image/webp' if name.endswith('.webp') else 'image/jpeg'
+    response = FileResponse(open(path, 'rb'), content_type=content_type)
+    # имя — хэш содержимого, файл под ним никогда не меняется
+    patch_cache_control(response, public=True, max_age=settings.THUMBNAIL_MAX_AGE, immutable=True)
+    return response
+
+def api_resource(request, name):
+    if request.method != 'GET':
+        return CompactJsonResponse({'success': False, 'error': 'Метод не поддерживается'}, status=405)
+    try:
+        payload = api.fetch(name, request.GET)
+    except api.ApiError as e:
+        return CompactJsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    response = CompactJsonResponse(payload)
+    # ETag — хэш тела: клиент, у которого страница не изменилась, получит 304 без тела
+    etag = f'"{hashlib.sha1(response.content).hexdigest()}"'
+    response.headers['ETag'] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return get_conditional_response(request, etag=etag, response=response)
+
+def api_changes(request):
+    if request.method != 'GET':
+        return CompactJsonResponse({'success': False, 'error': 'Метод не поддерживается'}, status=405)
+    if 'since' not in request.GET:
+        # начало синхронизации: версия, от которой потом запрашивать изменения
+        return CompactJsonResponse({
+            'success': True, 'changes': [], 'version': change_log.current_version(), 'has_more': False,
+        })
+    try:
+        since = int(request.GET['since'])
+        limit = min(int(request.GET.get('limit', change_log.FEED_LIMIT)), change_log.MAX_FEED_LIMIT)
+    except ValueError:
+        return CompactJsonResponse({'success': False, 'error': 'since и limit должны быть целыми числами'}, status=400)
+    if since < 0 or limit < 1:
+        return CompactJsonResponse({'success': False, 'error': 'since и limit вне допустимого диапазона'}, status=400)
+    
+    changes, version, has_more = change_log.changes(since, limit)
+    return CompactJsonResponse({'success': True, 'changes': changes, 'version': version, 'has_more': has_more})
+
+HASHED_STATIC_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
+def static_file(request, path):
+    response = serve(request, path, document_root=settings.STATIC_ROOT)
+    
+    # у хэшированного имени содержимое не меняется никогда,
+    # исходные имена (без хэша) браузер должен перепроверять
+    if HASHED_STATIC_NAME.search(path):
+        patch_cache_control(response, public=True, max_age=settings.STATIC_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
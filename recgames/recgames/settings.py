@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,9 +24,11 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-bbtry%4d(6@c==^za#c-(&x(p(epx7)r5(3@816(ss18u^vkza'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+# Имена хостов через запятую, например DJANGO_ALLOWED_HOSTS=recgames.example,www.recgames.example.
+# Без DEBUG Django отвечает 400 на запросы к хостам не из списка.
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
 
 
 # Application definition
@@ -42,19 +45,25 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'main.middleware.MetricsMiddleware',
+    'main.middleware.CompressionMiddleware',
+    'main.middleware.HtmlMinifyMiddleware',
+    'main.middleware.InvalidationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main.middleware.QueryLogMiddleware',
+    'main.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'recgames.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'main.template_backend.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -67,9 +76,45 @@ TEMPLATES = [
     },
 ]
 
+# Продакшен-профиль (DJANGO_DEBUG=0): шаблоны компилируются один раз на процесс
+if not DEBUG:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'recgames.wsgi.application'
 
 
+# Сжатие ответов (main/middleware.py): ответы меньше этого размера
+# не сжимаются. HTML_MINIFY убирает отступы и пустые строки из страниц
+
+COMPRESSION_MIN_SIZE = 512
+
+HTML_MINIFY = not DEBUG
+
+
+# Миниатюры обложек (main/thumbnails.py): откуда брать исходные обложки,
+# куда класть миниатюры, формат, качество, размер пула и время кэширования.
+# Для офлайн-сборки источник можно заменить на
+# {'BACKEND': 'main.thumbnails.DirectorySource', 'root': '/путь/к/обложкам'}
+
+THUMBNAIL_SOURCE = {'BACKEND': 'main.thumbnails.HttpSource'}
+
+THUMBNAIL_DIR = BASE_DIR / 'thumbnails'
+
+THUMBNAIL_FORMAT = 'WEBP'
+
+THUMBNAIL_QUALITY = 80
+
+THUMBNAIL_WORKERS = 8
+
+THUMBNAIL_MAX_AGE = 365 * 24 * 60 * 60
+
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -81,6 +126,38 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# По умолчанию кэш — файлы в BASE_DIR/cache, общие для всех процессов на
+# одной машине: в нём лежат сессии и загруженные пользователи, поэтому выход
+# или смена пароля в одном воркере сразу действуют во всех. Если воркеры на
+# разных машинах, задайте общий бэкенд через переменные окружения (например,
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache и
+# CACHE_LOCATION=redis://127.0.0.1:6379/1).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+    }
+}
+
+if 'CACHE_BACKEND' not in os.environ:
+    # при переполнении файловый кэш удаляет треть записей, в том числе сессии
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 50000}
+
+
+# Sessions and authentication
+# Сессии читаются из кэша и только при промахе из БД; пользователь
+# по id из сессии тоже берётся из кэша (main/auth_backends.py)
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+AUTHENTICATION_BACKENDS = ['main.auth_backends.CachedModelBackend']
+
+AUTH_USER_CACHE_TTL = 10 * 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -100,6 +177,21 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Для тестов и нагрузочных прогонов: FAST_PASSWORD_HASHER=1 делает MD5
+# основным хэшером, чтобы регистрация и вход не упирались в PBKDF2.
+# Существующие пароли продолжают проверяться, в продакшене не включать.
+
+if os.environ.get('FAST_PASSWORD_HASHER') == '1':
+    PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -117,7 +209,152 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Без DEBUG имена статики содержат хэш содержимого (нужен collectstatic),
+# поэтому файлы можно кэшировать в браузере на STATIC_MAX_AGE секунд
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': ('django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+                    else 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'),
+    },
+}
+
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Снимки рейтингов главной страницы (main/rankings.py).
+# Обычно их пересчитывает `manage.py refresh_rankings --loop`; если снимок
+# старше RANKINGS_MAX_AGE секунд, главная страница пересчитает его сама.
+
+RANKINGS_MAX_AGE = 15 * 60
+
+
+# Кэш дорогих вычислений с защитой от одновременных пересчётов
+# (main/single_flight.py). *_CACHE_TTL — сколько секунд значение свежее;
+# ещё SINGLE_FLIGHT_STALE_TTL секунд его отдают, пока один процесс
+# пересчитывает. Замок пересчёта живёт не дольше SINGLE_FLIGHT_LOCK_TIMEOUT,
+# а без значения в кэше запросы ждут его не дольше SINGLE_FLIGHT_WAIT секунд
+
+SINGLE_FLIGHT_STALE_TTL = 5 * 60
+
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30
+
+SINGLE_FLIGHT_WAIT = 5
+
+HOME_RANKINGS_CACHE_TTL = 60
+
+RECOMMENDATIONS_CACHE_TTL = 5 * 60
+
+COLLECTIONS_CACHE_TTL = 60
+
+
+# Шина инвалидации кэшей между воркерами (main/invalidation.py): транспорт
+# событий и как часто каждый процесс забирает чужие события, секунд.
+# Для одного процесса подойдёт {'BACKEND': 'main.invalidation.LocalTransport'}
+
+INVALIDATION_TRANSPORT = {
+    'BACKEND': 'main.invalidation.OutboxTransport',
+    'retention': 60 * 60,
+}
+
+INVALIDATION_POLL_INTERVAL = 1.0
+
+
+# Снимок индекса каталога для быстрого старта воркеров (main/catalog_snapshot.py).
+# При CATALOG_SNAPSHOT_AUTO_WRITE процесс, построивший индекс из БД, сам
+# обновляет устаревший снимок
+
+CATALOG_SNAPSHOT_PATH = BASE_DIR / 'catalog.snapshot'
+
+CATALOG_SNAPSHOT_AUTO_WRITE = True
+
+
+# Тренды (main/trending.py): период полураспада счётчиков и как часто
+# задача sync_trending (`manage.py run_jobs`) учитывает новые события,
+# а веб-процессы перечитывают общее состояние, секунд
+
+TRENDING_HALF_LIFE = 3 * 24 * 60 * 60
+
+TRENDING_SYNC_INTERVAL = 60
+
+
+# Подсказки связанных тегов на странице рекомендаций (main/tag_stats.py)
+
+RELATED_TAGS_LIMIT = 8
+
+
+# Метрики запросов (main/middleware.py), отдаются на /metrics для персонала.
+# Доля запросов, которые замеряются: 1.0 — все, 0 — метрики выключены
+
+METRICS_SAMPLE_RATE = 0.1
+
+
+# Профилирование запросов персонала (main/profiling.py): куда сохранять
+# результаты, сколько профилей разрешено за окно и шаг семплирования стека
+
+PROFILE_DIR = BASE_DIR / 'profiles'
+
+PROFILE_RATE_LIMIT = 5
+
+PROFILE_RATE_WINDOW = 10 * 60
+
+PROFILE_SAMPLE_INTERVAL = 0.005
+
+
+# Журнал медленных запросов (main/querylog.py): порог длительности SQL и
+# сколько одинаковых запросов за один HTTP-запрос считать N+1
+
+SLOW_QUERY_THRESHOLD_MS = 100
+
+N_PLUS_ONE_THRESHOLD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'main': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
+
+# Кэшированное состояние пользователя (main/user_state.py): избранное,
+# лайки и подборки. Сбрасывается сигналами, TTL ограничивает устаревание
+
+USER_STATE_TTL = 5 * 60
+
+
+# Приём обратной связи (main/feedback.py): ведро жетонов на IP — не больше
+# FEEDBACK_BURST сообщений подряд, затем одно за FEEDBACK_REFILL_SECONDS.
+# FEEDBACK_CLIENT_IP_HEADER — ключ request.META с адресом клиента за
+# обратным прокси, например 'HTTP_X_FORWARDED_FOR'; None — REMOTE_ADDR.
+# Задавать только за прокси, который сам дописывает этот заголовок
+
+FEEDBACK_BURST = 5
+
+FEEDBACK_REFILL_SECONDS = 60
+
+FEEDBACK_CLIENT_IP_HEADER = os.environ.get('DJANGO_CLIENT_IP_HEADER') or None
+
+
+# Лента изменений каталога (main/change_log.py): сколько секунд запись
+# выдерживается перед выдачей. На SQLite записи пишутся по очереди и
+# задержка не нужна; на БД с параллельными транзакциями записи — секунды
+
+CHANGE_FEED_LAG = 0
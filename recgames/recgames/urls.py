@@ -1,7 +1,17 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
+
+from main.views import static_file
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('main.urls')),
 ]
+
+if not settings.DEBUG:
+    # при DEBUG статику отдаёт runserver, иначе — Django из STATIC_ROOT
+    # (если перед ним нет nginx) с долгим кэшированием хэшированных файлов
+    urlpatterns += [
+        re_path(rf'^{settings.STATIC_URL.lstrip("/")}(?P<path>.*)$', static_file),
+    ]